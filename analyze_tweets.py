@@ -7,147 +7,400 @@ This script processes the CSV file created by the Twitter scraper.
 #env
 
 import argparse
+import atexit
 import csv
+import glob
+import json
 import os
 import sys
-from collections import Counter
 from datetime import datetime
-import re
+
+import profiling_hooks
+import scraper_logging
+from tweet_files import account_from_filename, iter_rows, manifest_segments, tweet_file_lines
+from tweet_tokenizer import tokenize
 
 def load_tweets(csv_file):
     """Load tweets from the CSV file."""
+    return list(iter_tweets(csv_file))
+
+def iter_tweets(csv_file):
+    """Yield tweets from the CSV file one at a time.
+    
+    Also reads gzip/zstd compressed output and segment manifests.
+    """
     if not os.path.exists(csv_file):
         print(f"Error: File {csv_file} does not exist!")
         sys.exit(1)
         
-    tweets = []
-    with open(csv_file, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            try:
-                # Convert timestamp to datetime
-                if row['timestamp'] != "Unknown":
-                    row['datetime'] = datetime.strptime(row['timestamp'], '%Y-%m-%dT%H:%M:%S.%fZ')
-                else:
-                    row['datetime'] = None
-                
-                # Convert numeric fields
-                for field in ['replies', 'retweets', 'likes']:
-                    row[field] = int(row[field]) if row[field] else 0
-                    
-                tweets.append(row)
-            except Exception as e:
-                print(f"Error processing row: {e}")
-                continue
+    for rows, row in enumerate(iter_rows(csv_file), 1):
+        profiling_hooks.checkpoint(rows)
+        try:
+            # Convert timestamp to datetime
+            if row['timestamp'] != "Unknown":
+                row['datetime'] = datetime.strptime(row['timestamp'], '%Y-%m-%dT%H:%M:%S.%fZ')
+            else:
+                row['datetime'] = None
+            
+            # Convert numeric fields
+            for field in ['replies', 'retweets', 'likes']:
+                row[field] = int(row[field]) if row[field] else 0
                 
-    return tweets
+            yield row
+        except Exception as e:
+            print(f"Error processing row: {e}")
+            continue
 
 def extract_mentions(text):
     """Extract @mentions from tweet text."""
-    return re.findall(r'@\w+', text)
+    return tokenize(text).mentions
 
 def extract_hashtags(text):
     """Extract #hashtags from tweet text."""
-    return re.findall(r'#\w+', text)
+    return tokenize(text).hashtags
+
+def print_stats(tweets, sketch_size=None):
+    """Print statistics about the tweets.
+    
+    With sketch_size set, top mentions and hashtags are approximated with
+    bounded-memory sketches and tweets may be any iterable, e.g. iter_tweets().
+    tweets may also be a memory-mapped column cache from open_column_cache().
+    """
+    from tweet_aggregates import TweetAggregate
+    from tweet_columns import TweetColumns
+    
+    if isinstance(tweets, TweetColumns):
+        print_aggregate(TweetAggregate.from_columns(tweets, sketch_size))
+    else:
+        print_aggregate(TweetAggregate.from_tweets(tweets, sketch_size))
 
-def print_stats(tweets):
-    """Print statistics about the tweets."""
-    if not tweets:
+def open_column_cache(csv_file, verify='stat'):
+    """Open the memory-mapped column cache of a file, building it on first use; None if unavailable."""
+    from tweet_columns import open_columns
+    
+    if not os.path.exists(csv_file):
+        print(f"Error: File {csv_file} does not exist!")
+        sys.exit(1)
+    return open_columns(csv_file, verify)
+
+def print_aggregate(aggregate, title="TWITTER SCRAPER ANALYSIS"):
+    """Print the statistics held by a TweetAggregate."""
+    if not aggregate.tweets:
         print("No tweets found!")
         return
         
-    print(f"\n📊 TWITTER SCRAPER ANALYSIS")
-    print(f"📑 Total tweets: {len(tweets)}")
+    print(f"\n📊 {title}")
+    print(f"📑 Total tweets: {aggregate.tweets}")
     
     # Date range
-    dates = [t['datetime'] for t in tweets if t['datetime']]
-    if dates:
-        min_date = min(dates)
-        max_date = max(dates)
+    if aggregate.min_date:
+        min_date = aggregate.min_date
+        max_date = aggregate.max_date
         date_range = (max_date - min_date).days
         print(f"📅 Date range: {min_date.strftime('%Y-%m-%d')} to {max_date.strftime('%Y-%m-%d')} ({date_range} days)")
     
     # Engagement stats
-    total_replies = sum(t['replies'] for t in tweets)
-    total_retweets = sum(t['retweets'] for t in tweets)
-    total_likes = sum(t['likes'] for t in tweets)
+    total_replies = aggregate.totals['replies']
+    total_retweets = aggregate.totals['retweets']
+    total_likes = aggregate.totals['likes']
     
     print(f"💬 Total replies: {total_replies}")
     print(f"🔁 Total retweets: {total_retweets}")
     print(f"❤️ Total likes: {total_likes}")
     
-    if tweets:
-        avg_replies = total_replies / len(tweets)
-        avg_retweets = total_retweets / len(tweets)
-        avg_likes = total_likes / len(tweets)
-        
-        print(f"📊 Average engagement per tweet:")
-        print(f"   - Replies: {avg_replies:.2f}")
-        print(f"   - Retweets: {avg_retweets:.2f}")
-        print(f"   - Likes: {avg_likes:.2f}")
+    avg_replies = total_replies / aggregate.tweets
+    avg_retweets = total_retweets / aggregate.tweets
+    avg_likes = total_likes / aggregate.tweets
+    
+    print(f"📊 Average engagement per tweet:")
+    print(f"   - Replies: {avg_replies:.2f}")
+    print(f"   - Retweets: {avg_retweets:.2f}")
+    print(f"   - Likes: {avg_likes:.2f}")
     
     # Most popular tweets
-    most_liked = max(tweets, key=lambda x: x['likes'])
-    most_retweeted = max(tweets, key=lambda x: x['retweets'])
-    most_replies = max(tweets, key=lambda x: x['replies'])
+    most_liked = aggregate.top['likes']
+    most_retweeted = aggregate.top['retweets']
+    most_replies = aggregate.top['replies']
     
     print(f"\n🔝 MOST POPULAR TWEETS")
-    print(f"\n✨ Most liked ({most_liked['likes']} likes):")
+    print(f"\n✨ Most liked ({most_liked['value']} likes):")
     print(f"   {most_liked['text'][:100]}...")
     
-    print(f"\n🔄 Most retweeted ({most_retweeted['retweets']} retweets):")
+    print(f"\n🔄 Most retweeted ({most_retweeted['value']} retweets):")
     print(f"   {most_retweeted['text'][:100]}...")
     
-    print(f"\n💬 Most replied to ({most_replies['replies']} replies):")
+    print(f"\n💬 Most replied to ({most_replies['value']} replies):")
     print(f"   {most_replies['text'][:100]}...")
     
-    # Extract mentions and hashtags
-    all_mentions = []
-    all_hashtags = []
+    # Count and sort mentions and hashtags
+    mention_counts = aggregate.top_counts(aggregate.mentions, 10)
+    hashtag_counts = aggregate.top_counts(aggregate.hashtags, 10)
+    
+    if mention_counts:
+        print(f"\n👥 TOP MENTIONS{' (approximate)' if aggregate.approximate else ''}")
+        for mention, count, error in mention_counts:
+            print(f"   {mention}: {count} times{f' (±{error})' if error else ''}")
     
-    for tweet in tweets:
-        all_mentions.extend(extract_mentions(tweet['text']))
-        all_hashtags.extend(extract_hashtags(tweet['text']))
+    if hashtag_counts:
+        print(f"\n🔖 TOP HASHTAGS{' (approximate)' if aggregate.approximate else ''}")
+        for hashtag, count, error in hashtag_counts:
+            print(f"   {hashtag}: {count} times{f' (±{error})' if error else ''}")
     
-    # Count and sort
-    mention_counts = Counter(all_mentions).most_common(10)
-    hashtag_counts = Counter(all_hashtags).most_common(10)
+    # Activity by day of week
+    if aggregate.min_date:
+        print(f"\n📆 ACTIVITY BY DAY OF WEEK")
+        for day, count in aggregate.day_counts().items():
+            print(f"   {day}: {count} tweets")
+
+def print_near_duplicates(tweets, threshold, top_n):
+    """Print clusters of near-identical tweets with their size and engagement."""
+    from near_duplicates import find_near_duplicates
     
-    if mention_counts:
+    clusters = find_near_duplicates(tweets, threshold=threshold)
+    print(f"\n🧬 NEAR-DUPLICATE CLUSTERS (similarity >= {threshold})")
+    if not clusters:
+        print("   No near-duplicate tweets found")
+        return
+    
+    duplicated = sum(c['size'] for c in clusters)
+    print(f"   {len(clusters)} clusters covering {duplicated} tweets ({duplicated / len(tweets) * 100:.1f}%)")
+    for i, cluster in enumerate(clusters[:top_n], 1):
+        print(f"\n   #{i}: {cluster['size']} tweets, {cluster['engagement']} total engagement "
+              f"({cluster['replies']} replies, {cluster['retweets']} retweets, {cluster['likes']} likes)")
+        print(f"   {cluster['tweets'][0]['text'][:100]}...")
+
+def print_rollup_stats(summary, account=None):
+    """Print the report sections that can be served from the rollup store."""
+    if not summary['tweets']:
+        print("No tweets found!")
+        return
+    
+    scope = f" FOR @{account.lstrip('@')}" if account else ""
+    print(f"\n📊 TWITTER SCRAPER ANALYSIS{scope} (from rollups)")
+    print(f"📑 Total tweets: {summary['tweets']}")
+    
+    if summary['first_day']:
+        min_date = datetime.strptime(summary['first_day'], '%Y-%m-%d')
+        max_date = datetime.strptime(summary['last_day'], '%Y-%m-%d')
+        print(f"📅 Date range: {summary['first_day']} to {summary['last_day']} ({(max_date - min_date).days} days)")
+    
+    print(f"💬 Total replies: {summary['replies']}")
+    print(f"🔁 Total retweets: {summary['retweets']}")
+    print(f"❤️ Total likes: {summary['likes']}")
+    
+    print(f"📊 Average engagement per tweet:")
+    print(f"   - Replies: {summary['replies'] / summary['tweets']:.2f}")
+    print(f"   - Retweets: {summary['retweets'] / summary['tweets']:.2f}")
+    print(f"   - Likes: {summary['likes'] / summary['tweets']:.2f}")
+    
+    print(f"\n🔝 MOST POPULAR TWEETS")
+    for field, title in (('likes', "✨ Most liked"), ('retweets', "🔄 Most retweeted"), ('replies', "💬 Most replied to")):
+        top = summary['top'][field]
+        if top:
+            print(f"\n{title} ({top['value']} {field}):")
+            print(f"   {top['text'][:100]}...")
+    
+    if summary['top_mentions']:
         print(f"\n👥 TOP MENTIONS")
-        for mention, count in mention_counts:
+        for mention, count in summary['top_mentions']:
             print(f"   {mention}: {count} times")
     
-    if hashtag_counts:
+    if summary['top_hashtags']:
         print(f"\n🔖 TOP HASHTAGS")
-        for hashtag, count in hashtag_counts:
+        for hashtag, count in summary['top_hashtags']:
             print(f"   {hashtag}: {count} times")
     
-    # Activity by day of week
-    if dates:
-        day_counts = Counter([d.strftime('%A') for d in dates])
-        
-        # Ensure all days are present
-        days_of_week = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        for day in days_of_week:
-            if day not in day_counts:
-                day_counts[day] = 0
-        
-        # Sort by day of week
-        sorted_days = sorted(day_counts.items(), 
-                            key=lambda x: days_of_week.index(x[0]))
-        
+    if summary['first_day']:
         print(f"\n📆 ACTIVITY BY DAY OF WEEK")
-        for day, count in sorted_days:
+        for day, count in summary['weekdays'].items():
             print(f"   {day}: {count} tweets")
 
+def print_timeseries(rows, granularity):
+    """Print rollup buckets as a table, one line per hour or day."""
+    print(f"\n📈 {'HOURLY' if granularity == 'hour' else 'DAILY'} TIME SERIES")
+    print(f"   {'bucket':<14} {'tweets':>7} {'replies':>9} {'retweets':>9} {'likes':>10} {'max likes':>10}")
+    for bucket, tweets, replies, retweets, likes, max_replies, max_retweets, max_likes in rows:
+        print(f"   {bucket:<14} {tweets:>7} {replies:>9} {retweets:>9} {likes:>10} {max_likes:>10}")
+
+def find_corpus_files(spec):
+    """Return the scraper output files in a directory, or matching a glob pattern."""
+    if os.path.isdir(spec):
+        files = []
+        for pattern in ('*.csv', '*.csv.gz', '*.csv.zst', '*.manifest.json'):
+            files.extend(glob.glob(os.path.join(spec, '**', pattern), recursive=True))
+    else:
+        files = glob.glob(spec, recursive=True)
+    files = sorted(f for f in set(files) if os.path.isfile(f))
+    
+    # Segments are read through their manifest
+    segments = set()
+    for manifest in (f for f in files if f.endswith('.manifest.json')):
+        segments.update(os.path.normpath(segment) for segment in manifest_segments(manifest))
+    # Engagement snapshots from refresh_engagement.py are not tweet files
+    return [f for f in files if os.path.normpath(f) not in segments and not f.endswith('_engagement.csv')]
+
+def aggregate_file(csv_file, sketch_size=None, cache_verify=None):
+    """Stream one output file into a TweetAggregate, for use in a worker process.
+
+    With cache_verify set ('stat' or 'hash'), the file's column cache is used.
+    """
+    from tweet_aggregates import TweetAggregate
+    
+    header = next(csv.reader(tweet_file_lines(csv_file)), [])
+    if 'text' not in header or 'tweet_id' not in header:
+        return csv_file, None
+    columns = open_column_cache(csv_file, cache_verify) if cache_verify else None
+    if columns is not None:
+        return csv_file, TweetAggregate.from_columns(columns, sketch_size)
+    return csv_file, TweetAggregate.from_tweets(iter_tweets(csv_file), sketch_size)
+
+def analyze_corpus(files, workers=None, sketch_size=None, cache_verify=None):
+    """Aggregate many output files in a process pool.
+
+    Returns the global aggregate and a dictionary of per-account aggregates
+    with the files that contributed to each.
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    from tweet_aggregates import TweetAggregate
+    
+    total = TweetAggregate(sketch_size)
+    accounts = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(aggregate_file, f, sketch_size, cache_verify) for f in files]
+        for done, future in enumerate(as_completed(futures), 1):
+            csv_file, aggregate = future.result()
+            if aggregate is None:
+                print(f"Skipping {csv_file}: not a tweet file")
+                continue
+            account = account_from_filename(csv_file) or "unknown"
+            entry = accounts.setdefault(account, {'aggregate': TweetAggregate(sketch_size), 'files': []})
+            entry['aggregate'].merge(aggregate)
+            entry['files'].append(csv_file)
+            total.merge(aggregate)
+            print(f"Analyzed {done}/{len(files)}: {csv_file} ({aggregate.tweets} tweets)", file=sys.stderr)
+    return total, accounts
+
+def print_account_table(accounts):
+    """Print one summary line per account of a corpus."""
+    print(f"\n👤 PER-ACCOUNT SUMMARY")
+    print(f"   {'account':<20} {'files':>5} {'tweets':>8} {'first':>10} {'last':>10} {'likes':>10} {'avg likes':>9}")
+    ordered = sorted(accounts.items(), key=lambda item: item[1]['aggregate'].tweets, reverse=True)
+    for account, entry in ordered:
+        aggregate = entry['aggregate']
+        first = aggregate.min_date.strftime('%Y-%m-%d') if aggregate.min_date else '-'
+        last = aggregate.max_date.strftime('%Y-%m-%d') if aggregate.max_date else '-'
+        avg_likes = aggregate.totals['likes'] / aggregate.tweets if aggregate.tweets else 0
+        print(f"   {account:<20} {len(entry['files']):>5} {aggregate.tweets:>8} {first:>10} {last:>10} "
+              f"{aggregate.totals['likes']:>10} {avg_likes:>9.2f}")
+
+def write_corpus_summary(path, files, total, accounts):
+    """Write the corpus aggregates as a JSON summary."""
+    summary = {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'files': len(files),
+        'global': total.to_dict(),
+        'accounts': {
+            account: dict(entry['aggregate'].to_dict(), files=sorted(entry['files']))
+            for account, entry in sorted(accounts.items())
+        },
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    print(f"\nSaved JSON summary to {path}")
+
 def main():
     parser = argparse.ArgumentParser(description='Analyze Twitter scraped data')
-    parser.add_argument('file', help='CSV file containing scraped tweets')
+    parser.add_argument('file', nargs='?', help='CSV file containing scraped tweets')
+    parser.add_argument('--corpus', metavar='DIR_OR_GLOB',
+                        help='Analyze every output file in a directory or matching a glob, in parallel')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker processes for --corpus (default: number of CPUs)')
+    parser.add_argument('--json-out', metavar='PATH', help='Write a machine-readable JSON summary (--corpus)')
+    parser.add_argument('--approx-topk', action='store_true',
+                        help='Count top mentions and hashtags with bounded-memory sketches instead of exactly')
+    parser.add_argument('--sketch-size', type=int, default=1000,
+                        help='Counters per sketch for --approx-topk; more is slower but more accurate (default: 1000)')
+    parser.add_argument('--near-duplicates', action='store_true',
+                        help='Find clusters of near-identical tweets (copy-paste campaigns, templated replies)')
+    parser.add_argument('--similarity', type=float, default=0.8,
+                        help='Minimum estimated text similarity for near-duplicates (default: 0.8)')
+    parser.add_argument('--top-clusters', type=int, default=10,
+                        help='Number of near-duplicate clusters to print (default: 10)')
+    parser.add_argument('--rollups', metavar='STORE', nargs='?', const='tweet_rollups.sqlite', default=None,
+                        help='Serve the report from an incrementally updated rollup store (default: tweet_rollups.sqlite)')
+    parser.add_argument('--timeseries', choices=['hour', 'day'],
+                        help='Print hourly or daily tweet and engagement totals (uses the rollup store)')
+    parser.add_argument('--account', help="Account for the rollup report and time series "
+                        "(default: the account FILE belongs to; 'all' for the whole store)")
+    parser.add_argument('--no-column-cache', action='store_true',
+                        help='Parse the CSV every time instead of using the memory-mapped <file>.cols cache')
+    parser.add_argument('--cache-verify', choices=['stat', 'hash'], default='stat',
+                        help='Rebuild the column cache when size/mtime change (stat) or only when the content does (hash)')
+    profiling_hooks.add_profiling_arguments(parser, 100000, 'rows')
     args = parser.parse_args()
+    scraper_logging.setup_logging()
+    
+    if args.profile or args.trace_memory:
+        # --corpus workers run in their own processes; only this process is profiled
+        profiling_hooks.start(args.profile_dir, args.profile, args.trace_memory, args.profile_every, "row", "analyze")
+        atexit.register(profiling_hooks.stop)
+    # Row snapshots are taken while parsing, which the column cache skips
+    use_column_cache = not (args.no_column_cache or args.profile or args.trace_memory)
+    
+    if args.corpus:
+        files = find_corpus_files(args.corpus)
+        if not files:
+            print(f"Error: No CSV files found in {args.corpus}!")
+            sys.exit(1)
+        sketch_size = args.sketch_size if args.approx_topk else None
+        cache_verify = args.cache_verify if use_column_cache else None
+        total, accounts = analyze_corpus(files, args.workers, sketch_size, cache_verify)
+        print_aggregate(total, f"CORPUS ANALYSIS ({len(files)} files, {len(accounts)} accounts)")
+        print_account_table(accounts)
+        if args.json_out:
+            write_corpus_summary(args.json_out, files, total, accounts)
+        return
+    
+    if not args.file:
+        parser.error("a CSV file or --corpus is required")
+    
+    if args.rollups or args.timeseries:
+        from tweet_rollups import DEFAULT_ROLLUPS, open_rollups, update_rollups, rollup_summary, timeseries
+        
+        if not os.path.exists(args.file):
+            print(f"Error: File {args.file} does not exist!")
+            sys.exit(1)
+        conn = open_rollups(args.rollups or DEFAULT_ROLLUPS)
+        update_rollups(conn, args.file)
+        # Report on FILE, not on everything the store has been fed
+        account = args.account or account_from_filename(args.file) or None
+        if account == 'all':
+            account = None
+        print_rollup_stats(rollup_summary(conn, account), account)
+        if args.timeseries:
+            print_timeseries(timeseries(conn, args.timeseries, account), args.timeseries)
+        if not args.near_duplicates:
+            return
+    
+    columns = open_column_cache(args.file, args.cache_verify) if use_column_cache else None
+    if columns is not None:
+        if not (args.rollups or args.timeseries):
+            print_stats(columns, args.sketch_size if args.approx_topk else None)
+        if args.near_duplicates and len(columns):
+            print_near_duplicates(list(columns.iter_tweets()), args.similarity, args.top_clusters)
+        return
+    
+    if args.approx_topk and not args.near_duplicates:
+        # Stream the file so memory stays bounded by the sketch size
+        print_stats(iter_tweets(args.file), args.sketch_size)
+        return
     
     tweets = load_tweets(args.file)
-    print_stats(tweets)
+    if not (args.rollups or args.timeseries):
+        print_stats(tweets, args.sketch_size if args.approx_topk else None)
+    
+    if args.near_duplicates and tweets:
+        print_near_duplicates(tweets, args.similarity, args.top_clusters)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Benchmark the shared tweet tokenizer against the per-call regular expressions
+it replaced: an uncompiled whitespace re.sub in clean_tweet_text() plus separate
+re.findall() scans for mentions and hashtags in the analyzer.
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixtures import synthetic_texts
+from tweet_tokenizer import clean_text, tokenize
+
+def legacy_pipeline(text):
+    text = re.sub(r'\s+', ' ', text).strip()
+    return re.findall(r'@\w+', text), re.findall(r'#\w+', text)
+
+def tokenizer_pipeline(text):
+    tokens = tokenize(clean_text(text))
+    return tokens.mentions, tokens.hashtags
+
+def time_pipeline(pipeline, texts, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            pipeline(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark tweet text tokenization')
+    parser.add_argument('--tweets', type=int, default=200000, help='Synthetic tweets per run (default: 200000)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per pipeline, best is reported (default: 3)')
+    parser.add_argument('--archive', type=int, default=10000000,
+                        help='Archive size used to project the total time saved (default: 10000000)')
+    args = parser.parse_args()
+
+    texts = synthetic_texts(args.tweets)
+    legacy = time_pipeline(legacy_pipeline, texts, args.repeat)
+    shared = time_pipeline(tokenizer_pipeline, texts, args.repeat)
+
+    legacy_us = legacy / args.tweets * 1e6
+    shared_us = shared / args.tweets * 1e6
+    print(f"Tweets per run:   {args.tweets}")
+    print(f"Legacy regexes:   {legacy_us:.2f} µs/tweet")
+    print(f"Shared tokenizer: {shared_us:.2f} µs/tweet (also finds cashtags and URLs)")
+    print(f"Saved:            {legacy_us - shared_us:.2f} µs/tweet, "
+          f"{(legacy_us - shared_us) * args.archive / 1e6:.1f}s over {args.archive:,} tweets")
+
+if __name__ == "__main__":
+    main()
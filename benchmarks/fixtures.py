@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Synthetic fixtures for the benchmarks.
+Generates X timeline pages with the markup the scrapers look for (tweetText
+divs, role="group" stats with aria-labels, time elements inside status links),
+tweet dictionaries as the scrapers produce them, and scraper-format CSV files.
+"""
+
+import csv
+import random
+from datetime import datetime, timedelta
+from html import escape
+
+WORDS = ["the", "new", "release", "is", "out", "today", "thanks", "everyone", "who", "helped",
+         "we", "shipped", "faster", "builds", "and", "fewer", "bugs", "read", "more", "here"]
+ENTITIES = ["@openai", "@github", "@user_42", "#python", "#AI", "#हिन्दी", "#日本語", "$AAPL",
+            "https://example.com/post/123", "https://t.co/AbCdEf12"]
+CSV_FIELDS = ['tweet_id', 'timestamp', 'text', 'replies', 'retweets', 'likes', 'url', 'links']
+FIRST_TWEET_ID = 1700000000000000000
+START_TIME = datetime(2024, 1, 1)
+
+def synthetic_texts(count, seed=42):
+    """Raw tweet texts with the line breaks and entity density of a typical timeline."""
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        words = rng.choices(WORDS, k=rng.randint(8, 40))
+        for _ in range(rng.randint(0, 4)):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(ENTITIES))
+        texts.append("  ".join(words[:len(words) // 2]) + "\n\n" + " ".join(words[len(words) // 2:]))
+    return texts
+
+def synthetic_tweets(count, username="benchuser", seed=42):
+    """Tweet dictionaries shaped like the output of extract_tweet_data()."""
+    rng = random.Random(seed)
+    tweets = []
+    for i, text in enumerate(synthetic_texts(count, seed)):
+        tweet_id = str(FIRST_TWEET_ID + i)
+        posted = START_TIME + timedelta(seconds=i * 937)
+        likes = int(rng.paretovariate(1.2) * 5) - 5
+        tweets.append({
+            'tweet_id': tweet_id,
+            'timestamp': posted.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            'text': " ".join(text.split()),
+            'replies': likes // 7,
+            'retweets': likes // 3,
+            'likes': likes,
+            'url': f"https://twitter.com/{username}/status/{tweet_id}",
+        })
+    return tweets
+
+def article_html(tweet, username="benchuser"):
+    """Markup of one timeline article."""
+    text = escape(tweet['text'])
+    return (
+        '<article data-testid="tweet" role="article" tabindex="0">'
+        '<div class="css-175oi2r"><div class="css-175oi2r r-18u37iz">'
+        f'<div data-testid="User-Name"><a href="/{username}" role="link"><span>{username}</span></a>'
+        f'<a href="/{username}/status/{tweet["tweet_id"]}" role="link" class="css-146c3p1">'
+        f'<span><time datetime="{tweet["timestamp"]}">Jan 1</time></span></a></div>'
+        f'<div data-testid="tweetText" lang="en" dir="auto" class="css-146c3p1"><span>{text}</span></div>'
+        '<div role="group" aria-label="Engagement">'
+        f'<div aria-label="{tweet["replies"]} replies"><span>{tweet["replies"]}</span></div>'
+        f'<div aria-label="{tweet["retweets"]} Retweets"><span>{tweet["retweets"]}</span></div>'
+        f'<div aria-label="{tweet["likes"]} Likes"><span>{tweet["likes"]}</span></div>'
+        '</div></div></div></article>'
+    )
+
+def timeline_html(tweets, username="benchuser"):
+    """A full timeline page holding one article per tweet."""
+    articles = "".join(article_html(tweet, username) for tweet in tweets)
+    return (
+        '<!DOCTYPE html><html lang="en"><head><meta charset="utf-8"><title>Timeline</title></head>'
+        '<body><div id="react-root"><main role="main"><div aria-label="Timeline: Posts">'
+        f'{articles}</div></main></div></body></html>'
+    )
+
+def write_tweets_csv(path, tweets):
+    """Write tweets in the scraper's CSV format."""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        writer.writerows(tweets)
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the sites behind tweet links.
+Serves short links that redirect through an extra hop to a page with a title,
+plus broken links, with configurable latency and failure rate, and counts the
+requests per path and the requests in flight per host. With --self-test it
+writes synthetic tweets linking to it, unfurls them with link_unfurler.py and
+checks the results, the per-domain limit and that a second run is served from
+the cache.
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixtures import synthetic_tweets, write_tweets_csv
+import link_unfurler
+
+DEFAULT_ADDRESS = "127.0.0.1:8720"
+PAGES = 50  # Distinct final pages the short links lead to
+
+class LinkServerState:
+    def __init__(self, latency=0.0, fail_rate=0.0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.lock = threading.Lock()
+        self.requests = {}  # host and path -> times requested
+        self.failures = {}  # host and path -> times answered with an injected 503
+        self.in_flight = {}  # host -> requests in flight
+        self.max_in_flight = {}  # host -> most requests in flight at once
+        self.connections = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                'requests': sum(self.requests.values()),
+                'urls': len(self.requests),
+                'failed': sum(self.failures.values()),
+                # Retries of an injected 503 don't count as repeats
+                'repeated_urls': sum(1 for key, count in self.requests.items() if count - self.failures.get(key, 0) > 1),
+                'connections': self.connections,
+                'max_in_flight': dict(self.max_in_flight),
+            }
+
+class LinkHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep connections alive like real sites
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.state.lock:
+            self.server.state.connections += 1
+
+    def reply(self, status, body=b"", headers=None):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        state = self.server.state
+        host = self.headers.get('Host', '')
+        with state.lock:
+            key = host + self.path
+            state.requests[key] = state.requests.get(key, 0) + 1
+            state.in_flight[host] = state.in_flight.get(host, 0) + 1
+            state.max_in_flight[host] = max(state.max_in_flight.get(host, 0), state.in_flight[host])
+        try:
+            if state.latency:
+                time.sleep(state.latency)
+            parts = self.path.strip('/').split('/')
+            if self.path == '/stats':
+                self.reply(200, json.dumps(state.stats()).encode('utf-8'), {'Content-Type': 'application/json'})
+            elif state.fail_rate and random.random() < state.fail_rate:
+                with state.lock:
+                    state.failures[key] = state.failures.get(key, 0) + 1
+                self.reply(503, b"unavailable", {'Content-Type': 'text/plain'})
+            elif len(parts) == 2 and parts[0] == 's' and parts[1].isdigit():
+                # Short link: redirect to the tracking hop, which redirects to the page
+                self.reply(301, b"", {'Location': f"/hop/{parts[1]}"})
+            elif len(parts) == 2 and parts[0] == 'hop' and parts[1].isdigit():
+                self.reply(302, b"", {'Location': f"/page/{int(parts[1]) % PAGES}"})
+            elif len(parts) == 2 and parts[0] == 'page' and parts[1].isdigit():
+                body = (f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>Page {parts[1]} &amp; more</title>"
+                        f"</head><body>{'<p>filler</p>' * 200}</body></html>").encode('utf-8')
+                self.reply(200, body, {'Content-Type': 'text/html; charset=utf-8'})
+            else:
+                self.reply(404, b"<html><head><title>Not found</title></head></html>", {'Content-Type': 'text/html'})
+        finally:
+            with state.lock:
+                state.in_flight[host] -= 1
+
+def start_server(state, address=DEFAULT_ADDRESS):
+    """Run the server in a background thread and return it."""
+    host, port = address.rsplit(':', 1)
+    server = ThreadingHTTPServer((host, int(port)), LinkHandler)
+    server.daemon_threads = True
+    server.state = state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def display_link(url):
+    """A link as X shows it in the text: without the scheme and cut off with "…" when long."""
+    shown = url.split('://', 1)[1]
+    return shown if len(shown) <= 20 else shown[:20] + link_unfurler.ELLIPSIS
+
+def linked_tweets(count, address, short_links, seed=42):
+    """Synthetic tweets linking to short links of the server under two host names.
+
+    Most have the links in the links column and only their display form in the text, like the scrapers write
+    them; the rest are in the older format without that column, some with a link cut off in the text.
+    """
+    rng = random.Random(seed)
+    port = address.rsplit(':', 1)[1]
+    hosts = [f"127.0.0.1:{port}", f"localhost:{port}"]
+    tweets = synthetic_tweets(count)
+    for tweet in tweets:
+        # Only link to the server, not to the fixture's example.com and t.co links
+        tweet['text'] = " ".join(word for word in tweet['text'].split(" ") if "://" not in word)
+        links = [f"http://{rng.choice(hosts)}/s/{rng.randrange(short_links)}" for _ in range(rng.randint(0, 2))]
+        if rng.random() < 0.05:
+            links.append(f"http://{hosts[0]}/gone/{rng.randrange(10)}")
+        if rng.random() < 0.9:
+            tweet['links'] = " ".join(links)
+            tweet['text'] = " ".join([tweet['text']] + [display_link(link) for link in links])
+        else:
+            if links and rng.random() < 0.5:
+                links[-1] = links[-1][:-1] + link_unfurler.ELLIPSIS
+            tweet['text'] = " ".join([tweet['text']] + links)
+    return tweets
+
+def self_test(state, address, tweets, short_links, concurrency, per_domain):
+    """Unfurl synthetic tweets twice and check the results, the limits and the cache."""
+    server = start_server(state, address)
+    with tempfile.TemporaryDirectory() as directory:
+        csv_file = os.path.join(directory, "benchuser_tweets_20240101_000000.csv")
+        cache_file = os.path.join(directory, "link_cache.sqlite")
+        write_tweets_csv(csv_file, linked_tweets(tweets, address, short_links))
+
+        start = time.perf_counter()
+        output = link_unfurler.unfurl_files([csv_file], cache_file, concurrency, per_domain)[csv_file]
+        elapsed = time.perf_counter() - start
+        first = state.stats()
+
+        wrong = failed = 0
+        with open(output, 'r', encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                links = link_unfurler.tweet_links(row)
+                finals = row['expanded_urls'].split()
+                titles = row['link_titles'].split(link_unfurler.TITLE_SEPARATOR) if links else []
+                statuses = row['link_status'].split()
+                for url, final, title, status in zip(links, finals, titles, statuses):
+                    failed += status in ('503', 'error')
+                    if url.endswith(link_unfurler.ELLIPSIS):
+                        wrong += status != link_unfurler.TRUNCATED
+                    # Links still answered with an injected 503 after the retries are expected to fail
+                    elif '/s/' in url and status != '503':
+                        page = int(url.rsplit('/', 1)[1]) % PAGES
+                        wrong += not (final.endswith(f"/page/{page}") and title == f"Page {page} & more")
+                wrong += len(finals) != len(links)
+
+        link_unfurler.unfurl_files([csv_file], cache_file, concurrency, per_domain)
+        second = state.stats()
+    server.shutdown()
+
+    print(f"Unfurled in {elapsed:.2f}s with {first['requests']} requests over {first['connections']} connections")
+    print(f"URLs requested more than once: {first['repeated_urls']}, wrong results: {wrong}")
+    print(f"Injected 503s: {first['failed']}, links left failed: {failed}")
+    print(f"Most requests in flight per host: {first['max_in_flight']} (limit {per_domain})")
+    print(f"Requests on the cached second run: {second['requests'] - first['requests']}")
+    return (wrong == 0 and first['repeated_urls'] == 0 and second['requests'] == first['requests']
+            and all(count <= per_domain for count in first['max_in_flight'].values()))
+
+def main():
+    parser = argparse.ArgumentParser(description='Stand-in link targets for the link unfurler')
+    parser.add_argument('--address', default=DEFAULT_ADDRESS, help=f'HOST:PORT to listen on (default: {DEFAULT_ADDRESS})')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds before each response (default: 0)')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='Fraction of requests answered with 503 (default: 0)')
+    parser.add_argument('--self-test', type=int, metavar='TWEETS',
+                        help='Unfurl this many synthetic tweets linking to the server and check the results')
+    parser.add_argument('--short-links', type=int, default=500,
+                        help='Distinct short links the --self-test tweets pick from (default: 500)')
+    parser.add_argument('--concurrency', type=int, default=link_unfurler.CONCURRENCY,
+                        help=f'Unfurler requests in flight for --self-test (default: {link_unfurler.CONCURRENCY})')
+    parser.add_argument('--per-domain', type=int, default=link_unfurler.PER_DOMAIN,
+                        help=f'Unfurler requests in flight per host for --self-test (default: {link_unfurler.PER_DOMAIN})')
+    args = parser.parse_args()
+
+    state = LinkServerState(args.latency, args.fail_rate)
+    if args.self_test:
+        ok = self_test(state, args.address, args.self_test, args.short_links, args.concurrency, args.per_domain)
+        sys.exit(0 if ok else 1)
+
+    server = start_server(state, args.address)
+    print(f"Serving short links at http://{args.address}/s/<n> (GET /stats for counters). Press Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(f"\n{json.dumps(state.stats())}")
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for an X timeline.
+Serves an infinite-scroll timeline of synthetic tweets with configurable
+latency, page size, total tweet count, DOM virtualization, injected login walls
+and rate-limit responses, so the scrapers' scroll loop can be exercised and
+timed without touching x.com. Point TARGET_URL (or --target-url) at
+http://HOST:PORT/<username>/with_replies and LOGIN_URL at http://HOST:PORT/login.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fixtures import article_html, synthetic_tweets
+
+DEFAULT_ADDRESS = "127.0.0.1:8700"
+DEFAULT_USERNAME = "mockuser"
+
+LOGIN_WALL_HTML = (
+    '<div id="login-wall" role="dialog" style="position:fixed;bottom:0;left:0;right:0;background:#1d9bf0;padding:20px">'
+    '<span>Don’t miss what’s happening</span> '
+    '<a href="/login"><span>Log in</span></a> <a href="/i/flow/signup"><span>Sign up</span></a></div>'
+)
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8"><title>Mock timeline</title>
+<style>article {{ display: block; min-height: 150px; border-bottom: 1px solid #ccc; }}</style></head>
+<body><div id="react-root"><main role="main"><div aria-label="Timeline: Posts">
+<div id="spacer"></div><div id="timeline">{articles}</div><div id="status"></div>
+</div></main></div>{wall}
+<script>
+let cursor = {cursor};
+let done = {done};
+let loading = false;
+const virtualize = {virtualize};
+const timeline = document.getElementById('timeline');
+const spacer = document.getElementById('spacer');
+const status = document.getElementById('status');
+let recycledHeight = 0;
+
+async function loadMore() {{
+    if (loading || done) return;
+    loading = true;
+    try {{
+        const response = await fetch('/api/timeline?cursor=' + cursor);
+        if (response.status === 429) {{
+            status.innerHTML = '<span>Something went wrong. Try reloading.</span>';
+            return;
+        }}
+        const data = await response.json();
+        if (data.login_wall) {{
+            if (!document.getElementById('login-wall')) document.body.insertAdjacentHTML('beforeend', {wall_html});
+            done = true;
+            return;
+        }}
+        status.innerHTML = '';
+        timeline.insertAdjacentHTML('beforeend', data.html);
+        cursor = data.next;
+        done = data.done;
+        // Recycle the oldest articles like X does, keeping the scroll position with a spacer
+        while (virtualize && timeline.children.length > virtualize) {{
+            recycledHeight += timeline.firstElementChild.offsetHeight;
+            timeline.firstElementChild.remove();
+        }}
+        spacer.style.height = recycledHeight + 'px';
+    }} finally {{
+        loading = false;
+    }}
+}}
+
+window.addEventListener('scroll', () => {{
+    if (window.innerHeight + window.scrollY >= document.body.scrollHeight - 1500) loadMore();
+}});
+</script></body></html>
+"""
+
+LOGIN_PAGE = """<!DOCTYPE html><html><head><title>Log in</title></head><body>
+<form action="{action}" method="get"><input name="{field}" type="{type}" autocomplete="off"></form>
+</body></html>"""
+
+class MockTimeline:
+    """Tweets and behavior of the mock timeline, plus what it has served so far."""
+
+    def __init__(self, total=1000, page_size=20, latency=0.0, jitter=0.0, virtualize=0,
+                 login_wall_after=None, rate_limit_every=0, username=DEFAULT_USERNAME, seed=42):
+        self.tweets = synthetic_tweets(total, username, seed)
+        self.page_size = page_size
+        self.latency = latency
+        self.jitter = jitter
+        self.virtualize = virtualize
+        self.login_wall_after = login_wall_after
+        self.rate_limit_every = rate_limit_every
+        self.username = username
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget the sessions and counters of previous runs."""
+        with self.lock:
+            self.served = set()
+            self.delivered = {}  # session id -> tweets delivered to it
+            self.page_loads = 0
+            self.api_requests = 0
+            self.rate_limited = 0
+            self.login_walls = 0
+            self.logins = 0
+
+    def delay(self):
+        if self.latency or self.jitter:
+            time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+    def walled(self, session, authenticated):
+        """Whether this session must log in before it sees more tweets."""
+        if authenticated or self.login_wall_after is None:
+            return False
+        return self.delivered.get(session, 0) >= self.login_wall_after
+
+    def page(self, cursor, session, authenticated, count_request=True):
+        """Return (status, payload) for the tweets starting at cursor."""
+        with self.lock:
+            if count_request:
+                self.api_requests += 1
+                if self.rate_limit_every and self.api_requests % self.rate_limit_every == 0:
+                    self.rate_limited += 1
+                    return 429, {'errors': [{'message': 'Rate limit exceeded', 'code': 88}]}
+            if self.walled(session, authenticated):
+                self.login_walls += 1
+                return 200, {'login_wall': True}
+
+            tweets = self.tweets[cursor:cursor + self.page_size]
+            self.served.update(tweet['tweet_id'] for tweet in tweets)
+            self.delivered[session] = self.delivered.get(session, 0) + len(tweets)
+        return 200, {
+            'html': "".join(article_html(tweet, self.username) for tweet in tweets),
+            'next': cursor + len(tweets),
+            'done': cursor + len(tweets) >= len(self.tweets),
+        }
+
+    def stats(self):
+        with self.lock:
+            return {
+                'total': len(self.tweets),
+                'served': len(self.served),
+                'page_loads': self.page_loads,
+                'api_requests': self.api_requests,
+                'rate_limited': self.rate_limited,
+                'login_walls': self.login_walls,
+                'logins': self.logins,
+            }
+
+class MockTimelineHandler(BaseHTTPRequestHandler):
+    """Routes: the timeline page, /api/timeline, a two-step /login flow and /__stats."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, status, body, content_type, headers=None):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_json(self, status, payload, headers=None):
+        self.send_body(status, json.dumps(payload), 'application/json', headers)
+
+    def cookies(self):
+        cookie = SimpleCookie(self.headers.get('Cookie', ''))
+        return {name: morsel.value for name, morsel in cookie.items()}
+
+    def do_GET(self):
+        timeline = self.server.timeline
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        cookies = self.cookies()
+        session = cookies.get('mock_session')
+        authenticated = cookies.get('auth_token') == 'mock'
+
+        if url.path == '/__stats':
+            self.send_json(200, timeline.stats())
+        elif url.path == '/api/timeline':
+            timeline.delay()
+            try:
+                cursor = max(0, int(query.get('cursor', ['0'])[0]))
+            except ValueError:
+                cursor = 0
+            status, payload = timeline.page(cursor, session, authenticated)
+            self.send_json(status, payload, {'Retry-After': '15'} if status == 429 else None)
+        elif url.path == '/login':
+            self.send_body(200, LOGIN_PAGE.format(action='/login/password', field='text', type='text'), 'text/html')
+        elif url.path == '/login/password':
+            self.send_body(200, LOGIN_PAGE.format(action='/login/done', field='password', type='password'), 'text/html')
+        elif url.path == '/login/done':
+            with timeline.lock:
+                timeline.logins += 1
+            self.send_response(302)
+            self.send_header('Set-Cookie', 'auth_token=mock; Path=/')
+            self.send_header('Location', f'/{timeline.username}/with_replies')
+            self.end_headers()
+        elif url.path.strip('/').split('/')[0] in (timeline.username, 'home', ''):
+            self.send_timeline(session, authenticated)
+        else:
+            self.send_body(404, '<html><body><span>This page doesn’t exist.</span></body></html>', 'text/html')
+
+    def send_timeline(self, session, authenticated):
+        timeline = self.server.timeline
+        headers = {}
+        if not session:
+            session = uuid.uuid4().hex
+            headers['Set-Cookie'] = f'mock_session={session}; Path=/'
+        with timeline.lock:
+            timeline.page_loads += 1
+
+        timeline.delay()
+        status, payload = timeline.page(0, session, authenticated, count_request=False)
+        if payload.get('login_wall'):
+            articles, cursor, done, wall = "", 0, "true", LOGIN_WALL_HTML
+        else:
+            articles, cursor, done, wall = payload['html'], payload['next'], json.dumps(payload['done']), ""
+        self.send_body(200, PAGE_TEMPLATE.format(
+            articles=articles, cursor=cursor, done=done, wall=wall,
+            virtualize=timeline.virtualize, wall_html=json.dumps(LOGIN_WALL_HTML)
+        ), 'text/html', headers)
+
+def start_server(timeline, address=DEFAULT_ADDRESS):
+    """Serve the timeline from a background thread and return the server."""
+    host, port = address.rsplit(':', 1)
+    server = ThreadingHTTPServer((host, int(port)), MockTimelineHandler)
+    server.daemon_threads = True
+    server.timeline = timeline
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def add_timeline_arguments(parser):
+    """Options shared by the server CLI and the scrape harness."""
+    parser.add_argument('--total', type=int, default=1000, help='Tweets on the timeline (default: 1000)')
+    parser.add_argument('--page-size', type=int, default=20, help='Tweets per timeline request (default: 20)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds before each response (default: 0)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Random +/- seconds added to the latency (default: 0)')
+    parser.add_argument('--virtualize', type=int, default=0,
+                        help='Keep at most this many articles in the DOM, recycling the oldest (default: 0, off)')
+    parser.add_argument('--login-wall-after', type=int, default=None,
+                        help='Show a login wall once a session has received this many tweets (0: on first load)')
+    parser.add_argument('--rate-limit-every', type=int, default=0,
+                        help='Answer every Nth timeline request with 429 Too Many Requests (default: 0, off)')
+    parser.add_argument('--username', default=DEFAULT_USERNAME, help=f'Timeline owner (default: {DEFAULT_USERNAME})')
+
+def timeline_from_args(args):
+    return MockTimeline(args.total, args.page_size, args.latency, args.jitter, args.virtualize,
+                        args.login_wall_after, args.rate_limit_every, args.username)
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a mock X timeline for local scraper testing')
+    parser.add_argument('--address', default=DEFAULT_ADDRESS, help=f'HOST:PORT to listen on (default: {DEFAULT_ADDRESS})')
+    add_timeline_arguments(parser)
+    args = parser.parse_args()
+
+    server = start_server(timeline_from_args(args), args.address)
+    print(f"Mock timeline at http://{args.address}/{args.username}/with_replies (login: http://{args.address}/login)")
+    print("Press Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(f"\n{json.dumps(server.timeline.stats())}")
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for an ingestion webhook.
+Accepts the JSON batches posted by output_sinks.HttpSink with configurable
+latency, failure rate, rate limiting and dropped connections, and counts what
+arrived. With --self-test it pushes synthetic tweets through an HttpSink and
+checks that every tweet was delivered.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixtures import synthetic_tweets
+from output_sinks import HttpSink
+
+DEFAULT_ADDRESS = "127.0.0.1:8710"
+
+class ReceiverState:
+    def __init__(self, latency=0.0, fail_rate=0.0, drop_rate=0.0, rate_limit_every=0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.drop_rate = drop_rate
+        self.rate_limit_every = rate_limit_every
+        self.lock = threading.Lock()
+        self.received = {}  # tweet id -> times received
+        self.requests = 0
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.errors_sent = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'connections': self.connections,
+                'max_in_flight': self.max_in_flight,
+                'unique_tweets': len(self.received),
+                'duplicates': sum(count - 1 for count in self.received.values()),
+                'errors_sent': self.errors_sent,
+            }
+
+class ReceiverHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep connections alive between batches
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.state.lock:
+            self.server.state.connections += 1
+
+    def reply(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.reply(200, self.server.state.stats())
+
+    def do_POST(self):
+        state = self.server.state
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with state.lock:
+            state.requests += 1
+            request_number = state.requests
+            state.in_flight += 1
+            state.max_in_flight = max(state.max_in_flight, state.in_flight)
+        try:
+            if state.latency:
+                time.sleep(state.latency)
+            if state.drop_rate and random.random() < state.drop_rate:
+                self.close_connection = True
+                return
+            if state.rate_limit_every and request_number % state.rate_limit_every == 0:
+                with state.lock:
+                    state.errors_sent += 1
+                self.reply(429, {'error': 'rate limited'}, {'Retry-After': '1'})
+                return
+            if state.fail_rate and random.random() < state.fail_rate:
+                with state.lock:
+                    state.errors_sent += 1
+                self.reply(503, {'error': 'unavailable'})
+                return
+            records = json.loads(body)
+            with state.lock:
+                for record in records:
+                    key = record.get('tweet_id')
+                    state.received[key] = state.received.get(key, 0) + 1
+            self.reply(200, {'accepted': len(records)})
+        finally:
+            with state.lock:
+                state.in_flight -= 1
+
+def start_receiver(state, address=DEFAULT_ADDRESS):
+    """Run the receiver in a background thread and return the server."""
+    host, port = address.rsplit(':', 1)
+    server = ThreadingHTTPServer((host, int(port)), ReceiverHandler)
+    server.daemon_threads = True
+    server.state = state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def self_test(state, address, tweets, batch_size, max_in_flight, scroll_batch):
+    """Push tweets through an HttpSink the way the scraper does and verify delivery."""
+    server = start_receiver(state, address)
+    sink = HttpSink(f"http://{address}/ingest", batch_size=batch_size, max_in_flight=max_in_flight, backoff=0.05)
+    records = synthetic_tweets(tweets)
+
+    start = time.perf_counter()
+    for i in range(0, len(records), scroll_batch):
+        sink.write(records[i:i + scroll_batch])
+    sink.close()
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    stats = state.stats()
+    missing = tweets - stats['unique_tweets']
+    print(f"Delivered {stats['unique_tweets']}/{tweets} tweets in {elapsed:.2f}s ({tweets / elapsed:.0f} tweets/s)")
+    print(f"Requests: {stats['requests']} over {stats['connections']} connections, "
+          f"max in flight {stats['max_in_flight']} (limit {max_in_flight})")
+    print(f"Errors injected: {stats['errors_sent']}, duplicates after retries: {stats['duplicates']}, "
+          f"given up: {sink.failed}, missing: {missing}")
+    return missing == 0 and stats['max_in_flight'] <= max_in_flight
+
+def main():
+    parser = argparse.ArgumentParser(description='Stand-in webhook receiver for the HTTP output sink')
+    parser.add_argument('--address', default=DEFAULT_ADDRESS, help=f'HOST:PORT to listen on (default: {DEFAULT_ADDRESS})')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds before each response (default: 0)')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='Fraction of requests answered with 503 (default: 0)')
+    parser.add_argument('--drop-rate', type=float, default=0.0,
+                        help='Fraction of requests whose connection is dropped without a response (default: 0)')
+    parser.add_argument('--rate-limit-every', type=int, default=0, help='Answer every Nth request with 429 (default: 0, off)')
+    parser.add_argument('--self-test', type=int, metavar='TWEETS',
+                        help='Push this many synthetic tweets through an HttpSink and check delivery')
+    parser.add_argument('--batch-size', type=int, default=100, help='HttpSink batch size for --self-test (default: 100)')
+    parser.add_argument('--max-in-flight', type=int, default=4, help='HttpSink in-flight limit for --self-test (default: 4)')
+    parser.add_argument('--scroll-batch', type=int, default=20,
+                        help='Tweets handed to the sink per write, like one scroll (default: 20)')
+    args = parser.parse_args()
+
+    state = ReceiverState(args.latency, args.fail_rate, args.drop_rate, args.rate_limit_every)
+    if args.self_test:
+        ok = self_test(state, args.address, args.self_test, args.batch_size, args.max_in_flight, args.scroll_batch)
+        sys.exit(0 if ok else 1)
+
+    server = start_receiver(state, args.address)
+    print(f"Receiving batches at http://{args.address}/ (GET for counters). Press Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(f"\n{json.dumps(state.stats())}")
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
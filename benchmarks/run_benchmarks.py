@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the scraper and analyzer hot paths.
+Times tweet extraction in both scraper modules, the BeautifulSoup page_source
+path against the JavaScript JSON path, CSV saving and the analyzer on synthetic
+fixtures, and stores the results as JSON so runs can be compared.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+import analyze_tweets
+import tweet_columns
+import twitter_scraper
+import twitter_scraper_undetected
+from fixtures import synthetic_tweets, timeline_html, write_tweets_csv
+from tweet_tokenizer import tokenize
+
+USERNAME = "benchuser"
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+def measure(func, repeat, setup=None):
+    """Run func `repeat` times and return the elapsed times in seconds."""
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        # Silence the progress prints of the code under test
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+    return times
+
+def record(results, name, size, times):
+    best = min(times)
+    result = {
+        'name': name,
+        'size': size,
+        'repeat': len(times),
+        'best_s': best,
+        'median_s': statistics.median(times),
+        'per_item_us': best / size * 1e6,
+    }
+    results.append(result)
+    print(f"{name:<48} {size:>9,}  best {best:9.4f}s  {result['per_item_us']:9.2f} µs/item")
+
+def bench_extraction(results, page_size, repeat):
+    """extract_tweet_data() of both modules and the full page_source path for one page."""
+    tweets = synthetic_tweets(page_size, USERNAME)
+    html = timeline_html(tweets, USERNAME)
+    articles = BeautifulSoup(html, 'html.parser').find_all('article')
+
+    for module in (twitter_scraper, twitter_scraper_undetected):
+        record(results, f"extract_tweet_data[{module.__name__}]", page_size, measure(
+            lambda: [module.extract_tweet_data(article, USERNAME) for article in articles], repeat))
+
+    def page_source_path():
+        soup = BeautifulSoup(html, 'html.parser')
+        return [twitter_scraper.extract_tweet_data(article, USERNAME) for article in soup.find_all('article')]
+    record(results, "page_source[bs4 parse + extract]", page_size, measure(page_source_path, repeat))
+
+    # The JavaScript path moves the same records to Python as JSON; without a
+    # browser this times the Python side of it, decoding the payload
+    payload = json.dumps(tweets)
+    record(results, "js_path[json decode]", page_size, measure(lambda: json.loads(payload), repeat))
+
+def bench_browser(results, page_size, repeat):
+    """Compare page_source + BeautifulSoup with extract_tweets_using_js() in headless Chrome."""
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
+    tweets = synthetic_tweets(page_size, USERNAME)
+    with tempfile.TemporaryDirectory() as tmp:
+        page = os.path.join(tmp, "timeline.html")
+        with open(page, 'w', encoding='utf-8') as f:
+            f.write(timeline_html(tweets, USERNAME))
+
+        options = Options()
+        options.add_argument("--headless=new")
+        options.add_argument("--no-sandbox")
+        try:
+            driver = webdriver.Chrome(options=options)
+        except Exception as e:
+            print(f"Skipping browser benchmarks, Chrome could not be started: {e}")
+            return
+        try:
+            driver.get(f"file://{page}")
+
+            def page_source_path():
+                soup = BeautifulSoup(driver.page_source, 'html.parser')
+                return [twitter_scraper.extract_tweet_data(article, USERNAME) for article in soup.find_all('article')]
+            record(results, "browser[page_source + bs4]", page_size, measure(page_source_path, repeat))
+            record(results, "browser[extract_tweets_using_js]", page_size, measure(
+                lambda: twitter_scraper_undetected.extract_tweets_using_js(driver, USERNAME), repeat))
+        finally:
+            driver.quit()
+
+def bench_rows(results, rows, repeat, workdir):
+    """CSV saving, tokenizing and the analyzer on `rows` tweets."""
+    tweets = synthetic_tweets(rows, USERNAME)
+    path = os.path.join(workdir, f"{USERNAME}_tweets_{rows}.csv")
+
+    def remove_output():
+        if os.path.exists(path):
+            os.remove(path)
+    record(results, "save_tweets_to_csv", rows, measure(
+        lambda: twitter_scraper.save_tweets_to_csv(tweets, path), repeat, setup=remove_output))
+
+    record(results, "tokenize", rows, measure(lambda: [tokenize(tweet['text']) for tweet in tweets], repeat))
+    del tweets
+
+    remove_output()
+    write_tweets_csv(path, synthetic_tweets(rows, USERNAME))
+    record(results, "load_tweets", rows, measure(lambda: analyze_tweets.load_tweets(path), repeat))
+
+    loaded = analyze_tweets.load_tweets(path)
+    record(results, "print_stats", rows, measure(lambda: analyze_tweets.print_stats(loaded), repeat))
+    del loaded
+
+    cache_dir = tweet_columns.sidecar_path(path)
+    record(results, "column_cache_build", rows, measure(
+        lambda: tweet_columns.build_columns(path), repeat, setup=lambda: shutil.rmtree(cache_dir, ignore_errors=True)))
+    record(results, "print_stats_column_cache", rows, measure(
+        lambda: analyze_tweets.print_stats(tweet_columns.open_columns(path)), repeat))
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    remove_output()
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def compare(results, baseline_file, tolerance):
+    """Print the change against a previous run; return the benchmarks that got slower than tolerance."""
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = {(r['name'], r['size']): r for r in json.load(f)['results']}
+
+    regressions = []
+    print(f"\nCompared with {baseline_file}:")
+    for result in results:
+        old = baseline.get((result['name'], result['size']))
+        if not old:
+            continue
+        change = result['best_s'] / old['best_s'] - 1
+        flag = ""
+        if change > tolerance:
+            flag = "  <-- REGRESSION"
+            regressions.append(result)
+        print(f"{result['name']:<48} {result['size']:>9,}  {change:+7.1%}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark scraper and analyzer hot paths')
+    parser.add_argument('--rows', default='1000,100000,1000000',
+                        help='Comma-separated row counts for CSV and analyzer benchmarks (default: 1000,100000,1000000)')
+    parser.add_argument('--page-sizes', default='50,500',
+                        help='Comma-separated articles per timeline page for extraction (default: 50,500)')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per benchmark, best is reported (default: 5)')
+    parser.add_argument('--browser', action='store_true',
+                        help='Also compare page_source parsing with the JavaScript path in headless Chrome')
+    parser.add_argument('--output', help=f'Results file (default: {RESULTS_DIR}/<timestamp>.json)')
+    parser.add_argument('--compare', metavar='RESULTS', help='Compare with a previous results file')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='Slowdown counted as a regression with --compare (default: 0.10)')
+    args = parser.parse_args()
+
+    results = []
+    for page_size in [int(n) for n in args.page_sizes.split(',') if n]:
+        bench_extraction(results, page_size, args.repeat)
+        if args.browser:
+            bench_browser(results, page_size, args.repeat)
+
+    workdir = tempfile.mkdtemp(prefix="tweet_bench_")
+    try:
+        for rows in [int(n) for n in args.rows.split(',') if n]:
+            # A million rows takes long enough that one run is representative
+            bench_rows(results, rows, args.repeat if rows < 1000000 else 1, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'results': results,
+        }, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare and compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
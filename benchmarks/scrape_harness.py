@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+End-to-end scraper runs against the mock timeline server.
+Runs scrape_tweets() of the chosen scraper modules with each pause time against
+a local mock timeline and reports tweets/sec, tweets the server delivered but
+the scraper missed, and duplicate rows in the output file.
+"""
+
+import argparse
+import contextlib
+import csv
+import importlib
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import driver_watchdog
+import scraper_logging
+from mock_timeline_server import DEFAULT_ADDRESS, add_timeline_arguments, start_server, timeline_from_args
+
+SCRAPERS = {
+    'standard': 'twitter_scraper',
+    'undetected': 'twitter_scraper_undetected',
+}
+
+def count_output_rows(path):
+    """Return (rows, unique tweet ids) of a scraper output file."""
+    if not os.path.exists(path):
+        return 0, 0
+    with open(path, 'r', encoding='utf-8') as f:
+        ids = [row['tweet_id'] for row in csv.DictReader(f)]
+    return len(ids), len(set(ids))
+
+def run_once(module, timeline, address, pause_time, args, workdir):
+    """Scrape the mock timeline once and measure the result."""
+    timeline.reset()
+    output_file = os.path.join(workdir, f"{module.__name__}_{pause_time}.csv")
+    module.TWITTER_USERNAME = timeline.username
+    module.TARGET_URL = f"http://{address}/{timeline.username}/with_replies"
+    module.LOGIN_URL = f"http://{address}/login"
+    module.OUTPUT_FILE = output_file
+    module.MAX_SCROLLS = args.max_scrolls
+    module.SCROLL_PAUSE_TIME = pause_time
+    module.SCROLL_VARIATION = args.variation
+    module.BROWSER_POOL = args.browser_pool
+    # The mock login form accepts anything
+    module.AUTO_LOGIN = True
+    module.TWITTER_EMAIL = "mock@example.com"
+    module.TWITTER_PASSWORD = "mock"
+
+    log = io.StringIO()
+    with contextlib.redirect_stdout(sys.stdout if args.verbose else log):
+        driver = module.setup_driver()
+        if module.WATCHDOG:
+            driver = driver_watchdog.WatchedDriver(driver, module.setup_driver, module.COMMAND_TIMEOUT, module.MAX_RESTARTS)
+        try:
+            start = time.perf_counter()
+            tweets = module.scrape_tweets(driver, timeline.username)
+            elapsed = time.perf_counter() - start
+            if tweets:
+                module.save_tweets_to_csv(tweets, output_file)
+        finally:
+            driver.quit()
+            if getattr(driver, 'pool_lease', None):
+                driver.pool_lease.close()
+
+    scraped = {tweet['tweet_id'] for tweet in tweets}
+    rows, unique_rows = count_output_rows(output_file)
+    stats = timeline.stats()
+    return {
+        'scraper': module.__name__,
+        'pause_time': pause_time,
+        'seconds': elapsed,
+        'tweets': len(scraped),
+        'tweets_per_sec': len(scraped) / elapsed if elapsed else 0.0,
+        'missed': len(timeline.served - scraped),
+        'never_loaded': stats['total'] - stats['served'],
+        'duplicate_tweets': len(tweets) - len(scraped),
+        'duplicate_rows': rows - unique_rows,
+        'browser_restarts': getattr(driver, 'restarts', 0),
+        'server': stats,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure scraper throughput against the mock timeline server')
+    parser.add_argument('--scrapers', default='standard', help=f'Comma-separated of {", ".join(SCRAPERS)} (default: standard)')
+    parser.add_argument('--pause-times', default='2.5',
+                        help='Comma-separated SCROLL_PAUSE_TIME values to try (default: 2.5)')
+    parser.add_argument('--variation', type=float, default=0.0, help='SCROLL_VARIATION during the runs (default: 0)')
+    parser.add_argument('--max-scrolls', type=int, default=100, help='MAX_SCROLLS during the runs (default: 100)')
+    parser.add_argument('--address', default=DEFAULT_ADDRESS, help=f'HOST:PORT for the mock server (default: {DEFAULT_ADDRESS})')
+    parser.add_argument('--browser-pool', default=None, metavar='HOST:PORT', help='Claim browsers from a browser_pool.py daemon')
+    parser.add_argument('--json-out', metavar='PATH', help='Also write the results as JSON')
+    parser.add_argument('--verbose', action='store_true', help="Show the scrapers' own output")
+    add_timeline_arguments(parser)
+    args = parser.parse_args()
+    # The scrapers log instead of printing
+    if args.verbose:
+        scraper_logging.setup_logging()
+    else:
+        logging.disable(logging.CRITICAL)
+
+    modules = [importlib.import_module(SCRAPERS[name]) for name in args.scrapers.split(',') if name]
+    timeline = timeline_from_args(args)
+    server = start_server(timeline, args.address)
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="scrape_harness_") as workdir:
+        try:
+            for module in modules:
+                for pause_time in [float(p) for p in args.pause_times.split(',') if p]:
+                    result = run_once(module, timeline, args.address, pause_time, args, workdir)
+                    results.append(result)
+                    print(f"{result['scraper']:<28} pause {pause_time:>4.1f}s  {result['tweets']:>6} tweets "
+                          f"in {result['seconds']:7.1f}s  {result['tweets_per_sec']:6.2f}/s  "
+                          f"missed {result['missed']:>5}  never loaded {result['never_loaded']:>5}  "
+                          f"duplicate rows {result['duplicate_rows']:>5}  "
+                          f"429s {result['server']['rate_limited']}  walls {result['server']['login_walls']}  "
+                          f"restarts {result['browser_restarts']}")
+        finally:
+            server.shutdown()
+
+    if args.json_out:
+        with open(args.json_out, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json_out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Pre-warmed browser pool daemon.
+Keeps a number of Chrome instances started with remote debugging enabled so that
+scraper runs can claim one and attach to it instead of paying Chrome's startup cost.
+
+A claim is held for as long as the client keeps its connection open; when the
+connection closes the browser is shut down and a fresh one is started in its place.
+
+Browsers get the same Chrome arguments as the Selenium scraper's own. With
+--undetected they are started through undetected-chromedriver instead, for
+twitter_scraper_undetected.py; a pool only hands out browsers of its own kind.
+"""
+
+import argparse
+import json
+import shutil
+import socket
+import socketserver
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.request
+
+import driver_cache
+from driver_cache import find_chrome_binary
+
+DEFAULT_ADDRESS = "127.0.0.1:9300"
+BROWSER_START_TIMEOUT = 30
+
+DEFAULT_CHROME_ARGS = driver_cache.chrome_arguments() + [
+    "--no-first-run",
+    "--no-default-browser-check",
+]
+
+# undetected-chromedriver patches its driver binary on first use; one browser starts at a time so two don't race
+_undetected_start_lock = threading.Lock()
+
+def parse_address(address):
+    """Split a "host:port" string into a (host, port) tuple."""
+    host, _, port = address.rpartition(':')
+    return host or "127.0.0.1", int(port)
+
+def _free_port():
+    """Ask the OS for a free local TCP port."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+class PooledBrowser:
+    """A Chrome process listening on a remote debugging port."""
+
+    def __init__(self, chrome_path, extra_args):
+        self.port = _free_port()
+        self.profile_dir = tempfile.mkdtemp(prefix="twitter_scraper_pool_")
+        args = [
+            chrome_path,
+            f"--remote-debugging-port={self.port}",
+            f"--user-data-dir={self.profile_dir}",
+            *DEFAULT_CHROME_ARGS,
+            *extra_args,
+            "about:blank",
+        ]
+        self.process = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    @property
+    def debugger_address(self):
+        return f"127.0.0.1:{self.port}"
+
+    def wait_until_ready(self, timeout=BROWSER_START_TIMEOUT):
+        """Block until the DevTools endpoint answers, return True on success."""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                return False
+            try:
+                with urllib.request.urlopen(f"http://{self.debugger_address}/json/version", timeout=2):
+                    return True
+            except OSError:
+                time.sleep(0.2)
+        return False
+
+    def is_alive(self):
+        return self.process.poll() is None
+
+    def close(self):
+        """Terminate Chrome and remove its temporary profile."""
+        try:
+            self.process.terminate()
+            self.process.wait(timeout=10)
+        except Exception:
+            self.process.kill()
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+class UndetectedPooledBrowser:
+    """A Chrome started through undetected-chromedriver, with the undetected scraper's arguments.
+
+    undetected-chromedriver launches Chrome itself with a remote debugging port and its own flags; the
+    scraper attaches to that port with its cached patched driver, as it does to a browser it started.
+    """
+
+    def __init__(self, chrome_path, extra_args):
+        import undetected_chromedriver as uc
+
+        chrome_version = driver_cache.get_chrome_version(chrome_path)
+        options = uc.ChromeOptions()
+        for argument in [*driver_cache.chrome_arguments(undetected=True), *extra_args]:
+            options.add_argument(argument)
+        with _undetected_start_lock:
+            self.driver = uc.Chrome(
+                options=options,
+                use_subprocess=True,
+                browser_executable_path=chrome_path,
+                driver_executable_path=driver_cache.get_cached_driver('undetected', chrome_version),
+                version_main=driver_cache.chrome_major_version(chrome_version)
+            )
+        self.port = int(self.driver.options.debugger_address.rpartition(':')[2])
+
+    @property
+    def debugger_address(self):
+        return f"127.0.0.1:{self.port}"
+
+    def wait_until_ready(self, timeout=BROWSER_START_TIMEOUT):
+        # uc.Chrome() only returns once its driver is connected to the browser
+        return True
+
+    def is_alive(self):
+        try:
+            with urllib.request.urlopen(f"http://{self.debugger_address}/json/version", timeout=2):
+                return True
+        except OSError:
+            return False
+
+    def close(self):
+        """Quit the browser; undetected-chromedriver removes its temporary profile."""
+        try:
+            self.driver.quit()
+        except Exception:
+            pass
+
+class BrowserPool:
+    """Keeps `size` idle browsers ready and hands them out on request."""
+
+    def __init__(self, size, chrome_path=None, extra_args=None, undetected=False):
+        self.size = size
+        self.chrome_path = chrome_path or find_chrome_binary()
+        if not self.chrome_path:
+            raise RuntimeError("Could not find a Chrome installation for the browser pool")
+        self.extra_args = list(extra_args or [])
+        self.undetected = undetected
+        self.idle = []
+        self.in_use = []
+        self.starting = 0
+        self.condition = threading.Condition()
+        self.closed = False
+
+    def _start_browser(self):
+        """Start one browser and add it to the idle list once it is ready."""
+        browser_class = UndetectedPooledBrowser if self.undetected else PooledBrowser
+        try:
+            browser = browser_class(self.chrome_path, self.extra_args)
+        except Exception as e:
+            print(f"Browser failed to start: {e}")
+            return
+        if not browser.wait_until_ready():
+            print(f"Browser on port {browser.port} failed to start")
+            browser.close()
+            return
+        with self.condition:
+            if self.closed:
+                browser.close()
+                return
+            self.idle.append(browser)
+            self.condition.notify_all()
+        print(f"Browser ready on {browser.debugger_address} ({len(self.idle)} idle)")
+
+    def replenish(self):
+        """Start browsers in the background until the pool is back to its target size."""
+        with self.condition:
+            missing = max(0, self.size - len(self.idle) - self.starting)
+            self.starting += missing
+
+        def start_one():
+            try:
+                self._start_browser()
+            finally:
+                with self.condition:
+                    self.starting -= 1
+
+        for _ in range(missing):
+            threading.Thread(target=start_one, daemon=True).start()
+
+    def claim(self, timeout=BROWSER_START_TIMEOUT):
+        """Take an idle browser, waiting for one to become ready if necessary."""
+        deadline = time.time() + timeout
+        with self.condition:
+            while True:
+                # Drop browsers that died while idle
+                self.idle = [b for b in self.idle if b.is_alive()]
+                if self.idle:
+                    browser = self.idle.pop(0)
+                    self.in_use.append(browser)
+                    break
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    browser = None
+                    break
+                self.condition.wait(min(remaining, 1.0))
+        self.replenish()
+        return browser
+
+    def release(self, browser):
+        """Shut down a browser that a client has finished with."""
+        with self.condition:
+            if browser not in self.in_use:
+                return
+            self.in_use.remove(browser)
+        browser.close()
+
+    def status(self):
+        with self.condition:
+            return {
+                'size': self.size,
+                'undetected': self.undetected,
+                'idle': len(self.idle),
+                'claimed': len(self.in_use),
+                'starting': self.starting,
+            }
+
+    def shutdown(self):
+        with self.condition:
+            self.closed = True
+            browsers = self.idle + self.in_use
+            self.idle, self.in_use = [], []
+        for browser in browsers:
+            browser.close()
+
+class PoolRequestHandler(socketserver.StreamRequestHandler):
+    """Line-delimited JSON protocol: {"cmd": "claim", "undetected": false} or {"cmd": "status"}."""
+
+    def handle(self):
+        pool = self.server.pool
+        claimed = []
+        try:
+            for line in self.rfile:
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    self._reply({'error': 'invalid request'})
+                    continue
+
+                cmd = request.get('cmd')
+                if cmd == 'claim' and bool(request.get('undetected')) != pool.undetected:
+                    # A browser of the other kind would lack the arguments or the patches the scraper relies on
+                    kind, flag = ("undetected-chromedriver", "without") if pool.undetected else ("plain Chrome", "with")
+                    self._reply({'error': f'this pool starts {kind} browsers; use a pool started {flag} --undetected'})
+                elif cmd == 'claim':
+                    browser = pool.claim()
+                    if browser:
+                        claimed.append(browser)
+                        self._reply({'debugger_address': browser.debugger_address})
+                    else:
+                        self._reply({'error': 'no browser available'})
+                elif cmd == 'status':
+                    self._reply(pool.status())
+                else:
+                    self._reply({'error': f'unknown command: {cmd}'})
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            # The client is gone, so are its claims
+            for browser in claimed:
+                pool.release(browser)
+
+    def _reply(self, payload):
+        self.wfile.write((json.dumps(payload) + "\n").encode('utf-8'))
+        self.wfile.flush()
+
+class BrowserPoolServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, pool):
+        self.pool = pool
+        super().__init__(address, PoolRequestHandler)
+
+def claim_browser(address, undetected=False, timeout=BROWSER_START_TIMEOUT + 5):
+    """Claim a browser from a running pool daemon, started through undetected-chromedriver if undetected.
+
+    Returns (debugger_address, connection). Keep the connection open for as long
+    as the browser is in use; closing it hands the browser back to the pool.
+    """
+    conn = socket.create_connection(parse_address(address), timeout=timeout)
+    conn.sendall((json.dumps({'cmd': 'claim', 'undetected': undetected}) + "\n").encode('utf-8'))
+    reply = json.loads(conn.makefile('r', encoding='utf-8').readline() or '{}')
+    if 'debugger_address' not in reply:
+        conn.close()
+        raise RuntimeError(f"Browser pool could not provide a browser: {reply.get('error', 'no reply')}")
+    conn.settimeout(None)
+    return reply['debugger_address'], conn
+
+def pool_status(address):
+    """Return the status dictionary of a running pool daemon."""
+    with socket.create_connection(parse_address(address), timeout=10) as conn:
+        conn.sendall(b'{"cmd": "status"}\n')
+        return json.loads(conn.makefile('r', encoding='utf-8').readline() or '{}')
+
+def main():
+    parser = argparse.ArgumentParser(description='Keep pre-warmed Chrome instances ready for scraper runs')
+    parser.add_argument('--size', type=int, default=2, help='Number of idle browsers to keep ready (default: 2)')
+    parser.add_argument('--address', default=DEFAULT_ADDRESS, help=f'host:port to listen on (default: {DEFAULT_ADDRESS})')
+    parser.add_argument('--chrome', default=None, help='Path to the Chrome binary (default: auto-detect)')
+    parser.add_argument('--headless', action='store_true', help='Start the pooled browsers headless')
+    parser.add_argument('--undetected', action='store_true',
+                        help='Start the browsers through undetected-chromedriver, for twitter_scraper_undetected.py')
+    parser.add_argument('--chrome-arg', action='append', default=[], help='Extra Chrome argument (repeatable)')
+    parser.add_argument('--status', action='store_true', help='Print the status of a running pool and exit')
+    args = parser.parse_args()
+
+    if args.status:
+        print(json.dumps(pool_status(args.address), indent=2))
+        return
+
+    extra_args = list(args.chrome_arg)
+    if args.headless:
+        extra_args.append("--headless=new")
+
+    pool = BrowserPool(args.size, chrome_path=args.chrome, extra_args=extra_args, undetected=args.undetected)
+    server = BrowserPoolServer(parse_address(args.address), pool)
+    print(f"Browser pool listening on {args.address}, keeping {args.size} browsers ready")
+    pool.replenish()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Shutting down browser pool...")
+    finally:
+        server.server_close()
+        pool.shutdown()
+
+if __name__ == "__main__":
+    main()
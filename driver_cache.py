@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Resolved ChromeDriver cache for the Twitter scrapers.
+Remembers the installed Chrome version and the driver binary that works with it,
+so warm starts skip webdriver-manager's network lookups and the version shell-out.
+"""
+
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import sys
+
+CACHE_DIR = os.environ.get(
+    'TWITTER_SCRAPER_CACHE',
+    os.path.join(os.path.expanduser("~"), ".cache", "twitter_scraper")
+)
+CACHE_FILE = os.path.join(CACHE_DIR, "drivers.json")
+
+VERSION_PATTERN = re.compile(r'(\d+)\.(\d+)\.(\d+)\.(\d+)')
+
+# Arguments the scrapers start Chrome with; browser_pool.py starts its browsers with the same ones
+CHROME_ARGS = [
+    "--window-size=1920,1080",
+    "--disable-notifications",
+    "--disable-infobars",
+    "--mute-audio",
+]
+# The Selenium scraper poses as a regular desktop Chrome; undetected-chromedriver takes care of that itself
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+              "Chrome/90.0.4430.212 Safari/537.36")
+
+logger = logging.getLogger(__name__)
+
+def chrome_arguments(undetected=False):
+    """The Chrome command line arguments of the Selenium scraper, or of the undetected one."""
+    if undetected:
+        return list(CHROME_ARGS)
+    return CHROME_ARGS + [f"--user-agent={USER_AGENT}"]
+
+def _load_cache():
+    """Load the cache file, returning an empty cache if it is missing or corrupt."""
+    try:
+        with open(CACHE_FILE, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        if isinstance(cache, dict):
+            cache.setdefault('chrome', {})
+            cache.setdefault('drivers', {})
+            return cache
+    except (OSError, ValueError):
+        pass
+    return {'chrome': {}, 'drivers': {}}
+
+def _save_cache(cache):
+    """Atomically write the cache file."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_file = f"{CACHE_FILE}.{os.getpid()}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp_file, CACHE_FILE)
+
+def find_chrome_binary():
+    """Return the path of the installed Chrome browser, or None if it cannot be found."""
+    if sys.platform == 'win32':
+        candidates = [
+            r"C:\Program Files\Google\Chrome\Application\chrome.exe",
+            r"C:\Program Files (x86)\Google\Chrome\Application\chrome.exe",
+            os.path.join(os.environ.get('LOCALAPPDATA', ''), r"Google\Chrome\Application\chrome.exe"),
+        ]
+        for path in candidates:
+            if os.path.exists(path):
+                return path
+        # Try to find Chrome in registry
+        try:
+            import winreg
+            with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r"SOFTWARE\Microsoft\Windows\CurrentVersion\App Paths\chrome.exe") as key:
+                return winreg.QueryValue(key, None)
+        except Exception:
+            return None
+
+    if sys.platform == 'darwin':
+        mac_path = "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"
+        if os.path.exists(mac_path):
+            return mac_path
+
+    for name in ['google-chrome', 'google-chrome-stable', 'chrome', 'chromium', 'chromium-browser']:
+        path = shutil.which(name)
+        if path:
+            return os.path.realpath(path)
+    return None
+
+def _query_chrome_version(chrome_path):
+    """Ask Chrome (or the Windows registry) for its version string."""
+    output = ""
+    if chrome_path:
+        try:
+            result = subprocess.run([chrome_path, '--version'], capture_output=True, text=True, timeout=15)
+            output = result.stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            output = ""
+
+    # chrome.exe --version prints nothing on Windows, the registry has the version instead
+    if not VERSION_PATTERN.search(output) and sys.platform == 'win32':
+        try:
+            result = subprocess.run(
+                ['reg', 'query', r'HKEY_CURRENT_USER\Software\Google\Chrome\BLBeacon', '/v', 'version'],
+                capture_output=True, text=True, timeout=15
+            )
+            output = result.stdout
+        except (OSError, subprocess.SubprocessError):
+            output = ""
+
+    match = VERSION_PATTERN.search(output)
+    return match.group(0) if match else None
+
+def get_chrome_version(chrome_path=None):
+    """Return the installed Chrome version, reusing the cached value while the binary is unchanged."""
+    chrome_path = chrome_path or find_chrome_binary()
+    if not chrome_path:
+        return None
+
+    try:
+        stat = os.stat(chrome_path)
+        fingerprint = f"{stat.st_size}:{int(stat.st_mtime)}"
+    except OSError:
+        fingerprint = None
+
+    cache = _load_cache()
+    entry = cache['chrome'].get(chrome_path)
+    if fingerprint and entry and entry.get('fingerprint') == fingerprint:
+        return entry['version']
+
+    version = _query_chrome_version(chrome_path)
+    if version and fingerprint:
+        cache['chrome'][chrome_path] = {'fingerprint': fingerprint, 'version': version}
+        _save_cache(cache)
+    return version
+
+def chrome_major_version(version):
+    """Return the major component of a Chrome version string as an int, or None."""
+    match = VERSION_PATTERN.search(version or "")
+    return int(match.group(1)) if match else None
+
+def get_cached_driver(kind, chrome_version):
+    """Return the cached driver path for this kind ('chromedriver' or 'undetected') and Chrome version."""
+    if not chrome_version:
+        return None
+    path = _load_cache()['drivers'].get(f"{kind}:{chrome_version}")
+    if path and os.path.isfile(path):
+        return path
+    return None
+
+def store_driver(kind, chrome_version, driver_path, copy=False):
+    """Remember the driver that works with this Chrome version.
+
+    With copy=True the binary is copied into the cache directory first, for drivers
+    that would otherwise be deleted when the browser exits (undetected-chromedriver).
+    Returns the path that was stored.
+    """
+    if not chrome_version or not driver_path or not os.path.isfile(driver_path):
+        return None
+
+    if copy:
+        target_dir = os.path.join(CACHE_DIR, kind, chrome_version)
+        os.makedirs(target_dir, exist_ok=True)
+        target = os.path.join(target_dir, os.path.basename(driver_path))
+        if os.path.abspath(target) != os.path.abspath(driver_path):
+            shutil.copy2(driver_path, target)
+        driver_path = target
+
+    cache = _load_cache()
+    cache['drivers'][f"{kind}:{chrome_version}"] = driver_path
+    _save_cache(cache)
+    return driver_path
+
+def forget_driver(kind, chrome_version):
+    """Drop a cached driver entry, e.g. after it failed to start."""
+    cache = _load_cache()
+    if cache['drivers'].pop(f"{kind}:{chrome_version}", None) is not None:
+        _save_cache(cache)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    version = get_chrome_version()
+    logger.info("Chrome binary: %s", find_chrome_binary())
+    logger.info("Chrome version: %s", version)
+    for kind in ['chromedriver', 'undetected']:
+        logger.info("Cached %s: %s", kind, get_cached_driver(kind, version))
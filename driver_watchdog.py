@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Self-healing WebDriver wrapper for long scraper runs.
+WatchedDriver runs every WebDriver command with a time limit, so a hung
+renderer raises instead of blocking the run forever, and tells a dead browser
+(crashed Chrome, lost session, chromedriver gone) apart from ordinary command
+errors. recover() then tears the browser down, starts a new one through the
+scraper's setup_driver(), restores the cookies and scrolls back to the last
+harvested tweet, so the scrape continues with its dedup state intact.
+"""
+
+import logging
+import os
+import signal
+import threading
+import time
+from urllib.parse import urlparse
+
+from selenium.common.exceptions import InvalidSessionIdException, NoSuchWindowException, WebDriverException
+
+import scroll_planner
+
+COMMAND_TIMEOUT = 90  # Seconds a single WebDriver command may take before the browser counts as hung
+PING_TIMEOUT = 10  # Seconds the health check may take
+MAX_RESTARTS = 5  # Browser restarts allowed per run
+COOKIE_EVERY = 10  # Scrolls between refreshes of the saved session cookies
+
+logger = logging.getLogger(__name__)
+
+# Messages of WebDriverExceptions raised when the browser itself is gone or stuck
+DEAD_BROWSER_MARKERS = (
+    "chrome not reachable",
+    "disconnected",
+    "session deleted",
+    "invalid session id",
+    "no such window",
+    "target window already closed",
+    "timed out receiving message from renderer",
+    "tab crashed",
+    "page crash",
+    "failed to establish a new connection",
+    "connection refused",
+    "max retries exceeded",
+)
+
+class DriverFailure(WebDriverException):
+    """The browser crashed, lost its session or stopped answering."""
+
+def is_dead_browser_error(error):
+    """Whether an exception from a WebDriver command means the browser is unusable."""
+    if isinstance(error, (DriverFailure, InvalidSessionIdException, NoSuchWindowException)):
+        return True
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        # chromedriver's HTTP endpoint is gone or stopped answering
+        return True
+    message = str(getattr(error, 'msg', None) or error).lower()
+    return any(marker in message for marker in DEAD_BROWSER_MARKERS)
+
+def call_with_timeout(func, timeout, *args, **kwargs):
+    """Run func in a helper thread and raise DriverFailure if it does not return within timeout.
+
+    A hung call keeps its thread blocked until the browser is torn down, so
+    the thread is a daemon and simply abandoned.
+    """
+    outcome = {}
+
+    def run():
+        try:
+            outcome['result'] = func(*args, **kwargs)
+        except BaseException as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        raise DriverFailure(f"WebDriver command did not return within {timeout}s")
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome.get('result')
+
+class WatchedDriver:
+    """Proxy for a WebDriver whose commands are time-limited and whose failures are detected.
+
+    Attribute access and method calls are passed to the current driver. When
+    one of them fails because the browser is dead or hung, the proxy is marked
+    broken and DriverFailure is raised; the scraper then calls recover().
+    """
+
+    OWN_ATTRIBUTES = ('command_timeout', 'max_restarts', 'restarts', 'broken', 'cookies', 'cookies_saved_at')
+
+    def __init__(self, driver, driver_factory, command_timeout=COMMAND_TIMEOUT, max_restarts=MAX_RESTARTS):
+        self._driver = driver
+        self._driver_factory = driver_factory
+        self.command_timeout = command_timeout
+        self.max_restarts = max_restarts
+        self.restarts = 0
+        self.broken = False
+        self.cookies = []
+        self.cookies_saved_at = None
+
+    @property
+    def driver(self):
+        """The underlying WebDriver currently in use."""
+        return self._driver
+
+    def _guard(self, func, *args, **kwargs):
+        try:
+            return call_with_timeout(func, self.command_timeout, *args, **kwargs)
+        except Exception as e:
+            if is_dead_browser_error(e):
+                self.broken = True
+                if not isinstance(e, DriverFailure):
+                    raise DriverFailure(f"Browser is gone: {str(getattr(e, 'msg', None) or e).strip()}") from e
+            raise
+
+    def __getattr__(self, name):
+        # Properties such as page_source and current_url are WebDriver round trips too
+        value = self._guard(getattr, self._driver, name)
+        if callable(value) and not isinstance(value, type):
+            def guarded(*args, **kwargs):
+                return self._guard(value, *args, **kwargs)
+            return guarded
+        return value
+
+    def __setattr__(self, name, value):
+        # Attributes the scrapers set, like pool_lease, belong to the real driver
+        if name.startswith('_') or name in self.OWN_ATTRIBUTES:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._driver, name, value)
+
+    def quit(self):
+        """Quit the current browser, even if it is hung."""
+        self.teardown()
+
+    def ping(self, timeout=PING_TIMEOUT):
+        """Bounded health check: True if the browser answers a trivial script in time."""
+        try:
+            call_with_timeout(self._driver.execute_script, timeout, "return document.readyState")
+            return True
+        except Exception:
+            return False
+
+    def save_session(self, scroll_count=None):
+        """Remember the session cookies, at most every COOKIE_EVERY scrolls."""
+        if scroll_count is not None and self.cookies_saved_at is not None and scroll_count - self.cookies_saved_at < COOKIE_EVERY:
+            return
+        try:
+            cookies = call_with_timeout(self._driver.get_cookies, PING_TIMEOUT)
+        except Exception:
+            return
+        if cookies:
+            self.cookies = cookies
+        self.cookies_saved_at = scroll_count or 0
+
+    def check(self, error=None):
+        """Whether the browser needs to be rebuilt after an error (or a failed ping)."""
+        if self.broken or (error is not None and is_dead_browser_error(error)):
+            return True
+        return not self.ping()
+
+    def teardown(self):
+        """Quit the current browser without letting a hung chromedriver block us."""
+        driver = self._driver
+        try:
+            call_with_timeout(driver.quit, PING_TIMEOUT)
+        except Exception:
+            # Kill chromedriver and Chrome outright if quit() hangs or fails
+            process = getattr(getattr(driver, 'service', None), 'process', None)
+            if process is not None:
+                try:
+                    process.kill()
+                except Exception:
+                    pass
+            browser_pid = getattr(driver, 'browser_pid', None)
+            if browser_pid:
+                try:
+                    os.kill(browser_pid, signal.SIGKILL if hasattr(signal, 'SIGKILL') else signal.SIGTERM)
+                except Exception:
+                    pass
+        lease = getattr(driver, 'pool_lease', None)
+        if lease is not None:
+            try:
+                lease.close()
+            except Exception:
+                pass
+
+    def restart(self):
+        """Replace the browser with a new one from the driver factory; False once restarts are used up."""
+        if self.restarts >= self.max_restarts:
+            logger.error("Browser failed again and %s restarts are used up.", self.max_restarts)
+            return False
+        self.restarts += 1
+        logger.warning("Restarting the browser (%s/%s)...", self.restarts, self.max_restarts)
+        self.teardown()
+        try:
+            driver = self._driver_factory()
+        except (Exception, SystemExit) as e:
+            logger.error("Could not start a new browser: %s", e)
+            return False
+        if driver is None:
+            return False
+        self._driver = driver
+        self.broken = False
+        return True
+
+    def restore_session(self, url):
+        """Put the saved cookies into the new browser, on the site of url."""
+        if not self.cookies:
+            return
+        parsed = urlparse(url)
+        self._guard(self._driver.get, f"{parsed.scheme}://{parsed.netloc}/")
+        for cookie in self.cookies:
+            cookie = dict(cookie)
+            cookie.pop('sameSite', None)
+            try:
+                self._guard(self._driver.add_cookie, cookie)
+            except DriverFailure:
+                raise
+            except Exception:
+                continue
+
+    def scroll_to_tweet(self, tweet_id, max_scrolls, pause_time):
+        """Scroll the reloaded timeline down until tweet_id is on the page; True if it was found."""
+        find_tweet = f"return document.querySelector('article a[href*=\"/status/{tweet_id}\"]') !== null;"
+        # Step like the scrape loop does, so the tweet can't be scrolled past without ever being rendered
+        planner = scroll_planner.ScrollPlanner()
+        for _ in range(max_scrolls):
+            if self._guard(self._driver.execute_script, find_tweet):
+                self._guard(self._driver.execute_script,
+                            f"document.querySelector('article a[href*=\"/status/{tweet_id}\"]')"
+                            f".closest('article').scrollIntoView({{block: 'center'}});")
+                return True
+            planner.scroll(self, planner.rendered(self))
+            time.sleep(pause_time)
+        return False
+
+    def recover(self, url, last_tweet_id=None, max_scrolls=50, pause_time=2.0):
+        """Rebuild the browser and return to url at the last harvested tweet.
+
+        Returns False when the browser cannot be rebuilt; the scrape should then
+        stop and keep what it has.
+        """
+        while self.restart():
+            try:
+                self.restore_session(url)
+                self._guard(self._driver.get, url)
+                time.sleep(pause_time)
+                if last_tweet_id and last_tweet_id != "Unknown":
+                    if self.scroll_to_tweet(last_tweet_id, max_scrolls, pause_time):
+                        logger.info("Resumed at tweet %s", last_tweet_id)
+                    else:
+                        logger.warning("Could not find tweet %s again after %d scrolls, continuing from here",
+                                       last_tweet_id, max_scrolls)
+                return True
+            except Exception as e:
+                logger.error("New browser failed while restoring the session: %s", e)
+                self.broken = True
+        return False
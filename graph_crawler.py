@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Follower/following graph crawler for discovering accounts to scrape.
+Walks the /<user>/following and /<user>/followers lists breadth-first from
+seed accounts up to a configurable depth, with the scraper's driver setup and
+scroll planner and a bounded pool of browsers fetching frontier accounts at
+the same time. The visited set, frontier and edges live in an SQLite database,
+so memory stays flat however large the crawl gets and an interrupted crawl
+resumes where it stopped. The edge list is written as CSV.
+"""
+
+import argparse
+import csv
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from bs4 import BeautifulSoup
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+
+import scraper_logging
+import thread_expander
+from scroll_planner import ScrollPlanner
+
+BASE_URL = "https://x.com"
+RELATIONS = ['following', 'followers']
+MAX_DEPTH = 1  # Accounts this many hops from the seeds are recorded but not crawled
+LIST_SCROLLS = 20  # Scrolls per following/followers list; large accounts are sampled, not exhausted
+BATCH_SIZE = 200  # Frontier accounts handed to the browsers per round
+MAX_ATTEMPTS = 3  # Failed fetches of an account before it is skipped
+CRAWL_WORKERS = 3
+PAGE_PAUSE_TIME = 2.0
+EDGE_FIELDS = ['source', 'target', 'discovered_from', 'relation']
+
+HANDLE_PATTERN = re.compile(r'^/([A-Za-z0-9_]{1,15})$')
+# Top-level paths that look like handles but are pages of the site
+RESERVED_PATHS = {'home', 'explore', 'notifications', 'messages', 'search', 'settings', 'compose', 'i',
+                  'login', 'logout', 'signup', 'tos', 'privacy', 'jobs', 'premium', 'verified'}
+# Page content that confirms a list really has nothing to read, as opposed to a login wall or error page
+EMPTY_LIST_MARKERS = ('data-testid="emptyState"', "These posts are protected", "These Tweets are protected",
+                      "Account suspended", "This account doesn’t exist", "This account doesn't exist")
+
+# Document position of every user cell with the handle it shows, plus the viewport
+USER_LAYOUT_SCRIPT = """
+const articles = [];
+const column = document.querySelector('[data-testid="primaryColumn"]') || document;
+column.querySelectorAll('[data-testid="UserCell"]').forEach((cell) => {
+    let handle = null;
+    for (const link of cell.querySelectorAll('a[href^="/"]')) {
+        const match = (link.getAttribute('href') || '').match(/^\\/([A-Za-z0-9_]{1,15})$/);
+        if (match) { handle = match[1].toLowerCase(); break; }
+    }
+    const rect = cell.getBoundingClientRect();
+    articles.push([handle, rect.top + window.scrollY, rect.bottom + window.scrollY]);
+});
+return {
+    articles: articles,
+    scroll_y: window.scrollY,
+    viewport: window.innerHeight,
+    height: document.body.scrollHeight
+};
+"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    handle TEXT PRIMARY KEY,
+    depth INTEGER NOT NULL,
+    state TEXT NOT NULL DEFAULT 'frontier',
+    attempts INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS accounts_frontier ON accounts (state, depth);
+CREATE TABLE IF NOT EXISTS edges (
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    discovered_from TEXT NOT NULL,
+    PRIMARY KEY (source, target)
+) WITHOUT ROWID;
+"""
+
+def normalize_handle(handle):
+    """Lower-case handle without a leading @, or None if it cannot be an account."""
+    handle = (handle or "").strip().lstrip('@').lower()
+    if not re.fullmatch(r'[a-z0-9_]{1,15}', handle) or handle in RESERVED_PATHS:
+        return None
+    return handle
+
+class GraphStore:
+    """Visited set, frontier and edges of a crawl.
+
+    An account is visited once it is in the accounts table; it stays in the
+    frontier until its lists were fetched. Edges point from follower to
+    followed account, whichever list they were found on.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.Lock()
+
+    def _transaction(self, func):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(self.conn)
+                self.conn.execute("COMMIT")
+                return result
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def add_seeds(self, handles):
+        """Put seed accounts in the frontier at depth 0; returns how many were new."""
+        def add(conn):
+            return sum(conn.execute("INSERT OR IGNORE INTO accounts (handle, depth) VALUES (?, 0)", (handle,)).rowcount
+                       for handle in handles)
+        return self._transaction(add)
+
+    def next_depth(self, max_depth):
+        """Shallowest depth with accounts left to crawl, or None when the crawl is complete."""
+        with self.lock:
+            row = self.conn.execute("""SELECT MIN(depth) FROM accounts WHERE state = 'frontier'
+                                       AND depth < ? AND attempts < ?""", (max_depth, MAX_ATTEMPTS)).fetchone()
+        return row[0]
+
+    def frontier(self, depth, limit=BATCH_SIZE):
+        """Up to limit accounts at depth still waiting to be crawled."""
+        with self.lock:
+            return [row[0] for row in self.conn.execute(
+                """SELECT handle FROM accounts WHERE state = 'frontier' AND depth = ? AND attempts < ?
+                   ORDER BY attempts, handle LIMIT ?""", (depth, MAX_ATTEMPTS, limit))]
+
+    def finish(self, handle, depth, edges):
+        """Record the edges found on an account's lists, queue the new accounts and mark it crawled.
+
+        Returns the number of accounts seen for the first time.
+        """
+        def finish(conn):
+            conn.executemany("INSERT OR IGNORE INTO edges (source, target, discovered_from) VALUES (?, ?, ?)",
+                             [(source, target, handle) for source, target in edges])
+            new_accounts = 0
+            for source, target in edges:
+                neighbour = target if source == handle else source
+                new_accounts += conn.execute("INSERT OR IGNORE INTO accounts (handle, depth) VALUES (?, ?)",
+                                             (neighbour, depth + 1)).rowcount
+            conn.execute("UPDATE accounts SET state = 'done' WHERE handle = ?", (handle,))
+            return new_accounts
+        return self._transaction(finish)
+
+    def fail(self, handle):
+        """Count a failed fetch; the account is retried in a later round until MAX_ATTEMPTS."""
+        def fail(conn):
+            conn.execute("UPDATE accounts SET attempts = attempts + 1 WHERE handle = ?", (handle,))
+        self._transaction(fail)
+
+    def counts(self):
+        """Accounts per state and the number of edges."""
+        with self.lock:
+            counts = dict(self.conn.execute("SELECT state, COUNT(*) FROM accounts GROUP BY state").fetchall())
+            counts['failed'] = self.conn.execute("SELECT COUNT(*) FROM accounts WHERE state = 'frontier' AND attempts >= ?",
+                                                 (MAX_ATTEMPTS,)).fetchone()[0]
+            counts['edges'] = self.conn.execute("SELECT COUNT(*) FROM edges").fetchone()[0]
+        return counts
+
+    def export_edges(self, path):
+        """Write the edge list as CSV, streamed from the database; returns the number of edges."""
+        written = 0
+        with self.lock, open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(EDGE_FIELDS)
+            for source, target, discovered_from in self.conn.execute(
+                    "SELECT source, target, discovered_from FROM edges ORDER BY discovered_from, source, target"):
+                relation = 'following' if source == discovered_from else 'followers'
+                writer.writerow([source, target, discovered_from, relation])
+                written += 1
+        return written
+
+    def export_accounts(self, path, max_depth=None):
+        """Write one discovered handle per line, nearest to the seeds first, for job_queue.py add --file."""
+        written = 0
+        query = "SELECT handle FROM accounts"
+        params = ()
+        if max_depth is not None:
+            query += " WHERE depth <= ?"
+            params = (max_depth,)
+        with self.lock, open(path, 'w', encoding='utf-8') as f:
+            for (handle,) in self.conn.execute(query + " ORDER BY depth, handle", params):
+                f.write(f"{handle}\n")
+                written += 1
+        return written
+
+    def close(self):
+        self.conn.close()
+
+def parse_user_cells(page_source):
+    """Return the handles of the user cells on a following/followers page, in page order."""
+    soup = BeautifulSoup(page_source, 'html.parser')
+    # The sidebar's "Who to follow" uses the same cells; only the list itself counts
+    column = soup.select_one('[data-testid="primaryColumn"]') or soup
+    handles = []
+    for cell in column.select('[data-testid="UserCell"]'):
+        for link in cell.select('a[href^="/"]'):
+            match = HANDLE_PATTERN.match(link.get('href', ''))
+            handle = normalize_handle(match.group(1)) if match else None
+            if handle:
+                handles.append(handle)
+                break
+    return handles
+
+def fetch_list(driver, url, max_scrolls=LIST_SCROLLS, pause_time=None):
+    """Scroll through a following/followers list and return its handles in list order."""
+    driver.get(url)
+    try:
+        WebDriverWait(driver, 15).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, '[data-testid="UserCell"]'))
+        )
+    except TimeoutException:
+        page_source = driver.page_source
+        if any(marker in page_source for marker in EMPTY_LIST_MARKERS):
+            # Empty list, protected account or suspended account
+            return []
+        # A login wall, rate limit or "Something went wrong" page; fail so the account is retried
+        raise RuntimeError(f"no accounts loaded from {url} and the page doesn't say the list is empty")
+
+    planner = ScrollPlanner(USER_LAYOUT_SCRIPT, key='handle')
+    seen = {}
+    consecutive_no_new = 0
+    for _ in range(max_scrolls):
+        time.sleep((PAGE_PAUSE_TIME if pause_time is None else pause_time) + random.uniform(0, 1.0))
+        page = parse_user_cells(driver.page_source)
+        new_count = 0
+        for handle in page:
+            if handle not in seen:
+                seen[handle] = True
+                new_count += 1
+        if new_count == 0 and not planner.filling_gap:
+            consecutive_no_new += 1
+            if consecutive_no_new >= 3:
+                break
+        else:
+            consecutive_no_new = 0
+        planner.scroll(driver, [{'handle': handle} for handle in page])
+    return list(seen)
+
+def crawl(store, seeds, driver_factory, max_depth=MAX_DEPTH, relations=RELATIONS, workers=CRAWL_WORKERS,
+          list_scrolls=LIST_SCROLLS, base_url=BASE_URL, session_driver=None):
+    """Crawl breadth-first from the seeds until every account closer than max_depth was fetched.
+
+    Accounts already in the store keep their state, so running the same crawl
+    again continues it.
+    """
+    added = store.add_seeds(seeds)
+    if added < len(seeds):
+        print(f"Resuming crawl in {store.path}: {len(seeds) - added} of {len(seeds)} seeds already known")
+
+    lock = threading.Lock()
+    done = [0]
+    attempted = [0]
+
+    def handle(driver, account, enqueue):
+        edges = []
+        for relation in relations:
+            listed = fetch_list(driver, f"{base_url}/{account}/{relation}", list_scrolls)
+            if relation == 'following':
+                edges.extend((account, other) for other in listed if other != account)
+            else:
+                edges.extend((other, account) for other in listed if other != account)
+        new_accounts = store.finish(account, depth, edges)
+        with lock:
+            done[0] += 1
+            print(f"Crawled {account} at depth {depth} ({done[0]} this round): "
+                  f"{len(edges)} edges, {new_accounts} new accounts")
+
+    def handle_safely(driver, account, enqueue):
+        with lock:
+            attempted[0] += 1
+        try:
+            handle(driver, account, enqueue)
+        except Exception as e:
+            store.fail(account)
+            print(f"Could not crawl {account}: {e}")
+
+    while True:
+        depth = store.next_depth(max_depth)
+        if depth is None:
+            break
+        batch = store.frontier(depth)
+        counts = store.counts()
+        print(f"Depth {depth}: crawling {len(batch)} accounts with {workers} workers "
+              f"({counts.get('done', 0)} crawled, {counts.get('frontier', 0)} in the frontier, {counts['edges']} edges)")
+        done[0] = attempted[0] = 0
+        thread_expander.run_driver_workers(batch, handle_safely, driver_factory, workers=workers,
+                                           session_driver=session_driver)
+        if attempted[0] == 0:
+            # No browser could be started; stop instead of spinning on the same batch
+            print("No browser could be started, stopping")
+            break
+
+    counts = store.counts()
+    print(f"Crawl finished: {counts.get('done', 0)} accounts crawled, {counts.get('frontier', 0)} left in the frontier "
+          f"({counts['failed']} given up on), {counts['edges']} edges")
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description='Crawl following/followers lists breadth-first to discover accounts')
+    parser.add_argument('seeds', nargs='*', help='Accounts to start from (with or without @)')
+    parser.add_argument('--seeds-file', help='File with one seed account per line')
+    parser.add_argument('--depth', type=int, default=MAX_DEPTH,
+                        help=f'Hops from the seeds to crawl; accounts found at the last hop are recorded only (default: {MAX_DEPTH})')
+    parser.add_argument('--relations', default=','.join(RELATIONS),
+                        help='Comma-separated lists to read per account: following, followers (default: both)')
+    parser.add_argument('--workers', type=int, default=CRAWL_WORKERS, help=f'Browsers crawling at once (default: {CRAWL_WORKERS})')
+    parser.add_argument('--list-scrolls', type=int, default=LIST_SCROLLS,
+                        help=f'Scrolls per list, which caps the accounts read from large lists (default: {LIST_SCROLLS})')
+    parser.add_argument('--store', default=None,
+                        help='SQLite file with the crawl state; run again with the same file to resume (default: <first seed>_graph.sqlite)')
+    parser.add_argument('--edges', default=None, help='Edge list CSV to write (default: <store name>_edges.csv)')
+    parser.add_argument('--accounts-out', default=None,
+                        help='Also write the discovered handles, one per line, e.g. for job_queue.py add --file')
+    parser.add_argument('--base-url', default=BASE_URL, help=f'Site to crawl (default: {BASE_URL})')
+    parser.add_argument('--login', action='store_true', help='Enable automatic login (lists need a logged-in session)')
+    parser.add_argument('--standard-driver', action='store_true',
+                        help='Use twitter_scraper.py instead of the undetected ChromeDriver version')
+    args = parser.parse_args()
+    # The shared scraping helpers report through logging
+    scraper_logging.setup_logging()
+
+    seeds = list(args.seeds)
+    if args.seeds_file:
+        with open(args.seeds_file, 'r', encoding='utf-8') as f:
+            seeds.extend(line.strip() for line in f if line.strip() and not line.startswith('#'))
+    seeds = [handle for handle in dict.fromkeys(normalize_handle(seed) for seed in seeds) if handle]
+    if not seeds and not (args.store and os.path.exists(args.store)):
+        parser.error("give at least one seed account, or an existing --store to resume")
+    relations = [relation.strip() for relation in args.relations.split(',') if relation.strip()]
+    unknown = set(relations) - set(RELATIONS)
+    if unknown or not relations:
+        parser.error(f"--relations must be a list of {', '.join(RELATIONS)}")
+
+    store_path = args.store or f"{seeds[0]}_graph.sqlite"
+    edges_path = args.edges or f"{os.path.splitext(store_path)[0]}_edges.csv"
+
+    if args.standard_driver:
+        import twitter_scraper as scraper
+    else:
+        import twitter_scraper_undetected as scraper
+    if args.login:
+        scraper.AUTO_LOGIN = True
+        scraper.TWITTER_EMAIL = input("Enter your Twitter email/username: ")
+        scraper.TWITTER_PASSWORD = input("Enter your Twitter password: ")
+
+    store = GraphStore(store_path)
+    session_driver = None
+    try:
+        # One browser gets past the login wall; the workers copy its cookies
+        session_driver = scraper.setup_driver()
+        session_driver.get(f"{args.base_url}/{seeds[0] if seeds else ''}")
+        time.sleep(PAGE_PAUSE_TIME)
+        scraper.check_for_login_wall(session_driver)
+
+        crawl(store, seeds, scraper.setup_driver, args.depth, relations, args.workers, args.list_scrolls,
+              args.base_url, session_driver)
+    except KeyboardInterrupt:
+        print(f"\nInterrupted; run again with --store {store_path} to resume")
+    finally:
+        if session_driver is not None:
+            try:
+                session_driver.quit()
+            except Exception:
+                pass
+            if getattr(session_driver, 'pool_lease', None):
+                session_driver.pool_lease.close()
+        written = store.export_edges(edges_path)
+        print(f"Wrote {written} edges to {edges_path}")
+        if args.accounts_out:
+            written = store.export_accounts(args.accounts_out, args.depth)
+            print(f"Wrote {written} accounts to {args.accounts_out}")
+        store.close()
+
+if __name__ == "__main__":
+    main()
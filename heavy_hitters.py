@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Bounded-memory heavy-hitter sketch for top mentions and hashtags.
+Implements the Space-Saving algorithm: a fixed number of counters tracks the
+most frequent items of a stream with a known bound on how much each count is
+overestimated, and sketches built on separate chunks or workers can be merged.
+"""
+
+import heapq
+from collections import Counter
+
+DEFAULT_CAPACITY = 1000
+
+class SpaceSaving:
+    """Approximate item counts using at most `capacity` counters.
+
+    Any item whose true count exceeds total / capacity is guaranteed to be
+    tracked, and each reported count overestimates the true count by at most
+    error(item), which is itself at most total / capacity.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.total = 0
+        self.counts = {}
+        self.errors = {}
+        # One (count, item) entry per tracked item; counts only grow, so entries
+        # may be stale and are refreshed when they reach the top of the heap
+        self._heap = []
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __contains__(self, item):
+        return item in self.counts
+
+    def add(self, item, count=1):
+        """Count `count` more occurrences of `item`."""
+        self.total += count
+        if item in self.counts:
+            self.counts[item] += count
+            return
+
+        if len(self.counts) < self.capacity:
+            self.counts[item] = count
+            self.errors[item] = 0
+            heapq.heappush(self._heap, (count, item))
+            return
+
+        # Replace the item with the smallest count, inheriting its count as error
+        min_count, min_item = self._pop_min()
+        del self.counts[min_item]
+        del self.errors[min_item]
+        self.counts[item] = min_count + count
+        self.errors[item] = min_count
+        heapq.heappush(self._heap, (min_count + count, item))
+
+    def update(self, items):
+        """Count every item of an iterable, like Counter.update()."""
+        for item in items:
+            self.add(item)
+
+    def _pop_min(self):
+        while True:
+            count, item = heapq.heappop(self._heap)
+            current = self.counts[item]
+            if current == count:
+                return count, item
+            heapq.heappush(self._heap, (current, item))
+
+    def min_count(self):
+        """Smallest tracked count once the sketch is full, 0 before that."""
+        if len(self.counts) < self.capacity:
+            return 0
+        return min(self.counts.values())
+
+    def max_error(self):
+        """Upper bound on the overestimation of any reported count."""
+        return max(self.errors.values(), default=0)
+
+    def error(self, item):
+        """Upper bound on how much the count of `item` is overestimated."""
+        return self.errors.get(item, self.min_count())
+
+    def most_common(self, n=None):
+        """Return the n items with the highest estimated counts, like Counter.most_common()."""
+        ordered = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)
+        return ordered if n is None else ordered[:n]
+
+    def most_common_with_error(self, n=None):
+        """Return (item, estimated count, maximum overestimation) for the top n items."""
+        return [(item, count, self.errors[item]) for item, count in self.most_common(n)]
+
+    def merge(self, other):
+        """Fold another sketch (or an exact Counter) into this one and return self.
+
+        An item missing from one side may still have occurred there up to that
+        side's minimum count, which is added to both its count and its error.
+        """
+        if isinstance(other, Counter):
+            other_counts, other_errors, other_min = dict(other), {}, 0
+            other_total = sum(other.values())
+        else:
+            other_counts, other_errors, other_min = other.counts, other.errors, other.min_count()
+            other_total = other.total
+        own_min = self.min_count()
+
+        merged = {}
+        for item in set(self.counts) | set(other_counts):
+            count = self.counts.get(item, own_min) + other_counts.get(item, other_min)
+            error = self.errors.get(item, own_min) + other_errors.get(item, other_min)
+            merged[item] = (count, error)
+
+        kept = heapq.nlargest(self.capacity, merged.items(), key=lambda item: item[1][0])
+        self.counts = {item: count for item, (count, _) in kept}
+        self.errors = {item: error for item, (_, error) in kept}
+        self._heap = [(count, item) for item, count in self.counts.items()]
+        heapq.heapify(self._heap)
+        self.total += other_total
+        return self
+
+def merge_counts(mine, theirs):
+    """Merge two exact Counters or sketches into `mine`, whichever they are."""
+    if isinstance(mine, SpaceSaving):
+        return mine.merge(theirs)
+    if isinstance(theirs, SpaceSaving):
+        return SpaceSaving(theirs.capacity).merge(mine).merge(theirs)
+    mine.update(theirs)
+    return mine
@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+"""
+Job queue for spreading scrapes over many hosts.
+Accounts to scrape are jobs in an SQLite database. Workers lease jobs, keep
+the lease alive with heartbeats that also report progress, and complete or fail
+them; a job whose lease expires (its host died or left) is queued again, and
+failed jobs are retried until their retry budget is spent. Workers use the
+database directly when it sits on a shared volume with working file locks, or
+go through a coordinator that owns the database and serves the same operations
+over line-delimited JSON on TCP.
+"""
+
+import argparse
+import json
+import os
+import re
+import shlex
+import signal
+import socket
+import socketserver
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+
+from browser_pool import parse_address
+
+DEFAULT_DB = "scrape_jobs.sqlite"
+DEFAULT_ADDRESS = "127.0.0.1:9350"
+LEASE_SECONDS = 120  # A job is queued again if its worker sends no heartbeat for this long
+HEARTBEAT_SECONDS = 30
+POLL_SECONDS = 10  # Wait between lease attempts while the queue is empty
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 60  # Seconds before the first retry of a failed job, doubled for every further attempt
+
+PROGRESS_PATTERN = re.compile(r'Scrolled (\d+) times\. Found (\d+) tweets')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    account TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    args TEXT NOT NULL DEFAULT '[]',
+    state TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    not_before REAL NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_expires REAL,
+    progress TEXT,
+    result TEXT,
+    last_error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_queued ON jobs (state, priority DESC, id);
+"""
+
+JOB_FIELDS = ['id', 'account', 'priority', 'args', 'state', 'attempts', 'max_attempts', 'not_before',
+              'worker', 'lease_expires', 'progress', 'result', 'last_error', 'created', 'updated']
+
+def _job(row):
+    if row is None:
+        return None
+    job = dict(zip(JOB_FIELDS, row))
+    job['args'] = json.loads(job['args'] or '[]')
+    job['progress'] = json.loads(job['progress']) if job['progress'] else None
+    job['result'] = json.loads(job['result']) if job['result'] else None
+    return job
+
+class JobQueue:
+    """The job database. Every operation is one short transaction, so several processes can share it."""
+
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        # Autocommit mode, so lease() can take the write lock up front with BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.Lock()
+
+    def _transaction(self, func):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(self.conn, time.time())
+                self.conn.execute("COMMIT")
+                return result
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def add(self, account, priority=0, max_attempts=MAX_ATTEMPTS, args=None):
+        """Queue a scrape of account. An account already queued or running gets the new priority instead."""
+        def add(conn, now):
+            row = conn.execute("SELECT id FROM jobs WHERE account = ? AND state IN ('queued', 'leased')",
+                               (account,)).fetchone()
+            if row:
+                conn.execute("UPDATE jobs SET priority = ?, max_attempts = ?, args = ?, updated = ? WHERE id = ?",
+                             (priority, max_attempts, json.dumps(args or []), now, row[0]))
+                return row[0]
+            return conn.execute(
+                "INSERT INTO jobs (account, priority, args, max_attempts, created, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                (account, priority, json.dumps(args or []), max_attempts, now, now)
+            ).lastrowid
+        return self._transaction(add)
+
+    def _expire_leases(self, conn, now):
+        """Queue jobs whose worker stopped sending heartbeats again, or fail them if out of attempts."""
+        conn.execute("""UPDATE jobs SET state = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+                        last_error = 'lease expired on ' || worker, worker = NULL, lease_expires = NULL, updated = ?
+                        WHERE state = 'leased' AND lease_expires < ?""", (now, now))
+
+    def lease(self, worker, lease_seconds=LEASE_SECONDS):
+        """Take the highest priority job that is due; returns the job or None."""
+        def lease(conn, now):
+            self._expire_leases(conn, now)
+            row = conn.execute("""SELECT id FROM jobs WHERE state = 'queued' AND not_before <= ?
+                                  ORDER BY priority DESC, id LIMIT 1""", (now,)).fetchone()
+            if not row:
+                return None
+            conn.execute("""UPDATE jobs SET state = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1,
+                            progress = NULL, updated = ? WHERE id = ?""", (worker, now + lease_seconds, now, row[0]))
+            return _job(conn.execute(f"SELECT {', '.join(JOB_FIELDS)} FROM jobs WHERE id = ?", row).fetchone())
+        return self._transaction(lease)
+
+    def heartbeat(self, job_id, worker, progress=None, lease_seconds=LEASE_SECONDS):
+        """Extend the lease and record progress; False if the worker no longer holds the job."""
+        def heartbeat(conn, now):
+            cursor = conn.execute("""UPDATE jobs SET lease_expires = ?, progress = COALESCE(?, progress), updated = ?
+                                     WHERE id = ? AND worker = ? AND state = 'leased'""",
+                                  (now + lease_seconds, json.dumps(progress) if progress else None, now, job_id, worker))
+            return cursor.rowcount == 1
+        return self._transaction(heartbeat)
+
+    def complete(self, job_id, worker, result=None):
+        """Mark a job done; False if the worker no longer holds it."""
+        def complete(conn, now):
+            cursor = conn.execute("""UPDATE jobs SET state = 'done', result = ?, worker = NULL, lease_expires = NULL,
+                                     updated = ? WHERE id = ? AND worker = ? AND state = 'leased'""",
+                                  (json.dumps(result), now, job_id, worker))
+            return cursor.rowcount == 1
+        return self._transaction(complete)
+
+    def fail(self, job_id, worker, error, retry_delay=None):
+        """Give up on an attempt: the job is retried later, or failed for good once out of attempts."""
+        def fail(conn, now):
+            row = conn.execute("SELECT attempts, max_attempts FROM jobs WHERE id = ? AND worker = ? AND state = 'leased'",
+                               (job_id, worker)).fetchone()
+            if not row:
+                return False
+            attempts, max_attempts = row
+            state = 'failed' if attempts >= max_attempts else 'queued'
+            not_before = now + (RETRY_DELAY if retry_delay is None else retry_delay) * 2 ** (attempts - 1)
+            conn.execute("""UPDATE jobs SET state = ?, last_error = ?, not_before = ?, worker = NULL,
+                            lease_expires = NULL, updated = ? WHERE id = ?""", (state, str(error)[-2000:], not_before, now, job_id))
+            return True
+        return self._transaction(fail)
+
+    def release(self, job_id, worker):
+        """Hand a job back without counting the attempt, e.g. when the worker's host leaves."""
+        def release(conn, now):
+            cursor = conn.execute("""UPDATE jobs SET state = 'queued', attempts = MAX(attempts - 1, 0), worker = NULL,
+                                     lease_expires = NULL, updated = ? WHERE id = ? AND worker = ? AND state = 'leased'""",
+                                  (now, job_id, worker))
+            return cursor.rowcount == 1
+        return self._transaction(release)
+
+    def status(self):
+        """Job counts per state and the jobs that are running, queued or failed."""
+        def status(conn, now):
+            self._expire_leases(conn, now)
+            counts = dict(conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+            jobs = [_job(row) for row in conn.execute(
+                f"""SELECT {', '.join(JOB_FIELDS)} FROM jobs WHERE state != 'done'
+                    ORDER BY state = 'leased' DESC, priority DESC, id""")]
+            return {'counts': counts, 'jobs': jobs}
+        return self._transaction(status)
+
+class CoordinatorHandler(socketserver.StreamRequestHandler):
+    """Line-delimited JSON protocol: {"cmd": "lease", "worker": ...} and so on, one reply per line."""
+
+    COMMANDS = ('add', 'lease', 'heartbeat', 'complete', 'fail', 'release', 'status')
+
+    def handle(self):
+        queue = self.server.queue
+        try:
+            for line in self.rfile:
+                try:
+                    request = json.loads(line)
+                    cmd = request.pop('cmd', None)
+                    if cmd not in self.COMMANDS:
+                        raise ValueError(f"unknown command: {cmd}")
+                    reply = {'result': getattr(queue, cmd)(**request)}
+                except Exception as e:
+                    reply = {'error': str(e)}
+                self.wfile.write((json.dumps(reply) + "\n").encode('utf-8'))
+                self.wfile.flush()
+        except (ConnectionError, OSError):
+            pass
+
+class CoordinatorServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, queue):
+        self.queue = queue
+        super().__init__(address, CoordinatorHandler)
+
+def start_coordinator(queue, address=DEFAULT_ADDRESS):
+    """Serve the queue from a background thread and return the server."""
+    server = CoordinatorServer(parse_address(address), queue)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+class CoordinatorClient:
+    """The JobQueue operations, sent to a coordinator."""
+
+    def __init__(self, address, timeout=30):
+        self.address = address
+        self.timeout = timeout
+        self.local = threading.local()  # One connection per thread
+
+    def _call(self, cmd, **kwargs):
+        for attempt in range(2):
+            conn = getattr(self.local, 'conn', None)
+            try:
+                if conn is None:
+                    conn = socket.create_connection(parse_address(self.address), timeout=self.timeout)
+                    self.local.conn = conn
+                    self.local.reader = conn.makefile('r', encoding='utf-8')
+                conn.sendall((json.dumps(dict(kwargs, cmd=cmd)) + "\n").encode('utf-8'))
+                line = self.local.reader.readline()
+                if not line:
+                    raise ConnectionError("coordinator closed the connection")
+                reply = json.loads(line)
+                break
+            except OSError:
+                # Reconnect once, e.g. after the coordinator restarted
+                if conn is not None:
+                    conn.close()
+                self.local.conn = None
+                if attempt:
+                    raise
+        if 'error' in reply:
+            raise RuntimeError(f"Coordinator error: {reply['error']}")
+        return reply['result']
+
+    def __getattr__(self, cmd):
+        if cmd not in CoordinatorHandler.COMMANDS:
+            raise AttributeError(cmd)
+        return lambda **kwargs: self._call(cmd, **kwargs)
+
+def open_queue(spec):
+    """A coordinator client for "host:port", otherwise the database at that path."""
+    if re.match(r'^[\w.\-]*:\d+$', spec):
+        return CoordinatorClient(spec)
+    return JobQueue(spec)
+
+def scraper_command(job, scraper, extra_args):
+    """Command line that scrapes the job's account."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    script = 'twitter_scraper_undetected.py' if scraper == 'undetected' else 'run_scraper.py'
+    return [sys.executable, '-u', os.path.join(here, script), job['account'], *extra_args, *job['args']]
+
+class Worker:
+    """Keeps `slots` scrapes running, leasing a new job whenever one finishes."""
+
+    def __init__(self, queue, name, slots, command_for, output_dir=".", lease_seconds=LEASE_SECONDS,
+                 heartbeat_seconds=HEARTBEAT_SECONDS, poll_seconds=POLL_SECONDS):
+        self.queue = queue
+        self.name = name
+        self.slots = slots
+        self.command_for = command_for
+        self.output_dir = output_dir
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.poll_seconds = poll_seconds
+        self.stopping = threading.Event()
+        self.processes = {}  # Slot name -> running scraper process
+        self.completed = 0
+        self.failed = 0
+
+    def run(self):
+        """Run the slots until stop() is called and every running job was handed back."""
+        threads = [threading.Thread(target=self._slot, args=(slot,), daemon=True) for slot in range(self.slots)]
+        for thread in threads:
+            thread.start()
+        while any(thread.is_alive() for thread in threads):
+            try:
+                for thread in threads:
+                    thread.join(1)
+            except KeyboardInterrupt:
+                print("Leaving: handing the running jobs back to the queue...")
+                self.stop()
+
+    def stop(self):
+        """Stop leasing; running scrapes are ended and their jobs handed back."""
+        self.stopping.set()
+        for process in list(self.processes.values()):
+            if process.poll() is None:
+                process.terminate()
+
+    def _slot(self, slot):
+        slot_name = f"{self.name}/{slot}"
+        while not self.stopping.is_set():
+            try:
+                job = self.queue.lease(worker=slot_name, lease_seconds=self.lease_seconds)
+            except Exception as e:
+                print(f"[{slot_name}] Could not lease a job: {e}")
+                job = None
+            if job is None:
+                self.stopping.wait(self.poll_seconds)
+                continue
+            self._run_job(slot_name, job)
+
+    def _run_job(self, slot_name, job):
+        print(f"[{slot_name}] Scraping @{job['account']} (job {job['id']}, attempt {job['attempts']}/{job['max_attempts']})")
+        process = subprocess.Popen(self.command_for(job), cwd=self.output_dir, stdout=subprocess.PIPE,
+                                   stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL, text=True,
+                                   encoding='utf-8', errors='replace')
+        self.processes[slot_name] = process
+        progress = {}
+        tail = deque(maxlen=5)
+        lost = threading.Event()
+
+        def heartbeat():
+            while not lost.wait(self.heartbeat_seconds):
+                try:
+                    held = self.queue.heartbeat(job_id=job['id'], worker=slot_name, progress=dict(progress),
+                                                lease_seconds=self.lease_seconds)
+                except Exception as e:
+                    print(f"[{slot_name}] Heartbeat failed: {e}")
+                    continue
+                if not held:
+                    print(f"[{slot_name}] Lost the lease on @{job['account']}, stopping the scrape")
+                    lost.set()
+                    process.terminate()
+
+        beat = threading.Thread(target=heartbeat, daemon=True)
+        beat.start()
+        for line in process.stdout:
+            match = PROGRESS_PATTERN.search(line)
+            if match:
+                progress['scrolls'], progress['tweets'] = int(match.group(1)), int(match.group(2))
+            tail.append(line.rstrip())
+        returncode = process.wait()
+        del self.processes[slot_name]
+        stopped = lost.is_set()
+        lost.set()
+        beat.join()
+
+        try:
+            if self.stopping.is_set():
+                self.queue.release(job_id=job['id'], worker=slot_name)
+                print(f"[{slot_name}] Handed @{job['account']} back to the queue")
+            elif stopped:
+                pass  # Another worker holds the job now
+            elif returncode == 0:
+                self.queue.complete(job_id=job['id'], worker=slot_name, result=dict(progress))
+                self.completed += 1
+                print(f"[{slot_name}] Finished @{job['account']}: {progress.get('tweets', 0)} tweets")
+            else:
+                self.queue.fail(job_id=job['id'], worker=slot_name,
+                                error=f"exit code {returncode}: " + "\n".join(tail))
+                self.failed += 1
+                print(f"[{slot_name}] Scrape of @{job['account']} failed with exit code {returncode}")
+        except Exception as e:
+            # The lease will expire and the job is queued again
+            print(f"[{slot_name}] Could not report job {job['id']}: {e}")
+
+def print_status(status):
+    counts = status['counts']
+    print("Jobs: " + ", ".join(f"{counts.get(state, 0)} {state}" for state in ('queued', 'leased', 'done', 'failed')))
+    for job in status['jobs']:
+        progress = job['progress'] or {}
+        detail = f"{progress.get('tweets', 0)} tweets after {progress.get('scrolls', 0)} scrolls" if progress else ""
+        if job['state'] == 'leased':
+            detail = f"on {job['worker']}, {detail}"
+        elif job['last_error']:
+            detail = job['last_error'].splitlines()[0][:80]
+        print(f"   {job['id']:>5} @{job['account']:<20} {job['state']:<7} priority {job['priority']:>3} "
+              f"attempts {job['attempts']}/{job['max_attempts']}  {detail}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Distribute scrapes over many hosts through a job queue')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    coordinator = commands.add_parser('coordinator', help='Serve a job database to workers over TCP')
+    coordinator.add_argument('--db', default=DEFAULT_DB, help=f'Job database (default: {DEFAULT_DB})')
+    coordinator.add_argument('--address', default=DEFAULT_ADDRESS, help=f'host:port to listen on (default: {DEFAULT_ADDRESS})')
+
+    queue_help = f'Coordinator host:port, or the path of a job database on a shared volume (default: {DEFAULT_DB})'
+    add = commands.add_parser('add', help='Queue accounts to scrape')
+    add.add_argument('accounts', nargs='*', help='Usernames to scrape (without @)')
+    add.add_argument('--file', help='Also read usernames from this file, one per line')
+    add.add_argument('--queue', default=DEFAULT_DB, help=queue_help)
+    add.add_argument('--priority', type=int, default=0, help='Higher runs first (default: 0)')
+    add.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS, help=f'Retry budget per account (default: {MAX_ATTEMPTS})')
+    add.add_argument('--scraper-args', default='', help='Extra scraper arguments for these accounts, e.g. "--max-scrolls 200"')
+
+    worker = commands.add_parser('worker', help='Lease and run scrapes until stopped')
+    worker.add_argument('--queue', default=DEFAULT_DB, help=queue_help)
+    worker.add_argument('--slots', type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help='Scrapes (browsers) to run at once (default: half the CPUs)')
+    worker.add_argument('--name', default=socket.gethostname(), help='Worker name shown in the status (default: hostname)')
+    worker.add_argument('--scraper', choices=['undetected', 'standard'], default='undetected',
+                        help='Scraper to run for each job (default: undetected)')
+    worker.add_argument('--output-dir', default='.', help='Directory the output files are written to (default: .)')
+    worker.add_argument('--lease-seconds', type=int, default=LEASE_SECONDS,
+                        help=f'Seconds without heartbeat before a job is given to another worker (default: {LEASE_SECONDS})')
+    worker.add_argument('scraper_args', nargs=argparse.REMAINDER,
+                        help='Arguments after -- are passed to every scrape, e.g. -- --browser-pool 127.0.0.1:9300')
+
+    status = commands.add_parser('status', help='Show the jobs and their progress')
+    status.add_argument('--queue', default=DEFAULT_DB, help=queue_help)
+    status.add_argument('--json', action='store_true', help='Print the status as JSON')
+    args = parser.parse_args()
+
+    if args.command == 'coordinator':
+        server = CoordinatorServer(parse_address(args.address), JobQueue(args.db))
+        print(f"Job coordinator for {args.db} listening on {args.address}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("Shutting down job coordinator...")
+        finally:
+            server.server_close()
+        return
+
+    queue = open_queue(args.queue)
+    if args.command == 'add':
+        accounts = [account.lstrip('@') for account in args.accounts]
+        if args.file:
+            with open(args.file, 'r', encoding='utf-8') as f:
+                accounts += [line.strip().lstrip('@') for line in f if line.strip() and not line.startswith('#')]
+        if not accounts:
+            parser.error("no accounts given")
+        for account in accounts:
+            queue.add(account=account, priority=args.priority, max_attempts=args.max_attempts,
+                      args=shlex.split(args.scraper_args))
+        print(f"Queued {len(accounts)} accounts")
+    elif args.command == 'status':
+        if args.json:
+            print(json.dumps(queue.status(), indent=2))
+        else:
+            print_status(queue.status())
+    else:
+        extra_args = [arg for arg in args.scraper_args if arg != '--']
+        os.makedirs(args.output_dir, exist_ok=True)
+        worker = Worker(queue, args.name, args.slots, lambda job: scraper_command(job, args.scraper, extra_args),
+                        args.output_dir, args.lease_seconds, heartbeat_seconds=max(1, args.lease_seconds // 4))
+        # Leaving hands the running jobs back instead of waiting for their leases to expire
+        signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+        print(f"Worker {args.name} running {args.slots} scrapes at a time from {args.queue}. Press Ctrl+C to leave")
+        worker.run()
+        print(f"Worker {args.name} done: {worker.completed} completed, {worker.failed} failed")
+
+if __name__ == "__main__":
+    main()
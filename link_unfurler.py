@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+Link unfurling for scraped tweets.
+Takes the links of each tweet (the t.co hrefs the scrapers keep in the links
+column), follows their redirects to the final URL and reads the page title,
+then writes the tweets out again with the results in new columns. Timeouts and
+5xx answers are retried with backoff before a link counts as failed. Requests go through one pooled
+keep-alive aiohttp session with a limit on concurrent requests per domain, and
+results are kept in a persistent SQLite cache, so a URL that appears in
+thousands of tweets is fetched once, and not again until its entry expires.
+"""
+
+import argparse
+import asyncio
+import csv
+import html
+import os
+import random
+import re
+import sqlite3
+import time
+from urllib.parse import urljoin, urlsplit
+
+import aiohttp
+
+from tweet_files import MANIFEST_SUFFIX, is_manifest, iter_rows
+from tweet_tokenizer import clean_text, tokenize
+
+DEFAULT_CACHE = "link_cache.sqlite"
+CONCURRENCY = 64  # Requests in flight over all domains
+PER_DOMAIN = 4  # Requests in flight per domain
+TIMEOUT = 15  # Seconds a request may take, redirects excluded
+CONNECT_TIMEOUT = 5
+MAX_REDIRECTS = 10
+MAX_BODY_BYTES = 65536  # Bytes of a page read to find its title
+CACHE_TTL = 7 * 24 * 3600  # Seconds a resolved link stays valid
+ERROR_TTL = 3600  # Seconds before a link that failed is tried again
+RETRIES = 3  # Extra attempts at a request that timed out, could not connect or got a transient status
+RETRY_BACKOFF = 0.5  # Seconds before the first retry, doubled for each one after it
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+CACHE_SIZE = 1000000  # Links kept in the cache; the least recently used are dropped beyond this
+CACHE_BATCH = 500  # Results written to the cache per transaction
+USER_AGENT = "Mozilla/5.0 (compatible; tweet-link-unfurler)"
+# Links to other tweets need a logged-in browser; they are kept as they are
+SKIP_DOMAINS = ('twitter.com', 'x.com')
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+# X cuts long links off with this in the displayed text; such a link is only the start of a URL
+ELLIPSIS = "…"
+TRUNCATED = "truncated"
+
+LINK_FIELDS = ['expanded_urls', 'link_domains', 'link_titles', 'link_status']
+TITLE_SEPARATOR = " | "
+
+TITLE_PATTERN = re.compile(rb'<title[^>]*>(.*?)</title', re.IGNORECASE | re.DOTALL)
+OG_TITLE_PATTERN = re.compile(rb'<meta[^>]+property=["\']og:title["\'][^>]*content=["\']([^"\']*)', re.IGNORECASE)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS links (
+    url TEXT PRIMARY KEY,
+    final_url TEXT NOT NULL,
+    status INTEGER,
+    title TEXT NOT NULL DEFAULT '',
+    error TEXT,
+    fetched REAL NOT NULL,
+    used REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS links_used ON links (used);
+"""
+
+LINK_RESULT_FIELDS = ['url', 'final_url', 'status', 'title', 'error']
+
+class LinkCache:
+    """Resolved links by URL, with a time to live and least-recently-used eviction."""
+
+    def __init__(self, path=DEFAULT_CACHE, ttl=CACHE_TTL, error_ttl=ERROR_TTL, max_entries=CACHE_SIZE):
+        self.path = path
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.max_entries = max_entries
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.executescript(SCHEMA)
+
+    def get_many(self, urls):
+        """Return {url: result} for the urls with an entry that has not expired, and mark them used."""
+        now = time.time()
+        found = {}
+        urls = list(urls)
+        for i in range(0, len(urls), CACHE_BATCH):
+            chunk = urls[i:i + CACHE_BATCH]
+            rows = self.conn.execute(
+                f"""SELECT url, final_url, status, title, error FROM links WHERE url IN ({','.join('?' * len(chunk))})
+                    AND fetched > CASE WHEN error IS NULL THEN ? ELSE ? END""",
+                chunk + [now - self.ttl, now - self.error_ttl]).fetchall()
+            for row in rows:
+                found[row[0]] = dict(zip(LINK_RESULT_FIELDS, row))
+            self.conn.executemany("UPDATE links SET used = ? WHERE url = ?", [(now, row[0]) for row in rows])
+        self.conn.commit()
+        return found
+
+    def put_many(self, results):
+        """Store freshly resolved links."""
+        now = time.time()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO links (url, final_url, status, title, error, fetched, used) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(r['url'], r['final_url'], r['status'], r['title'], r['error'], now, now) for r in results])
+        self.conn.commit()
+
+    def evict(self):
+        """Drop the least recently used entries beyond max_entries; returns how many were dropped."""
+        cursor = self.conn.execute("""DELETE FROM links WHERE url IN
+                                      (SELECT url FROM links ORDER BY used DESC LIMIT -1 OFFSET ?)""", (self.max_entries,))
+        self.conn.commit()
+        return cursor.rowcount
+
+    def close(self):
+        self.conn.close()
+
+def link_result(url, final_url=None, status=None, title="", error=None):
+    return {'url': url, 'final_url': final_url or url, 'status': status, 'title': title, 'error': error}
+
+def is_skipped(host):
+    return any(host == domain or host.endswith("." + domain) for domain in SKIP_DOMAINS)
+
+def page_title(body, charset=None):
+    """The <title> of an HTML page, or its og:title, as clean text."""
+    match = TITLE_PATTERN.search(body) or OG_TITLE_PATTERN.search(body)
+    if not match:
+        return ""
+    try:
+        title = match.group(1).decode(charset or 'utf-8', errors='replace')
+    except LookupError:
+        title = match.group(1).decode('utf-8', errors='replace')
+    return clean_text(html.unescape(title))
+
+def link_domain(url):
+    host = urlsplit(url).hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+class LinkResolver:
+    """Follows redirects and reads page titles over one pooled aiohttp session.
+
+    Every redirect hop is fetched once per run, so shortened links that lead
+    to the same page share the request for that page.
+    """
+
+    def __init__(self, concurrency=CONCURRENCY, per_domain=PER_DOMAIN, timeout=TIMEOUT, retries=RETRIES):
+        self.concurrency = concurrency
+        self.per_domain = per_domain
+        self.timeout = timeout
+        self.retries = retries
+        self.session = None
+        self.hops = {}  # URL -> task fetching that single hop
+        self.requests = 0
+
+    async def __aenter__(self):
+        # limit_per_host caps the connections, and so the requests in flight, per host
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_domain, ttl_dns_cache=300)
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout, sock_connect=CONNECT_TIMEOUT),
+            headers={'User-Agent': USER_AGENT, 'Accept': 'text/html,*/*;q=0.8'},
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+
+    async def fetch_hop(self, url):
+        """Fetch one URL without following redirects: ('redirect', location) or ('page', status, title)."""
+        self.requests += 1
+        async with self.session.get(url, allow_redirects=False) as response:
+            if response.status in REDIRECT_STATUSES and 'Location' in response.headers:
+                # Read the (small) body so the connection goes back to the pool
+                await response.read()
+                return ('redirect', urljoin(url, response.headers['Location']))
+            title = ""
+            if response.status == 200 and 'html' in response.headers.get('Content-Type', ''):
+                # Read until the title is in, but never a whole large page; other bodies are not read at all
+                body = b""
+                while len(body) < MAX_BODY_BYTES:
+                    chunk = await response.content.read(MAX_BODY_BYTES - len(body))
+                    if not chunk:
+                        break
+                    body += chunk
+                    if TITLE_PATTERN.search(body):
+                        break
+                title = page_title(body, response.charset)
+            elif response.content_length is not None and response.content_length <= MAX_BODY_BYTES:
+                # Small bodies are read so the connection can be reused; downloads are cut off
+                await response.read()
+            return ('page', response.status, title)
+
+    async def fetch_hop_retrying(self, url):
+        """fetch_hop(), retrying timeouts, connection errors and RETRY_STATUSES with exponential backoff."""
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            try:
+                outcome = await self.fetch_hop(url)
+            except (asyncio.TimeoutError, aiohttp.ClientConnectionError):
+                if last:
+                    raise
+            else:
+                if last or outcome[0] != 'page' or outcome[1] not in RETRY_STATUSES:
+                    return outcome
+            # Jittered, so links that failed together don't all come back at the same moment
+            await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
+
+    def hop(self, url):
+        task = self.hops.get(url)
+        if task is None:
+            task = self.hops[url] = asyncio.ensure_future(self.fetch_hop_retrying(url))
+        return task
+
+    async def resolve(self, url):
+        """Follow url to its final page; never raises, errors are part of the result."""
+        # Tweets link bare "www." addresses too; browsers open those over http and so do we
+        current = url if '://' in url else f"http://{url}"
+        try:
+            for _ in range(MAX_REDIRECTS + 1):
+                parts = urlsplit(current)
+                if parts.scheme not in ('http', 'https') or not parts.hostname:
+                    return link_result(url, current, error="not an http link")
+                if is_skipped(parts.hostname):
+                    return link_result(url, current)
+                outcome = await self.hop(current)
+                if outcome[0] == 'redirect':
+                    current = outcome[1]
+                    continue
+                status, title = outcome[1], outcome[2]
+                return link_result(url, current, status, title, None if status < 400 else f"HTTP {status}")
+            return link_result(url, current, error="too many redirects")
+        except asyncio.TimeoutError:
+            return link_result(url, current, error="timeout")
+        except (aiohttp.ClientError, ValueError) as e:
+            return link_result(url, current, error=f"{type(e).__name__}: {e}"[:200])
+
+async def resolve_links(urls, cache, concurrency=CONCURRENCY, per_domain=PER_DOMAIN, timeout=TIMEOUT,
+                        retries=RETRIES):
+    """Resolve every url, from the cache where possible; returns {url: result}."""
+    # Links cut off with "…" lead nowhere useful (or somewhere wrong), so they are neither fetched nor cached
+    truncated = [url for url in urls if url.endswith(ELLIPSIS)]
+    urls = [url for url in urls if not url.endswith(ELLIPSIS)]
+    results = cache.get_many(urls)
+    results.update((url, link_result(url, error=TRUNCATED)) for url in truncated)
+    todo = [url for url in urls if url not in results]
+    print(f"{len(urls) + len(truncated)} unique links: {len(results) - len(truncated)} cached, "
+          f"{len(truncated)} truncated, {len(todo)} to resolve")
+    if not todo:
+        return results
+
+    queue = asyncio.Queue()
+    for url in todo:
+        queue.put_nowait(url)
+    pending = []
+    started = time.monotonic()
+
+    async with LinkResolver(concurrency, per_domain, timeout, retries) as resolver:
+        async def worker():
+            while True:
+                try:
+                    url = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                result = await resolver.resolve(url)
+                results[url] = result
+                pending.append(result)
+                if len(pending) >= CACHE_BATCH:
+                    cache.put_many(pending)
+                    pending.clear()
+                    done = len(todo) - queue.qsize()
+                    print(f"Resolved {done}/{len(todo)} links ({done / (time.monotonic() - started):.0f} links/s)")
+
+        await asyncio.gather(*(worker() for _ in range(min(concurrency, len(todo)))))
+        requests = resolver.requests
+    cache.put_many(pending)
+
+    failed = sum(1 for url in todo if results[url]['error'])
+    elapsed = time.monotonic() - started
+    print(f"Resolved {len(todo)} links with {requests} requests in {elapsed:.1f}s "
+          f"({len(todo) / elapsed:.0f} links/s), {failed} failed")
+    return results
+
+def tweet_links(row):
+    """The links of a tweet, in order, without repeats.
+
+    These are the full t.co hrefs of the links column. Files scraped before that column existed only have the
+    text, where long links are cut off with "…"; such links keep the "…" so they are reported as truncated.
+    """
+    links = (row.get('links') or "").split()
+    if not links:
+        text = row.get('text') or ""
+        links = [url + ELLIPSIS if url + ELLIPSIS in text else url for url in tokenize(text).urls]
+    return list(dict.fromkeys(links))
+
+def link_status(result):
+    """HTTP status of the final page, 'truncated' for a cut off link, 'error' if it failed, '-' if not fetched."""
+    if result['status']:
+        return str(result['status'])
+    if result['error'] == TRUNCATED:
+        return TRUNCATED
+    return "error" if result['error'] else "-"
+
+def link_columns(links, results):
+    """The new column values for a tweet's links; several links are space (titles: ' | ') separated."""
+    resolved = [results[url] for url in links if url in results]
+    return {
+        'expanded_urls': " ".join(r['final_url'] for r in resolved),
+        'link_domains': " ".join(link_domain(r['final_url']) for r in resolved),
+        'link_titles': TITLE_SEPARATOR.join(r['title'].replace(TITLE_SEPARATOR, " ") for r in resolved),
+        'link_status': " ".join(link_status(r) for r in resolved),
+    }
+
+def links_file_for(path):
+    """The output file for the tweets of path with their links unfurled."""
+    if is_manifest(path):
+        base = path[:-len(MANIFEST_SUFFIX)]
+    else:
+        base = path
+        for extension in ('.gz', '.zst'):
+            if base.endswith(extension):
+                base = base[:-len(extension)]
+        base = os.path.splitext(base)[0]
+    return f"{base}_links.csv"
+
+def write_unfurled(path, output, results):
+    """Write the rows of path to output with the link columns added; returns (rows, rows with links)."""
+    rows = iter_rows(path)
+    fields = list(rows.fieldnames or [])
+    fields += [field for field in LINK_FIELDS if field not in fields]
+    count = with_links = 0
+    tmp_file = f"{output}.tmp"
+    with open(tmp_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for row in rows:
+            links = tweet_links(row)
+            row.update(link_columns(links, results))
+            writer.writerow(row)
+            count += 1
+            with_links += bool(links)
+    os.replace(tmp_file, output)
+    return count, with_links
+
+def unfurl_files(paths, cache_path=DEFAULT_CACHE, concurrency=CONCURRENCY, per_domain=PER_DOMAIN, timeout=TIMEOUT,
+                 ttl=CACHE_TTL, cache_size=CACHE_SIZE, in_place=False, retries=RETRIES):
+    """Unfurl the links of several output files in one pass; returns {path: output file}."""
+    urls = {}
+    for path in paths:
+        for row in iter_rows(path):
+            for url in tweet_links(row):
+                urls[url] = True
+    cache = LinkCache(cache_path, ttl=ttl, max_entries=cache_size)
+    try:
+        results = asyncio.run(resolve_links(list(urls), cache, concurrency, per_domain, timeout, retries))
+        evicted = cache.evict()
+        if evicted:
+            print(f"Dropped {evicted} least recently used links from {cache_path}")
+    finally:
+        cache.close()
+
+    outputs = {}
+    for path in paths:
+        output = path if in_place else links_file_for(path)
+        count, with_links = write_unfurled(path, output, results)
+        print(f"{path}: {with_links} of {count} tweets have links, written to {output}")
+        outputs[path] = output
+    return outputs
+
+def main():
+    parser = argparse.ArgumentParser(description='Resolve the links in scraped tweets to their final URLs and page titles')
+    parser.add_argument('files', nargs='+', help='CSV files created by the scraper (plain, compressed or manifests)')
+    parser.add_argument('--cache', default=DEFAULT_CACHE, help=f'SQLite cache of resolved links (default: {DEFAULT_CACHE})')
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY,
+                        help=f'Requests in flight over all domains (default: {CONCURRENCY})')
+    parser.add_argument('--per-domain', type=int, default=PER_DOMAIN,
+                        help=f'Requests in flight per domain (default: {PER_DOMAIN})')
+    parser.add_argument('--timeout', type=float, default=TIMEOUT, help=f'Seconds per request (default: {TIMEOUT})')
+    parser.add_argument('--retries', type=int, default=RETRIES,
+                        help=f'Extra attempts at a request that timed out or got a 429/5xx, with backoff (default: {RETRIES})')
+    parser.add_argument('--ttl-hours', type=float, default=CACHE_TTL / 3600,
+                        help=f'Hours a cached link stays valid (default: {CACHE_TTL // 3600})')
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE,
+                        help=f'Links kept in the cache, least recently used dropped first (default: {CACHE_SIZE})')
+    parser.add_argument('--in-place', action='store_true',
+                        help='Add the columns to the input files instead of writing <name>_links.csv (plain CSV only)')
+    args = parser.parse_args()
+
+    paths = []
+    for path in args.files:
+        if not os.path.exists(path):
+            print(f"Error: File {path} does not exist!")
+        elif args.in_place and (is_manifest(path) or path.endswith(('.gz', '.zst'))):
+            print(f"Error: {path} is compressed or rotated; --in-place only rewrites plain CSV files")
+        else:
+            paths.append(path)
+    if paths:
+        unfurl_files(paths, args.cache, args.concurrency, args.per_domain, args.timeout, args.ttl_hours * 3600,
+                     args.cache_size, args.in_place, args.retries)
+
+if __name__ == "__main__":
+    main()
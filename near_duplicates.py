@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate tweet clustering with MinHash and LSH banding.
+Used by analyze_tweets.py --near-duplicates to find copy-paste campaigns and
+templated replies without comparing every pair of tweets.
+"""
+
+import re
+import numpy as np
+
+SHINGLE_SIZE = 5  # Characters per shingle, at most 8 so a shingle packs into one uint64
+NUM_PERM = 64  # MinHash permutations per tweet
+BATCH_SHINGLES = 250000  # Shingles hashed per vectorized batch, bounds peak memory
+SEED = 1
+
+URL_PATTERN = re.compile(r'https?://\S+|www\.\S+')
+MENTION_PATTERN = re.compile(r'@\w+')
+NON_WORD_PATTERN = re.compile(r'[^\w\s]+')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+def normalize_text(text):
+    """Lowercase the text and drop URLs, mentions and punctuation so templates line up."""
+    text = URL_PATTERN.sub(' ', text.lower())
+    text = MENTION_PATTERN.sub(' ', text)
+    text = NON_WORD_PATTERN.sub(' ', text)
+    return WHITESPACE_PATTERN.sub(' ', text).strip()
+
+def choose_bands(num_perm, threshold):
+    """Pick (bands, rows) whose LSH threshold (1/bands)^(1/rows) is closest to `threshold`."""
+    best = None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        error = abs((1.0 / bands) ** (1.0 / rows) - threshold)
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+def _shingle_hashes(texts):
+    """Pack every character shingle of a batch of texts into uint64 values.
+
+    Returns the hashes and the index of each text's first shingle.
+    """
+    encoded = [t.encode('utf-8').ljust(SHINGLE_SIZE) for t in texts]
+    lengths = np.fromiter((len(e) for e in encoded), dtype=np.int64, count=len(encoded))
+    buf = np.frombuffer(b''.join(encoded), dtype=np.uint8).astype(np.uint64)
+
+    text_starts = np.cumsum(lengths) - lengths
+    shingle_counts = lengths - SHINGLE_SIZE + 1
+    shingle_starts = np.cumsum(shingle_counts) - shingle_counts
+    total = int(shingle_counts.sum())
+
+    # Start position of every shingle in the joined buffer, never crossing a text boundary
+    positions = np.repeat(text_starts - shingle_starts, shingle_counts) + np.arange(total, dtype=np.int64)
+    hashes = np.zeros(total, dtype=np.uint64)
+    for j in range(SHINGLE_SIZE):
+        hashes |= buf[positions + j] << np.uint64(8 * j)
+    return hashes, shingle_starts
+
+def minhash_signatures(texts, num_perm=NUM_PERM, seed=SEED):
+    """Compute MinHash signatures (len(texts) x num_perm, uint32) in vectorized batches."""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint32)
+
+    start = 0
+    while start < len(texts):
+        # Grow the batch until it holds roughly BATCH_SHINGLES shingles
+        end, budget = start, 0
+        while end < len(texts) and (budget < BATCH_SHINGLES or end == start):
+            budget += max(len(texts[end]), SHINGLE_SIZE) - SHINGLE_SIZE + 1
+            end += 1
+
+        hashes, offsets = _shingle_hashes(texts[start:end])
+        with np.errstate(over='ignore'):
+            # Multiply-shift hashing, one row per permutation
+            permuted = (hashes[None, :] * a[:, None] + b[:, None]) >> np.uint64(32)
+        signatures[start:end] = np.minimum.reduceat(permuted, offsets, axis=1).T.astype(np.uint32)
+        start = end
+
+    return signatures
+
+def _merge_components(labels, u, v):
+    """Union the components of each (u[i], v[i]) edge, vectorized.
+
+    labels[i] <= i always holds and every label is fully compressed to its root
+    on return, so labels identify the connected components.
+    """
+    while True:
+        lu, lv = labels[u], labels[v]
+        pending = lu != lv
+        if not pending.any():
+            return labels
+        u, v, lu, lv = u[pending], v[pending], lu[pending], lv[pending]
+        low = np.minimum(lu, lv)
+        # Hook both roots onto the smaller one, then compress paths
+        np.minimum.at(labels, lu, low)
+        np.minimum.at(labels, lv, low)
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+
+def lsh_clusters(signatures, threshold, min_size=2):
+    """Group rows whose estimated Jaccard similarity is at least `threshold`.
+
+    Rows sharing an LSH band bucket are linked to the first row of that bucket
+    when their signatures agree closely enough, so the work stays linear in the
+    number of rows instead of quadratic. Returns index arrays of the clusters
+    with at least `min_size` rows.
+    """
+    n, num_perm = signatures.shape
+    bands, rows = choose_bands(num_perm, threshold)
+    labels = np.arange(n, dtype=np.int64)
+    rng = np.random.default_rng(SEED + 1)
+    mix = rng.integers(1, 2**63, size=rows, dtype=np.uint64) | np.uint64(1)
+
+    for band in range(bands):
+        columns = signatures[:, band * rows:(band + 1) * rows].astype(np.uint64)
+        with np.errstate(over='ignore'):
+            keys = (columns * mix).sum(axis=1, dtype=np.uint64)
+
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        is_first = np.ones(n, dtype=bool)
+        is_first[1:] = sorted_keys[1:] != sorted_keys[:-1]
+        bucket_first = order[np.maximum.accumulate(np.where(is_first, np.arange(n), 0))]
+
+        members = order[~is_first]
+        heads = bucket_first[~is_first]
+        if not len(members):
+            continue
+
+        # Verify candidates against the bucket head before merging
+        similar = (signatures[members] == signatures[heads]).mean(axis=1) >= threshold
+        labels = _merge_components(labels, members[similar], heads[similar])
+
+    order = np.argsort(labels, kind='stable')
+    sorted_labels = labels[order]
+    boundaries = np.flatnonzero(np.diff(sorted_labels)) + 1
+    starts = np.concatenate(([0], boundaries))
+    ends = np.concatenate((boundaries, [n]))
+    return [order[starts[i]:ends[i]] for i in np.flatnonzero(ends - starts >= min_size)]
+
+def find_near_duplicates(tweets, threshold=0.8, min_size=2, num_perm=NUM_PERM):
+    """Cluster tweets with near-identical text.
+
+    Returns a list of dictionaries with the member tweets, cluster size and total
+    engagement, largest clusters first.
+    """
+    candidates = []
+    texts = []
+    for tweet in tweets:
+        text = normalize_text(tweet.get('text') or "")
+        if text and tweet.get('text') != "No text found":
+            candidates.append(tweet)
+            texts.append(text)
+    if not texts:
+        return []
+
+    signatures = minhash_signatures(texts, num_perm=num_perm)
+    results = []
+    for members in lsh_clusters(signatures, threshold, min_size=min_size):
+        cluster_tweets = [candidates[i] for i in members.tolist()]
+        results.append({
+            'size': len(cluster_tweets),
+            'engagement': sum(t['replies'] + t['retweets'] + t['likes'] for t in cluster_tweets),
+            'replies': sum(t['replies'] for t in cluster_tweets),
+            'retweets': sum(t['retweets'] for t in cluster_tweets),
+            'likes': sum(t['likes'] for t in cluster_tweets),
+            'tweets': cluster_tweets,
+        })
+
+    results.sort(key=lambda c: (c['size'], c['engagement']), reverse=True)
+    return results
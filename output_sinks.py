@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Output sinks for scraped tweets.
+A sink receives batches of records as they are scraped: JSON lines appended to
+a file, newline-delimited JSON on stdout for piping, or batched HTTP POSTs to a
+webhook over pooled keep-alive connections. Several sinks can be active at once.
+"""
+
+import http.client
+import json
+import logging
+import queue
+import random
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+class Sink:
+    """Base class: write() takes a list of record dictionaries."""
+
+    def write(self, records):
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+class JsonLinesSink(Sink):
+    """Append one JSON object per line to a file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def write(self, records):
+        self.file.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records))
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+class StdoutSink(Sink):
+    """Write newline-delimited JSON to stdout.
+
+    While it is open, everything else printed goes to stderr so the stream
+    stays machine-readable.
+    """
+
+    def __init__(self):
+        self.stream = sys.stdout
+        sys.stdout = sys.stderr
+
+    def write(self, records):
+        self.stream.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records))
+        self.stream.flush()
+
+    def close(self):
+        sys.stdout = self.stream
+
+class HttpSink(Sink):
+    """POST records as JSON arrays to a webhook.
+
+    Records are grouped into batches of batch_size (or whatever accumulated
+    after flush_interval seconds). max_in_flight worker threads each keep one
+    keep-alive connection open and send one batch at a time; when all of them
+    are busy and max_in_flight more batches are waiting, write() blocks, which
+    slows the scraper down instead of buffering without bound. Connection
+    errors, 408, 429 and 5xx responses are retried with exponential backoff,
+    honoring Retry-After.
+    """
+
+    def __init__(self, url, batch_size=100, flush_interval=2.0, max_in_flight=4, retries=5,
+                 backoff=0.5, timeout=10.0, headers=None):
+        parsed = urlparse(url)
+        if parsed.scheme not in ('http', 'https'):
+            raise ValueError(f"unsupported webhook URL {url}")
+        self.url = url
+        self.scheme = parsed.scheme
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.path = (parsed.path or '/') + (f"?{parsed.query}" if parsed.query else '')
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.headers = {'Content-Type': 'application/json', 'Connection': 'keep-alive', **(headers or {})}
+
+        self.pending = []
+        self.last_submit = time.monotonic()
+        self.lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+        self.requests = 0
+        self.batches = queue.Queue(maxsize=max_in_flight)
+        self.workers = [threading.Thread(target=self._worker, daemon=True) for _ in range(max_in_flight)]
+        for worker in self.workers:
+            worker.start()
+
+    def write(self, records):
+        self.pending.extend(records)
+        while len(self.pending) >= self.batch_size:
+            self._submit(self.pending[:self.batch_size])
+            del self.pending[:self.batch_size]
+        if self.pending and time.monotonic() - self.last_submit >= self.flush_interval:
+            self._submit(self.pending)
+            self.pending = []
+
+    def flush(self):
+        """Send whatever is pending and wait until every batch was delivered or given up on."""
+        if self.pending:
+            self._submit(self.pending)
+            self.pending = []
+        self.batches.join()
+
+    def close(self):
+        self.flush()
+        for _ in self.workers:
+            self.batches.put(None)
+        for worker in self.workers:
+            worker.join()
+
+    def _submit(self, batch):
+        self.last_submit = time.monotonic()
+        self.batches.put(list(batch))  # Blocks while max_in_flight batches are waiting
+
+    def _connect(self):
+        if self.scheme == 'https':
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def _worker(self):
+        conn = None
+        while True:
+            batch = self.batches.get()
+            try:
+                if batch is None:
+                    break
+                conn = self._post(conn, batch)
+            finally:
+                self.batches.task_done()
+        if conn:
+            conn.close()
+
+    def _post(self, conn, batch):
+        """Deliver one batch, retrying on transient failures. Returns the connection to reuse."""
+        body = json.dumps(batch, ensure_ascii=False).encode('utf-8')
+        for attempt in range(self.retries + 1):
+            delay = self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+            try:
+                if conn is None:
+                    conn = self._connect()
+                conn.request('POST', self.path, body, self.headers)
+                response = conn.getresponse()
+                response.read()
+                with self.lock:
+                    self.requests += 1
+                if response.getheader('Connection', '').lower() == 'close':
+                    conn.close()
+                    conn = None
+
+                if 200 <= response.status < 300:
+                    with self.lock:
+                        self.sent += len(batch)
+                    return conn
+                if response.status not in (408, 429) and response.status < 500:
+                    logger.warning("Webhook %s rejected a batch of %d tweets: HTTP %s",
+                                   self.url, len(batch), response.status)
+                    break
+                retry_after = response.getheader('Retry-After')
+                if retry_after and retry_after.isdigit():
+                    delay = max(delay, int(retry_after))
+            except (OSError, http.client.HTTPException):
+                if conn:
+                    conn.close()
+                conn = None
+            if attempt < self.retries:
+                time.sleep(delay)
+        else:
+            logger.warning("Giving up on a batch of %d tweets for %s after %d retries",
+                           len(batch), self.url, self.retries)
+
+        with self.lock:
+            self.failed += len(batch)
+        return conn
+
+class SinkSet:
+    """Fan records out to several sinks, sending each tweet once."""
+
+    def __init__(self, sinks):
+        self.sinks = sinks
+        self.sent_keys = set()
+
+    def send_new(self, tweets):
+        """Send the tweets not sent before; callers may pass their whole list every time."""
+        new = []
+        for tweet in tweets:
+            key = tweet.get('tweet_id')
+            if not key or key == "Unknown":
+                key = tweet.get('text')
+            if key not in self.sent_keys:
+                self.sent_keys.add(key)
+                new.append(tweet)
+        if new:
+            for sink in self.sinks:
+                sink.write(new)
+        return len(new)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+def open_sink(spec):
+    """Create a sink from a spec: 'stdout', 'jsonl:PATH' or an http(s):// webhook URL."""
+    if spec == 'stdout':
+        return StdoutSink()
+    if spec.startswith('jsonl:'):
+        return JsonLinesSink(spec[len('jsonl:'):])
+    if spec.startswith(('http://', 'https://')):
+        return HttpSink(spec)
+    raise ValueError(f"unknown sink '{spec}', expected stdout, jsonl:PATH or an http(s):// URL")
+
+def open_sinks(specs):
+    return SinkSet([open_sink(spec) for spec in specs])
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Profiling hooks for long scraper and analyzer runs.
+With profiling started, checkpoint() writes cProfile stats and/or tracemalloc
+snapshots every N scrolls (or rows) and once more at exit, so slowdowns and
+memory growth late in a run can be traced to the code responsible. Run this
+module on a snapshot directory to diff the snapshots over time.
+"""
+
+import argparse
+import cProfile
+import fnmatch
+import glob
+import inspect
+import json
+import linecache
+import logging
+import os
+import pstats
+import time
+import tokenize
+import tracemalloc
+from datetime import datetime
+
+TRACE_FRAMES = 1  # Frames kept per allocation; more gives tracebacks but costs memory and time
+TOP_ALLOCATIONS = 25  # Lines listed in the text summary of each snapshot
+# Modules of the profiling machinery itself; their allocations are left out of the memory snapshots
+PROFILER_FILES = [tracemalloc.__file__, cProfile.__file__, pstats.__file__, linecache.__file__, tokenize.__file__,
+                  inspect.__file__, fnmatch.__file__, __file__,
+                  "<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>"]
+
+logger = logging.getLogger(__name__)
+
+class Profiler:
+    """Writes cProfile and tracemalloc snapshots into a directory.
+
+    cProfile stats are cumulative since start, so the difference between two
+    snapshots is the time spent in that interval. Every snapshot is also listed
+    in snapshots.jsonl with the traced memory at that point.
+    """
+
+    def __init__(self, directory, profile=True, trace_memory=False, every=50, label="scroll"):
+        self.directory = directory
+        self.every = every
+        self.label = label
+        self.profile = cProfile.Profile() if profile else None
+        self.trace_memory = trace_memory
+        self.started = time.monotonic()
+        self.last_index = 0
+        os.makedirs(directory, exist_ok=True)
+
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+        if self.profile:
+            self.profile.enable()
+
+    def checkpoint(self, index):
+        """Take a snapshot if index is a multiple of the snapshot interval."""
+        self.last_index = index
+        if self.every and index and index % self.every == 0:
+            self.snapshot(self.label, index)
+
+    def snapshot(self, label, index):
+        """Write the snapshot files for this point of the run."""
+        # Keep the snapshot's own work out of the profile
+        if self.profile:
+            self.profile.disable()
+        name = f"{label}_{index:06d}"
+        entry = {
+            'label': label,
+            'index': index,
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'elapsed_s': round(time.monotonic() - self.started, 3),
+        }
+
+        # Take the memory snapshot first, before writing the profile and formatting lines allocate anything
+        if self.trace_memory:
+            snapshot = tracemalloc.take_snapshot()
+            entry['traced_bytes'], entry['traced_peak_bytes'] = tracemalloc.get_traced_memory()
+            snapshot = snapshot.filter_traces([tracemalloc.Filter(False, path) for path in PROFILER_FILES])
+        if self.profile:
+            entry['profile'] = f"{name}.prof"
+            self.profile.dump_stats(os.path.join(self.directory, entry['profile']))
+        if self.trace_memory:
+            entry['memory'] = f"{name}.tracemalloc"
+            snapshot.dump(os.path.join(self.directory, entry['memory']))
+            with open(os.path.join(self.directory, f"{name}_memory.txt"), 'w', encoding='utf-8') as f:
+                f.write(f"Traced memory: {entry['traced_bytes'] / 1024 / 1024:.1f} MiB "
+                        f"(peak {entry['traced_peak_bytes'] / 1024 / 1024:.1f} MiB)\n")
+                for stat in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]:
+                    f.write(f"{format_allocation(stat.traceback[0], stat.size, stat.count)}\n")
+
+        with open(os.path.join(self.directory, "snapshots.jsonl"), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + "\n")
+        if self.profile:
+            self.profile.enable()
+
+    def close(self):
+        """Take the final snapshot and stop profiling."""
+        self.snapshot("exit", self.last_index)
+        if self.profile:
+            self.profile.disable()
+        if self.trace_memory:
+            tracemalloc.stop()
+
+active_profiler = None  # Profiler started by start(), used by checkpoint()
+
+def start(directory=None, profile=True, trace_memory=False, every=50, label="scroll", name="run"):
+    """Start profiling the current process; directory defaults to profiles/<name>_<timestamp>."""
+    global active_profiler
+    if directory is None:
+        directory = os.path.join("profiles", f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    active_profiler = Profiler(directory, profile, trace_memory, every, label)
+    what = " and ".join(part for part, on in (("cProfile", profile), ("tracemalloc", trace_memory)) if on)
+    logger.info("Profiling with %s, snapshots every %d %ss in %s", what, every, label, directory)
+    return active_profiler
+
+def checkpoint(index):
+    """Record progress of the profiled run; a no-op unless start() was called."""
+    if active_profiler is not None:
+        active_profiler.checkpoint(index)
+
+def stop():
+    """Write the exit snapshot, if profiling, and stop."""
+    global active_profiler
+    if active_profiler is not None:
+        active_profiler.close()
+        logger.info("Profiling snapshots written to %s", active_profiler.directory)
+        active_profiler = None
+
+def add_profiling_arguments(parser, every, unit):
+    """The --profile/--trace-memory options shared by the scraper and analyzer CLIs."""
+    parser.add_argument('--profile', action='store_true', help=f'Write cProfile stats every --profile-every {unit} and at exit')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help=f'Write tracemalloc snapshots every --profile-every {unit} and at exit')
+    parser.add_argument('--profile-every', type=int, default=every,
+                        help=f'{unit.capitalize()} between profiling snapshots (default: {every})')
+    parser.add_argument('--profile-dir', default=None,
+                        help='Directory for profiling snapshots (default: profiles/<name>_<timestamp>)')
+
+def format_allocation(frame, size, count):
+    source = linecache.getline(frame.filename, frame.lineno).strip()
+    return f"{size / 1024:10.1f} KiB {count:>9} blocks  {frame.filename}:{frame.lineno}  {source}"
+
+def load_snapshots(directory):
+    """Return the snapshot entries of a directory in the order they were taken."""
+    path = os.path.join(directory, "snapshots.jsonl")
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} not found; is {directory} a profiling snapshot directory?")
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def profile_stats(directory, entry):
+    """Return {function: (calls, own time, cumulative time)} of a cProfile snapshot."""
+    if not entry or 'profile' not in entry:
+        return {}
+    stats = pstats.Stats(os.path.join(directory, entry['profile'])).stats
+    return {func: (nc, tt, ct) for func, (cc, nc, tt, ct, callers) in stats.items()}
+
+def diff_profiles(directory, before, after, top):
+    """Print the functions that took the most time between two snapshots."""
+    old = profile_stats(directory, before)
+    new = profile_stats(directory, after)
+    deltas = []
+    for func, (calls, own, cumulative) in new.items():
+        old_calls, old_own, old_cumulative = old.get(func, (0, 0.0, 0.0))
+        deltas.append((own - old_own, cumulative - old_cumulative, calls - old_calls, func))
+    deltas.sort(reverse=True)
+
+    print(f"   {'own s':>9} {'cumul s':>9} {'calls':>10}  function")
+    for own, cumulative, calls, func in deltas[:top]:
+        if own <= 0 and cumulative <= 0:
+            break
+        print(f"   {own:9.3f} {cumulative:9.3f} {calls:>10}  {pstats.func_std_string(func)}")
+
+def diff_memory(directory, before, after, top):
+    """Print the source lines whose allocations grew the most between two snapshots."""
+    new = tracemalloc.Snapshot.load(os.path.join(directory, after['memory']))
+    if before and 'memory' in before:
+        old = tracemalloc.Snapshot.load(os.path.join(directory, before['memory']))
+        stats = sorted(new.compare_to(old, 'lineno'), key=lambda stat: stat.size_diff, reverse=True)
+    else:
+        stats = new.statistics('lineno')
+
+    print(f"   {'growth':>14} {'total':>14}  line")
+    for stat in stats[:top]:
+        growth = getattr(stat, 'size_diff', stat.size)
+        frame = stat.traceback[0]
+        source = linecache.getline(frame.filename, frame.lineno).strip()
+        print(f"   {growth / 1024:+11.1f} KiB {stat.size / 1024:10.1f} KiB  {frame.filename}:{frame.lineno}  {source}")
+
+def report(directory, top=15, each=False):
+    """Print the snapshot timeline and what changed between snapshots."""
+    entries = load_snapshots(directory)
+    if not entries:
+        print(f"No snapshots in {directory}")
+        return
+
+    print(f"📈 SNAPSHOTS IN {directory}")
+    print(f"   {'snapshot':<14} {'elapsed':>10} {'traced MiB':>11} {'growth MiB':>11}")
+    previous = None
+    for entry in entries:
+        traced = entry.get('traced_bytes')
+        growth = ""
+        if traced is not None and previous is not None and previous.get('traced_bytes') is not None:
+            growth = f"{(traced - previous['traced_bytes']) / 1024 / 1024:+11.2f}"
+        traced_text = f"{traced / 1024 / 1024:11.2f}" if traced is not None else f"{'-':>11}"
+        print(f"   {entry['label'] + ' ' + str(entry['index']):<14} {entry['elapsed_s']:>9.1f}s {traced_text} {growth:>11}")
+        previous = entry
+
+    # Either every interval, or the first snapshot against the last one
+    pairs = list(zip(entries, entries[1:])) if each else [(entries[0] if len(entries) > 1 else None, entries[-1])]
+    for before, after in pairs:
+        span = f"{before['label']} {before['index']} → " if before else "start → "
+        span += f"{after['label']} {after['index']}"
+        if 'profile' in after:
+            print(f"\n⏱️  TIME SPENT ({span})")
+            diff_profiles(directory, before, after, top)
+        if 'memory' in after:
+            print(f"\n🧠 MEMORY GROWTH ({span})")
+            diff_memory(directory, before, after, top)
+
+def main():
+    parser = argparse.ArgumentParser(description='Diff profiling snapshots written with --profile/--trace-memory')
+    parser.add_argument('directory', nargs='?', help='Snapshot directory (default: the newest one under profiles/)')
+    parser.add_argument('--top', type=int, default=15, help='Functions and lines to list per diff (default: 15)')
+    parser.add_argument('--each', action='store_true',
+                        help='Diff every pair of consecutive snapshots instead of the first against the last')
+    args = parser.parse_args()
+
+    directory = args.directory
+    if directory is None:
+        candidates = glob.glob(os.path.join("profiles", "*", "snapshots.jsonl"))
+        if not candidates:
+            parser.error("no snapshot directory given and none found under profiles/")
+        directory = os.path.dirname(max(candidates, key=os.path.getmtime))
+    report(directory, args.top, args.each)
+
+if __name__ == "__main__":
+    main()
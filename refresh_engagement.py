@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Refresh engagement counts of already scraped tweets.
+Reads existing scraper output, decides which tweets are worth revisiting, re-polls
+them concurrently, appends time-stamped snapshots and updates the counts in place.
+Compressed and segmented output is read and polled too, but only plain CSV files
+get their counts updated.
+"""
+
+import argparse
+import csv
+import heapq
+import logging
+import math
+import os
+import threading
+from datetime import datetime, timezone
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+
+import scraper_logging
+import thread_expander
+from tweet_files import MANIFEST_SUFFIX, is_manifest, iter_rows
+
+STAT_FIELDS = ['replies', 'retweets', 'likes']
+SNAPSHOT_FIELDS = ['tweet_id', 'polled_at', 'replies', 'retweets', 'likes']
+AGE_HALF_LIFE_HOURS = 48.0  # Priority halves every two days of tweet age
+BASE_VELOCITY = 1.0  # Engagement per hour assumed for tweets with no history
+MIN_PRIORITY = 0.01  # Tweets scoring below this are not worth a revisit
+
+logger = logging.getLogger(__name__)
+
+def is_plain_csv(path):
+    """Whether path is a plain CSV file, the only kind whose counts can be rewritten in place."""
+    return not (is_manifest(path) or path.endswith(('.gz', '.zst')))
+
+def snapshot_file_for(csv_file):
+    """Return the snapshot file that belongs to an output file."""
+    if is_manifest(csv_file):
+        base = csv_file[:-len(MANIFEST_SUFFIX)]
+    else:
+        base = csv_file
+        for extension in ('.gz', '.zst'):
+            if base.endswith(extension):
+                base = base[:-len(extension)]
+        base = os.path.splitext(base)[0]
+    return f"{base}_engagement.csv"
+
+def parse_timestamp(value):
+    """Parse a scraper or snapshot timestamp into an aware datetime, or None."""
+    for fmt in ('%Y-%m-%dT%H:%M:%S.%fZ', '%Y-%m-%dT%H:%M:%SZ'):
+        try:
+            return datetime.strptime(value, fmt).replace(tzinfo=timezone.utc)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+def engagement(row):
+    """Total engagement of a tweet or snapshot row."""
+    total = 0
+    for field in STAT_FIELDS:
+        try:
+            total += int(row.get(field) or 0)
+        except ValueError:
+            continue
+    return total
+
+def load_rows(csv_file):
+    """Load the rows and field names of an output file (plain, compressed or a manifest)."""
+    reader = iter_rows(csv_file)
+    return list(reader), reader.fieldnames
+
+def load_snapshots(snapshot_file):
+    """Load snapshot history as {tweet_id: [(polled_at, engagement), ...]} sorted by time."""
+    history = {}
+    if not os.path.exists(snapshot_file):
+        return history
+    with open(snapshot_file, 'r', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            polled_at = parse_timestamp(row['polled_at'])
+            if polled_at:
+                history.setdefault(row['tweet_id'], []).append((polled_at, engagement(row)))
+    for points in history.values():
+        points.sort()
+    return history
+
+def refresh_priority(tweet, history, now):
+    """Score how much a tweet's counts are likely to have moved since we last saw them.
+
+    The score is the expected change since the last observation: an engagement
+    velocity (from the last two snapshots, or the scraped counts spread over
+    the tweet's age) times the hours since last seen, decayed by tweet age.
+    """
+    created = parse_timestamp(tweet.get('timestamp'))
+    if not created:
+        return 0.0
+    age_hours = max((now - created).total_seconds() / 3600, 0.1)
+
+    points = history.get(tweet['tweet_id'], [])
+    if len(points) >= 2:
+        (t1, e1), (t2, e2) = points[-2], points[-1]
+        velocity = max(e2 - e1, 0) / max((t2 - t1).total_seconds() / 3600, 0.1)
+        last_seen = t2
+    elif points:
+        velocity = points[-1][1] / age_hours
+        last_seen = points[-1][0]
+    else:
+        velocity = engagement(tweet) / age_hours
+        last_seen = created
+
+    hours_since_seen = max((now - last_seen).total_seconds() / 3600, 0.0)
+    decay = math.pow(0.5, age_hours / AGE_HALF_LIFE_HOURS)
+    return (velocity + BASE_VELOCITY) * hours_since_seen * decay
+
+def plan_refresh(tweets, history, budget, now=None):
+    """Return up to `budget` tweet IDs, highest refresh priority first."""
+    now = now or datetime.now(timezone.utc)
+    scored = {}
+    for tweet in tweets:
+        tweet_id = tweet.get('tweet_id')
+        if not tweet_id or tweet_id == "Unknown" or tweet_id in scored:
+            continue
+        priority = refresh_priority(tweet, history, now)
+        if priority >= MIN_PRIORITY:
+            scored[tweet_id] = priority
+    return heapq.nlargest(budget, scored, key=scored.get)
+
+def fetch_engagement(tweet_ids, driver_factory, extract_tweet_data, workers, on_result, session_driver=None):
+    """Open each tweet's status page concurrently and report fresh counts through on_result.
+
+    The workers copy the cookies of session_driver, if given, so they share its login.
+    """
+    def handle(driver, tweet_id, enqueue):
+        driver.get(thread_expander.STATUS_URL.format(tweet_id=tweet_id))
+        WebDriverWait(driver, 15).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, 'article'))
+        )
+        # The author is taken from the status link, so the username argument is only a fallback
+        records = thread_expander.parse_conversation(driver.page_source, tweet_id, extract_tweet_data, "i")
+        for record in records:
+            if record['tweet_id'] == tweet_id:
+                on_result(record)
+                return
+        logger.warning("Tweet %s not found on its status page", tweet_id)
+
+    thread_expander.run_driver_workers(tweet_ids, handle, driver_factory, workers=workers, session_driver=session_driver)
+
+def append_snapshots(snapshot_file, snapshots):
+    """Append engagement snapshots to the snapshot file."""
+    file_exists = os.path.isfile(snapshot_file)
+    with open(snapshot_file, 'a' if file_exists else 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=SNAPSHOT_FIELDS, extrasaction='ignore')
+        if not file_exists:
+            writer.writeheader()
+        writer.writerows(snapshots)
+
+def upsert_counts(csv_file, latest):
+    """Rewrite a plain CSV output file with the latest counts for the refreshed tweets."""
+    if not is_plain_csv(csv_file):
+        # Rewriting would lose the compression, or the flush points and row counts of the manifest
+        raise ValueError(f"{csv_file} is compressed or segmented; only plain CSV files can be updated in place")
+    rows, fields = load_rows(csv_file)
+    updated = 0
+    for row in rows:
+        fresh = latest.get(row['tweet_id'])
+        if fresh:
+            for field in STAT_FIELDS:
+                row[field] = fresh[field]
+            updated += 1
+
+    tmp_file = f"{csv_file}.tmp"
+    with open(tmp_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp_file, csv_file)
+    return updated
+
+def refresh_file(csv_file, scraper, budget, workers, batch_size, session_driver=None):
+    """Refresh the engagement counts of one output file."""
+    tweets, _ = load_rows(csv_file)
+    snapshot_file = snapshot_file_for(csv_file)
+    history = load_snapshots(snapshot_file)
+    tweet_ids = plan_refresh(tweets, history, budget)
+    logger.info("%s: %d of %d tweets scheduled for refresh", csv_file, len(tweet_ids), len(tweets))
+    if not tweet_ids:
+        return
+
+    latest = {}
+    pending = []
+    lock = threading.Lock()
+
+    def on_result(record):
+        snapshot = {field: record[field] for field in STAT_FIELDS}
+        snapshot['tweet_id'] = record['tweet_id']
+        snapshot['polled_at'] = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+        with lock:
+            latest[record['tweet_id']] = snapshot
+            pending.append(snapshot)
+            # Write snapshots in batches so an interrupted refresh keeps what it fetched
+            if len(pending) >= batch_size:
+                append_snapshots(snapshot_file, pending)
+                pending.clear()
+                logger.info("Refreshed %d/%d tweets", len(latest), len(tweet_ids))
+
+    fetch_engagement(tweet_ids, scraper.setup_driver, scraper.extract_tweet_data, workers, on_result, session_driver)
+
+    if pending:
+        append_snapshots(snapshot_file, pending)
+    if is_plain_csv(csv_file):
+        updated = upsert_counts(csv_file, latest)
+        logger.info("Refreshed %d tweets, updated %d rows in %s", len(latest), updated, csv_file)
+    else:
+        logger.warning("Refreshed %d tweets; %s is compressed or segmented, so its counts were not updated "
+                       "(the snapshots have them)", len(latest), csv_file)
+    logger.info("Snapshots written to %s", snapshot_file)
+
+def main():
+    parser = argparse.ArgumentParser(description='Refresh engagement counts of scraped tweets')
+    parser.add_argument('files', nargs='+', help='CSV files created by the scraper (plain, compressed or manifests)')
+    parser.add_argument('--budget', type=int, default=200, help='Maximum tweets to revisit per file (default: 200)')
+    parser.add_argument('--workers', type=int, default=3, help='Number of browsers polling at once (default: 3)')
+    parser.add_argument('--batch-size', type=int, default=50, help='Snapshots written per batch (default: 50)')
+    parser.add_argument('--login', action='store_true',
+                        help='Log in once and share the session with the polling browsers')
+    parser.add_argument('--standard-driver', action='store_true',
+                        help='Use twitter_scraper.py instead of the undetected ChromeDriver version')
+    args = parser.parse_args()
+    scraper_logging.setup_logging()
+
+    if args.standard_driver:
+        import twitter_scraper as scraper
+    else:
+        import twitter_scraper_undetected as scraper
+    if args.login:
+        scraper.AUTO_LOGIN = True
+        scraper.TWITTER_EMAIL = input("Enter your Twitter email/username: ")
+        scraper.TWITTER_PASSWORD = input("Enter your Twitter password: ")
+
+    session_driver = None
+    try:
+        if args.login:
+            # One browser logs in; the polling browsers copy its cookies
+            session_driver = scraper.setup_driver()
+            scraper.login_to_twitter(session_driver)
+
+        for csv_file in args.files:
+            if not os.path.exists(csv_file):
+                logger.error("File %s does not exist!", csv_file)
+                continue
+            refresh_file(csv_file, scraper, args.budget, args.workers, args.batch_size, session_driver)
+    finally:
+        if session_driver is not None:
+            try:
+                session_driver.quit()
+            except Exception:
+                pass
+            if getattr(session_driver, 'pool_lease', None):
+                session_driver.pool_lease.close()
+
+if __name__ == "__main__":
+    main()
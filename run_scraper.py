@@ -9,6 +9,9 @@ import importlib.util
 import os
 import sys
 
+import profiling_hooks
+import scraper_logging
+
 def main():
     # Parse command line arguments
     parser = argparse.ArgumentParser(description='Twitter/X Scraper')
@@ -16,23 +19,56 @@ def main():
     parser.add_argument('--max-scrolls', type=int, default=500, help='Maximum number of scrolls (default: 500)')
     parser.add_argument('--pause-time', type=float, default=2.5, help='Pause time between scrolls in seconds (default: 2.5)')
     parser.add_argument('--login', action='store_true', help='Enable auto-login prompt')
+    parser.add_argument('--browser-pool', type=str, default=None, metavar='HOST:PORT',
+                        help='Claim a pre-warmed browser from a running browser_pool.py daemon')
+    parser.add_argument('--expand-threads', action='store_true', help='Also collect the conversation around every scraped tweet')
+    parser.add_argument('--thread-workers', type=int, default=3, help='Number of extra browsers for conversation expansion (default: 3)')
+    parser.add_argument('--target-url', type=str, default=None, help='Timeline URL to scrape instead of x.com, e.g. a local mock timeline server')
+    parser.add_argument('--compress', choices=['gzip', 'zstd'], default=None, help='Stream output into compressed segments described by a manifest')
+    parser.add_argument('--rotate-mb', type=float, default=None, help='Start a new output segment after this many megabytes')
+    parser.add_argument('--rotate-rows', type=int, default=None, help='Start a new output segment after this many tweets')
+    parser.add_argument('--sink', action='append', default=[], metavar='SINK', help='Also push tweets as they are scraped to stdout, jsonl:PATH or an http(s):// webhook (repeatable)')
+    parser.add_argument('--no-watchdog', action='store_true', help='End the run when the browser crashes or hangs instead of restarting it')
+    parser.add_argument('--max-restarts', type=int, default=5, help='Browser restarts allowed per run (default: 5)')
+    parser.add_argument('--command-timeout', type=float, default=90, help='Seconds a WebDriver command may take before the browser counts as hung (default: 90)')
+    profiling_hooks.add_profiling_arguments(parser, 50, 'scrolls')
+    scraper_logging.add_logging_arguments(parser)
     args = parser.parse_args()
     
-    # Check if the main script exists
-    if not os.path.exists('twitter_scraper.py'):
-        print("Error: twitter_scraper.py not found in the current directory!")
+    # Check if the main script exists next to this one
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'twitter_scraper.py')
+    if not os.path.exists(script):
+        print(f"Error: {script} not found!")
         sys.exit(1)
     
     # Import the script as a module
-    spec = importlib.util.spec_from_file_location("twitter_scraper", "twitter_scraper.py")
+    spec = importlib.util.spec_from_file_location("twitter_scraper", script)
     scraper = importlib.util.module_from_spec(spec)
     spec.loader.exec_module(scraper)
     
     # Set the configuration variables
     scraper.TWITTER_USERNAME = args.username
-    scraper.TARGET_URL = f"https://x.com/{args.username}/with_replies"
+    scraper.TARGET_URL = args.target_url or f"https://x.com/{args.username}/with_replies"
     scraper.MAX_SCROLLS = args.max_scrolls
     scraper.SCROLL_PAUSE_TIME = args.pause_time
+    scraper.BROWSER_POOL = args.browser_pool
+    scraper.EXPAND_THREADS = args.expand_threads
+    scraper.THREAD_WORKERS = args.thread_workers
+    scraper.OUTPUT_COMPRESSION = args.compress
+    scraper.ROTATE_MB = args.rotate_mb
+    scraper.ROTATE_ROWS = args.rotate_rows
+    scraper.OUTPUT_SINKS = args.sink
+    scraper.PROFILE = args.profile
+    scraper.TRACE_MEMORY = args.trace_memory
+    scraper.PROFILE_EVERY = args.profile_every
+    scraper.PROFILE_DIR = args.profile_dir
+    scraper.WATCHDOG = not args.no_watchdog
+    scraper.MAX_RESTARTS = args.max_restarts
+    scraper.COMMAND_TIMEOUT = args.command_timeout
+    scraper.DEBUG = args.debug
+    scraper.LOG_FORMAT = args.log_format
+    scraper.LOG_FILE = args.log_file
+    scraper.PROGRESS_INTERVAL = args.progress_interval
     
     # Handle login if requested
     if args.login:
@@ -43,8 +79,6 @@ def main():
         scraper.TWITTER_PASSWORD = password
     
     # Run the scraper
-    print(f"Starting to scrape tweets for @{args.username}")
-    print(f"Max scrolls: {args.max_scrolls}, Pause time: {args.pause_time}s")
     scraper.main()
 
 if __name__ == "__main__":
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Logging for the scrapers that never makes the scrape loop wait on I/O.
+setup_logging() puts a single queue handler on the root logger; a background
+listener thread takes the records off the queue and writes them to stderr
+(and optionally a log file) as text or as one JSON object per line.
+If the console can't keep up, records are dropped and counted instead of
+blocking the scraper. ProgressReporter replaces the line printed on every
+scroll with one progress line every few seconds, with tweets per second and
+an ETA against the scroll limit.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+from datetime import datetime, timezone
+
+LOG_FORMATS = ['text', 'json']
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(message)s"
+TEXT_DATE_FORMAT = "%H:%M:%S"
+QUEUE_SIZE = 10000  # Records waiting for the listener before new ones are dropped
+PROGRESS_INTERVAL = 10.0  # Seconds between progress lines at INFO level
+QUIET_LOGGERS = ['selenium', 'urllib3', 'undetected_chromedriver']  # Libraries kept at WARNING even with --debug
+
+# Attributes every LogRecord has; anything else on a record was passed with extra= and goes into the JSON
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'taskName'}
+
+_listener = None
+_queue_handler = None
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with any extra= fields as keys of their own."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'pid': record.process,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """A QueueHandler that drops records when the queue is full instead of blocking or raising."""
+
+    def __init__(self, record_queue):
+        super().__init__(record_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Format the message and traceback here, since the arguments may change before the listener runs
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def make_formatter(log_format):
+    if log_format == 'json':
+        return JsonFormatter()
+    return logging.Formatter(TEXT_FORMAT, TEXT_DATE_FORMAT)
+
+def setup_logging(debug=False, log_format='text', log_file=None):
+    """Send all logging through a background thread to the console and, if given, log_file.
+
+    Calling it again replaces the previous setup.
+    """
+    global _listener, _queue_handler
+    stop_logging()
+    formatter = make_formatter(log_format)
+    # The console log goes to stderr so it never mixes with tweets streamed to stdout by --sink stdout,
+    # however long records wait in the queue
+    handlers = [logging.StreamHandler(sys.stderr)]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file, encoding='utf-8'))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    record_queue = queue.Queue(QUEUE_SIZE)
+    _queue_handler = DroppingQueueHandler(record_queue)
+    root = logging.getLogger()
+    root.addHandler(_queue_handler)
+    root.setLevel(logging.DEBUG if debug else logging.INFO)
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(logging.WARNING)
+    _listener = logging.handlers.QueueListener(record_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+def stop_logging():
+    """Write out the records still queued and stop the background thread."""
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    logging.getLogger().removeHandler(_queue_handler)
+    _listener.stop()
+    for handler in _listener.handlers:
+        if _queue_handler.dropped:
+            handler.handle(logging.makeLogRecord({
+                'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                'msg': f"Dropped {_queue_handler.dropped} log records because the console could not keep up",
+            }))
+        handler.close()
+    _listener = None
+    _queue_handler = None
+
+atexit.register(stop_logging)
+
+def add_logging_arguments(parser):
+    """The logging options shared by the scraper CLIs."""
+    parser.add_argument('--debug', action='store_true',
+                        help='Log every scraped tweet, scroll and save (DEBUG level)')
+    parser.add_argument('--log-format', choices=LOG_FORMATS, default='text',
+                        help='Write log lines as text or as one JSON object per line (default: text)')
+    parser.add_argument('--log-file', default=None, metavar='PATH',
+                        help='Also append the log to this file')
+    parser.add_argument('--progress-interval', type=float, default=PROGRESS_INTERVAL,
+                        help=f'Seconds between progress lines (default: {PROGRESS_INTERVAL:g})')
+
+def format_duration(seconds):
+    if seconds is None:
+        return "unknown"
+    seconds = int(seconds)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+class ProgressReporter:
+    """Logs the scroll count, tweet count, rate and ETA at INFO at most every interval seconds.
+
+    The lines in between go to DEBUG, so --debug still shows every scroll.
+    The message starts like the old per-scroll line, which job_queue.py parses.
+    """
+
+    def __init__(self, logger, max_scrolls, interval=None, clock=time.monotonic):
+        self.logger = logger
+        self.max_scrolls = max_scrolls
+        self.interval = PROGRESS_INTERVAL if interval is None else interval
+        self.clock = clock
+        self.started = clock()
+        self.last_report = None
+
+    def update(self, scrolls, tweets, force=False):
+        now = self.clock()
+        due = force or self.last_report is None or now - self.last_report >= self.interval
+        level = logging.INFO if due else logging.DEBUG
+        if not self.logger.isEnabledFor(level):
+            return
+        if due:
+            self.last_report = now
+        elapsed = now - self.started
+        rate = tweets / elapsed if elapsed > 0 else 0.0
+        remaining = max(self.max_scrolls - scrolls, 0)
+        eta = elapsed / scrolls * remaining if scrolls else None
+        self.logger.log(level, "Scrolled %d times. Found %d tweets so far (%.1f tweets/s, ETA %s)",
+                        scrolls, tweets, rate, format_duration(eta),
+                        extra={'scrolls': scrolls, 'max_scrolls': self.max_scrolls, 'tweets': tweets,
+                               'tweets_per_second': round(rate, 2), 'eta_seconds': None if eta is None else round(eta)})
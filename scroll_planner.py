@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Viewport scroll planner for virtualized timelines.
+X only renders the articles near the viewport, so jumping to the bottom of the
+page skips articles that are never rendered while we look. The planner instead
+moves just far enough that the last harvested article is still rendered above
+the viewport, so every step renders only new tweets, and checks that consecutive harvests
+overlap. When they do not, tweets between them were skipped: the planner
+scrolls back up in viewport steps until the gap is closed, then returns to
+where it was.
+"""
+
+import logging
+from datetime import datetime
+
+STEP = 0.9  # Fraction of the viewport moved when the last harvested article gives no better target
+MIN_PROGRESS = 0.25  # Fraction of the viewport a forward step must at least move
+MAX_GAP_STEPS = 6  # Upward steps spent on one coverage gap before giving up on it
+MARGIN_USE = 0.75  # Share of the observed render margin above the viewport a step may rely on
+
+logger = logging.getLogger(__name__)
+
+# Document position of every article with the id of the tweet it shows, plus the viewport
+LAYOUT_SCRIPT = """
+const articles = [];
+document.querySelectorAll('article').forEach((article) => {
+    const time = article.querySelector('time');
+    const link = (time && time.closest('a')) || article.querySelector('a[href*="/status/"]');
+    const match = link ? (link.getAttribute('href') || '').match(/\\/status\\/(\\d+)/) : null;
+    const rect = article.getBoundingClientRect();
+    articles.push([match ? match[1] : null, rect.top + window.scrollY, rect.bottom + window.scrollY]);
+});
+return {
+    articles: articles,
+    scroll_y: window.scrollY,
+    viewport: window.innerHeight,
+    height: document.body.scrollHeight
+};
+"""
+
+def tweet_time(tweet):
+    """Datetime of a scraped tweet, or None if its timestamp is unknown."""
+    try:
+        return datetime.strptime(tweet['timestamp'], '%Y-%m-%dT%H:%M:%S.%fZ')
+    except (KeyError, TypeError, ValueError):
+        return None
+
+class ScrollPlanner:
+    """Plans each scroll from the tweets harvested on the current page.
+
+    Call scroll() once per scroll with the tweets extracted from the page, in
+    page order, including ones seen before. Other lists, like the user cells
+    of follower pages, work the same with their own layout script and key.
+    """
+
+    def __init__(self, layout_script=LAYOUT_SCRIPT, key='tweet_id'):
+        self.layout_script = layout_script
+        self.key = key
+        self.previous = []  # Tweets of the last harvest, in page order
+        self.gap = None  # Coverage gap being filled: {'upper', 'lower', 'lower_page', 'resume_y', 'steps'}
+        self.resume_y = None  # Where to continue after a gap was filled or given up on
+        self.render_margin = 0  # How far above the viewport the page keeps articles rendered
+        self.steps = 0
+        self.rescrolls = 0
+        self.gaps_found = 0
+        self.gaps_filled = 0
+        self.gaps_unresolved = 0
+
+    @property
+    def filling_gap(self):
+        """Whether the next scrolls go back up into a gap rather than further down."""
+        return self.gap is not None or self.resume_y is not None
+
+    def reset(self):
+        """Forget the page state, e.g. after the page was reloaded; the counters are kept."""
+        self.previous = []
+        self.gap = None
+        self.resume_y = None
+
+    def record(self, page_tweets):
+        """Compare a harvest with the previous one to find or close coverage gaps."""
+        key = self.key
+        tweets = [tweet for tweet in page_tweets if tweet.get(key) not in (None, "Unknown")]
+        if not tweets:
+            return
+        ids = {tweet[key] for tweet in tweets}
+
+        if self.gap:
+            if self.gap['upper'][key] in ids:
+                logger.info("Filled the coverage gap after %s scrolls back up", self.gap['steps'])
+                self.gaps_filled += 1
+                self.resume_y = self.gap['resume_y']
+                # Continue checking overlap from the page below the gap, where we go back to
+                self.previous = self.gap['lower_page']
+                self.gap = None
+                return
+        elif self.previous and not ids & {tweet[key] for tweet in self.previous}:
+            # Nothing on the page was on it last time: whatever was between got recycled unseen
+            self.gap = {'upper': self.previous[-1], 'lower': tweets[0], 'lower_page': tweets, 'resume_y': None, 'steps': 0}
+            self.gaps_found += 1
+            upper_time, lower_time = tweet_time(self.gap['upper']), tweet_time(self.gap['lower'])
+            span = f" ({upper_time - lower_time} of timeline)" if upper_time and lower_time else ""
+            logger.info("Coverage gap between %s and %s%s, scrolling back to fill it",
+                        self.gap['upper'][key], self.gap['lower'][key], span)
+        self.previous = tweets
+
+    def next_position(self, layout, page_ids, jitter=0):
+        """Return the scroll position for the next step.
+
+        A jitter of some pixels makes a forward step that much shorter, never
+        longer, so it varies the scrolling without skipping articles.
+        """
+        scroll_y = layout['scroll_y']
+        viewport = layout['viewport'] or 1000
+        if layout['articles']:
+            # The highest article still rendered ends inside the margin, so this never overestimates it
+            self.render_margin = max(self.render_margin, scroll_y - min(bottom for tweet_id, top, bottom in layout['articles']))
+
+        if self.gap:
+            if self.gap['resume_y'] is None:
+                self.gap['resume_y'] = scroll_y
+            if self.gap['steps'] < MAX_GAP_STEPS:
+                self.gap['steps'] += 1
+                self.rescrolls += 1
+                return max(0, scroll_y - viewport * STEP)
+            logger.warning("Could not fill the coverage gap above %s, moving on", self.gap['lower'][self.key])
+            self.gaps_unresolved += 1
+            self.resume_y = self.gap['resume_y']
+            self.previous = self.gap['lower_page']
+            self.gap = None
+
+        if self.resume_y is not None:
+            position, self.resume_y = self.resume_y, None
+            return position
+
+        # Articles stay rendered a little above the viewport, so the lowest harvested article may
+        # end up that far above it: every article below it is still rendered at the next harvest
+        harvested_bottoms = [bottom for tweet_id, top, bottom in layout['articles'] if tweet_id in page_ids]
+        if harvested_bottoms:
+            position = max(harvested_bottoms) + self.render_margin * MARGIN_USE
+        else:
+            position = scroll_y + viewport * STEP
+        if position < scroll_y + viewport * MIN_PROGRESS:
+            position = scroll_y + viewport * STEP
+        if jitter:
+            position = max(position - jitter, scroll_y + viewport * MIN_PROGRESS)
+        return position
+
+    def rendered(self, driver):
+        """The articles rendered right now as a harvest, for scrolls that look for something instead of extracting."""
+        layout = driver.execute_script(self.layout_script)
+        return [{self.key: key} for key, top, bottom in layout['articles'] if key]
+
+    def scroll(self, driver, page_tweets, jitter=0):
+        """Record the harvest and scroll to the next position; returns the page height before scrolling."""
+        self.record(page_tweets)
+        layout = driver.execute_script(self.layout_script)
+        position = self.next_position(layout, {tweet.get(self.key) for tweet in page_tweets}, jitter)
+        driver.execute_script(f"window.scrollTo(0, {int(position)});")
+        self.steps += 1
+        return layout['height']
+
+    def summary(self):
+        return (f"Scroll planner: {self.steps} scrolls, {self.rescrolls} back up to fill gaps, "
+                f"{self.gaps_found} coverage gaps found, {self.gaps_filled} filled, {self.gaps_unresolved} unresolved")
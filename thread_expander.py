@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Conversation expansion for scraped tweets.
+Opens the /status/<id> page of each scraped tweet in a bounded pool of extra
+browsers and collects the surrounding conversation, recording each tweet's parent.
+"""
+
+import logging
+import queue
+import random
+import re
+import threading
+import time
+from bs4 import BeautifulSoup
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+
+import scroll_planner
+
+STATUS_URL = "https://x.com/i/status/{tweet_id}"
+THREAD_FIELDS = ['tweet_id', 'parent_id', 'timestamp', 'text', 'replies', 'retweets', 'likes', 'url', 'links']
+THREAD_WORKERS = 3  # Number of extra browsers opening status pages at the same time
+THREAD_SCROLLS = 5  # Scrolls per status page to load more replies
+PAGE_PAUSE_TIME = 2.0
+
+STATUS_LINK_PATTERN = re.compile(r'^/([A-Za-z0-9_]+)/status/(\d+)')
+
+logger = logging.getLogger(__name__)
+
+def copy_session(cookies, target_driver):
+    """Put the cookies of a logged-in driver into a freshly started one."""
+    if not cookies:
+        return
+    target_driver.get("https://x.com")
+    for cookie in cookies:
+        cookie = dict(cookie)
+        cookie.pop('sameSite', None)
+        try:
+            target_driver.add_cookie(cookie)
+        except Exception:
+            continue
+
+def run_driver_workers(items, handle_item, driver_factory, workers=THREAD_WORKERS, session_driver=None):
+    """Process items from a shared work queue across a bounded number of drivers.
+
+    handle_item(driver, item, enqueue) is called for every item; it may call
+    enqueue(new_item) to schedule follow-up work. Each worker owns one driver
+    for its whole lifetime, so at most `workers` browsers are open at once.
+    """
+    work = queue.Queue()
+    for item in items:
+        work.put(item)
+    if work.empty():
+        return
+    # A WebDriver can't take commands from several threads, so the session is read once up front
+    cookies = session_driver.get_cookies() if session_driver is not None else []
+
+    def worker(worker_index):
+        try:
+            driver = driver_factory()
+        except BaseException as e:
+            logger.error("Worker %s: could not start a browser: %s", worker_index, e)
+            return
+        try:
+            copy_session(cookies, driver)
+            while True:
+                try:
+                    item = work.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    handle_item(driver, item, work.put)
+                except Exception as e:
+                    logger.warning("Worker %s: error processing %s: %s", worker_index, item, e)
+                finally:
+                    work.task_done()
+        finally:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+            if getattr(driver, 'pool_lease', None):
+                driver.pool_lease.close()
+
+    worker_count = max(1, min(workers, work.qsize()))
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(worker_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+def status_link_author(article):
+    """Return the handle of the account that posted the article, or None."""
+    time_element = article.find('time')
+    link = time_element.find_parent('a') if time_element else None
+    candidates = [link] if link is not None else []
+    candidates.extend(article.select('a[href*="/status/"]'))
+    for candidate in candidates:
+        match = STATUS_LINK_PATTERN.match(candidate.get('href', ''))
+        if match:
+            return match.group(1)
+    return None
+
+def parse_conversation(page_source, focal_id, extract_tweet_data, username):
+    """Parse a status page into tweet records with parent_id filled in where the page shows it.
+
+    Tweets above the focal tweet are its ancestors, each replying to the one
+    before it. Tweets below it may reply to the focal tweet or to another
+    reply, which the page layout doesn't tell apart, so their parent_id is
+    left empty; so is everyone's when the focal tweet is not on the page.
+    """
+    soup = BeautifulSoup(page_source, 'html.parser')
+    records = []
+    for article in soup.find_all('article'):
+        tweet_data = extract_tweet_data(article, username)
+        if not tweet_data or tweet_data['tweet_id'] == "Unknown":
+            continue
+        author = status_link_author(article)
+        if author:
+            tweet_data['url'] = f"https://twitter.com/{author}/status/{tweet_data['tweet_id']}"
+        records.append(tweet_data)
+
+    focal_index = next((i for i, t in enumerate(records) if t['tweet_id'] == focal_id), None)
+    for i, tweet_data in enumerate(records):
+        if focal_index is not None and 0 < i <= focal_index:
+            tweet_data['parent_id'] = records[i - 1]['tweet_id']
+        else:
+            tweet_data['parent_id'] = ""
+    return records
+
+def expand_threads(tweet_ids, driver_factory, extract_tweet_data, username,
+                   workers=THREAD_WORKERS, scrolls=THREAD_SCROLLS, session_driver=None):
+    """Collect the conversations around the given tweet IDs.
+
+    Returns a list of tweet dictionaries in the extract_tweet_data() schema plus
+    a parent_id field, deduplicated across overlapping conversations.
+    """
+    tweet_ids = [t for t in dict.fromkeys(tweet_ids) if t and t != "Unknown"]
+    collected = {}
+    lock = threading.Lock()
+    done = [0]
+
+    def handle(driver, tweet_id, enqueue):
+        driver.get(STATUS_URL.format(tweet_id=tweet_id))
+        try:
+            WebDriverWait(driver, 15).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, 'article'))
+            )
+        except TimeoutException:
+            logger.warning("Timeout while loading conversation %s", tweet_id)
+            return
+
+        consecutive_no_new = 0
+        planner = scroll_planner.ScrollPlanner()
+        for _ in range(scrolls + 1):
+            time.sleep(PAGE_PAUSE_TIME + random.uniform(0, 1.0))
+            records = parse_conversation(driver.page_source, tweet_id, extract_tweet_data, username)
+            new_count = 0
+            with lock:
+                for record in records:
+                    existing = collected.get(record['tweet_id'])
+                    if existing is None:
+                        collected[record['tweet_id']] = record
+                        new_count += 1
+                    elif not existing['parent_id'] and record['parent_id']:
+                        existing['parent_id'] = record['parent_id']
+            if new_count == 0 and not planner.filling_gap:
+                consecutive_no_new += 1
+                if consecutive_no_new >= 2:
+                    break
+            else:
+                consecutive_no_new = 0
+            # Reply lists are virtualized like timelines; stepping keeps replies from being skipped unrendered
+            planner.scroll(driver, records)
+
+        with lock:
+            done[0] += 1
+            logger.info("Expanded conversation %d/%d: %s (%d tweets collected)",
+                        done[0], len(tweet_ids), tweet_id, len(collected))
+
+    logger.info("Expanding %s conversations with %s workers...", len(tweet_ids), workers)
+    run_driver_workers(tweet_ids, handle, driver_factory, workers=workers, session_driver=session_driver)
+    return list(collected.values())
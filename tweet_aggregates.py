@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Mergeable partial aggregates of tweet statistics.
+A TweetAggregate holds everything the analysis report needs (counters, sums,
+min/max and histograms), can be built independently per file or worker and
+merged afterwards, and serializes to JSON for machine-readable summaries.
+"""
+
+from collections import Counter
+
+from heavy_hitters import SpaceSaving, merge_counts
+from tweet_tokenizer import tokenize
+
+STAT_FIELDS = ['replies', 'retweets', 'likes']
+DAYS_OF_WEEK = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+ENGAGEMENT_BUCKETS = 32  # Power-of-two buckets of total engagement per tweet
+
+class TweetAggregate:
+    """Statistics over a set of tweets that can be combined with merge().
+
+    With sketch_size set, mentions and hashtags are counted approximately in
+    Space-Saving sketches of that many counters instead of exact Counters.
+    """
+
+    def __init__(self, sketch_size=None):
+        self.sketch_size = sketch_size
+        self.tweets = 0
+        self.totals = dict.fromkeys(STAT_FIELDS, 0)
+        self.top = {}  # field -> {'value', 'text', 'url'} of the tweet with the highest count
+        self.min_date = None
+        self.max_date = None
+        self.mentions = SpaceSaving(sketch_size) if sketch_size else Counter()
+        self.hashtags = SpaceSaving(sketch_size) if sketch_size else Counter()
+        self.weekdays = [0] * 7
+        self.hours = [0] * 24
+        self.engagement_histogram = [0] * ENGAGEMENT_BUCKETS
+
+    @property
+    def approximate(self):
+        return isinstance(self.mentions, SpaceSaving)
+
+    @classmethod
+    def from_tweets(cls, tweets, sketch_size=None):
+        aggregate = cls(sketch_size)
+        for tweet in tweets:
+            aggregate.add(tweet)
+        return aggregate
+
+    @classmethod
+    def from_columns(cls, columns, sketch_size=None):
+        """Aggregate a tweet_columns.TweetColumns cache with array operations instead of one tweet at a time.
+
+        The columns are scanned in slices, so only one slice of each is
+        resident at a time; the result is the same as from_tweets().
+        """
+        import numpy as np
+        from tweet_columns import CHUNK_ROWS, NO_TIMESTAMP, timestamp_datetime
+
+        aggregate = cls(sketch_size)
+        aggregate.tweets = len(columns)
+        histogram = np.zeros(ENGAGEMENT_BUCKETS, dtype=np.int64)
+        weekdays = np.zeros(7, dtype=np.int64)
+        hours = np.zeros(24, dtype=np.int64)
+        top_rows = {}
+        min_timestamp = max_timestamp = None
+
+        for start in range(0, len(columns), CHUNK_ROWS):
+            end = min(start + CHUNK_ROWS, len(columns))
+            engagement = np.zeros(end - start, dtype=np.int64)
+            for field in STAT_FIELDS:
+                values = np.asarray(columns.stats[field][start:end])
+                aggregate.totals[field] += int(values.sum())
+                engagement += values
+                # argmax takes the first of equal values, and a later slice must be strictly larger
+                best = int(values.argmax())
+                if field not in top_rows or values[best] > top_rows[field][0]:
+                    top_rows[field] = (int(values[best]), start + best)
+            # The float exponent is the bit length for counts below 2**53
+            buckets = np.minimum(np.frexp(np.maximum(engagement, 0).astype(np.float64))[1], ENGAGEMENT_BUCKETS - 1)
+            histogram += np.bincount(buckets, minlength=ENGAGEMENT_BUCKETS)
+
+            timestamps = np.asarray(columns.timestamp[start:end])
+            timestamps = timestamps[timestamps != NO_TIMESTAMP]
+            if len(timestamps):
+                low, high = int(timestamps.min()), int(timestamps.max())
+                min_timestamp = low if min_timestamp is None else min(min_timestamp, low)
+                max_timestamp = high if max_timestamp is None else max(max_timestamp, high)
+                hours_since_epoch = timestamps // 3600000000
+                # 1970-01-01 was a Thursday
+                weekdays += np.bincount((hours_since_epoch // 24 + 3) % 7, minlength=7)
+                hours += np.bincount(hours_since_epoch % 24, minlength=24)
+
+        for field, (value, row) in top_rows.items():
+            aggregate.top[field] = {'value': value, 'text': columns.text(row), 'url': columns.url(row)}
+        aggregate.engagement_histogram = histogram.tolist()
+        aggregate.weekdays = weekdays.tolist()
+        aggregate.hours = hours.tolist()
+        aggregate.min_date = timestamp_datetime(min_timestamp) if min_timestamp is not None else None
+        aggregate.max_date = timestamp_datetime(max_timestamp) if max_timestamp is not None else None
+
+        # The texts are newline-separated, so one tokenizer pass per chunk finds the same entities
+        for chunk in columns.text_chunks():
+            tokens = tokenize(chunk)
+            aggregate.mentions.update(tokens.mentions)
+            aggregate.hashtags.update(tokens.hashtags)
+        return aggregate
+
+    def add(self, tweet):
+        """Add one tweet as returned by analyze_tweets.load_tweets()."""
+        self.tweets += 1
+        engagement = 0
+        for field in STAT_FIELDS:
+            value = tweet[field]
+            self.totals[field] += value
+            engagement += value
+            # Ties keep the tweet seen first
+            if field not in self.top or value > self.top[field]['value']:
+                self.top[field] = {'value': value, 'text': tweet['text'], 'url': tweet.get('url')}
+        self.engagement_histogram[min(max(engagement, 0).bit_length(), ENGAGEMENT_BUCKETS - 1)] += 1
+
+        date = tweet.get('datetime')
+        if date:
+            if self.min_date is None or date < self.min_date:
+                self.min_date = date
+            if self.max_date is None or date > self.max_date:
+                self.max_date = date
+            self.weekdays[date.weekday()] += 1
+            self.hours[date.hour] += 1
+
+        tokens = tokenize(tweet['text'])
+        self.mentions.update(tokens.mentions)
+        self.hashtags.update(tokens.hashtags)
+
+    def merge(self, other):
+        """Fold another aggregate into this one and return self."""
+        self.tweets += other.tweets
+        for field in STAT_FIELDS:
+            self.totals[field] += other.totals[field]
+            theirs = other.top.get(field)
+            if theirs and (field not in self.top or theirs['value'] > self.top[field]['value']):
+                self.top[field] = dict(theirs)
+        if other.min_date and (self.min_date is None or other.min_date < self.min_date):
+            self.min_date = other.min_date
+        if other.max_date and (self.max_date is None or other.max_date > self.max_date):
+            self.max_date = other.max_date
+        self.mentions = merge_counts(self.mentions, other.mentions)
+        self.hashtags = merge_counts(self.hashtags, other.hashtags)
+        self.weekdays = [a + b for a, b in zip(self.weekdays, other.weekdays)]
+        self.hours = [a + b for a, b in zip(self.hours, other.hours)]
+        self.engagement_histogram = [a + b for a, b in zip(self.engagement_histogram, other.engagement_histogram)]
+        return self
+
+    def day_counts(self):
+        """Tweets per day of week, Monday first."""
+        return dict(zip(DAYS_OF_WEEK, self.weekdays))
+
+    def top_counts(self, counts, n=10):
+        """Return (item, count, max_error) for the n most common items; max_error is 0 when exact."""
+        if isinstance(counts, SpaceSaving):
+            return counts.most_common_with_error(n)
+        return [(item, count, 0) for item, count in counts.most_common(n)]
+
+    def to_dict(self, top_n=10):
+        """Return a JSON-serializable summary."""
+        return {
+            'tweets': self.tweets,
+            'totals': dict(self.totals),
+            'averages': {field: (self.totals[field] / self.tweets if self.tweets else 0) for field in STAT_FIELDS},
+            'top_tweets': self.top,
+            'first_date': self.min_date.isoformat() if self.min_date else None,
+            'last_date': self.max_date.isoformat() if self.max_date else None,
+            'top_mentions': self.top_counts(self.mentions, top_n),
+            'top_hashtags': self.top_counts(self.hashtags, top_n),
+            'top_counts_approximate': self.approximate,
+            'day_of_week': self.day_counts(),
+            'hour_of_day': self.hours,
+            'engagement_histogram': {
+                'bucket_upper_bounds': [2 ** i - 1 for i in range(ENGAGEMENT_BUCKETS)],
+                'counts': self.engagement_histogram,
+            },
+        }
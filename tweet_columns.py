@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Memory-mapped column cache for scraper output files.
+The first analysis of a file parses it once into a sidecar directory next to
+it (<file>.cols): fixed-width NumPy columns for the tweet ID, epoch timestamp
+and counts, and the text and URL of every tweet in one heap file each with an
+offset column. Later analyses open the columns with mmap instead of parsing
+CSV again, so they start at once and only the pages actually read become
+resident. The cache is rebuilt when the file's size or modification time
+changes, or, with verify='hash', only when its content does.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+from array import array
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from tweet_files import is_manifest, iter_rows, manifest_segments
+
+CACHE_VERSION = 1
+SIDECAR_SUFFIX = ".cols"
+STAT_FIELDS = ['replies', 'retweets', 'likes']
+NUMERIC_COLUMNS = ['tweet_id', 'timestamp'] + STAT_FIELDS
+STRING_COLUMNS = ['text', 'url']
+NO_TIMESTAMP = np.iinfo(np.int64).min  # Stored for tweets whose timestamp is "Unknown"
+NO_TWEET_ID = -1
+EPOCH = datetime(1970, 1, 1)
+WRITE_ROWS = 65536  # Rows buffered per column while building
+CHUNK_ROWS = 1 << 20  # Rows per slice when scanning the columns, which bounds the working set
+CHUNK_BYTES = 16 << 20  # Bytes of text decoded at a time by text_chunks()
+
+logger = logging.getLogger(__name__)
+
+def sidecar_path(path):
+    """The cache directory that belongs to an output file."""
+    return f"{path}{SIDECAR_SUFFIX}"
+
+def source_files(path):
+    """The files whose content makes up an output file: itself, plus the segments of a manifest."""
+    return [path] + (manifest_segments(path) if is_manifest(path) else [])
+
+def stat_signature(path):
+    """Size and modification time of an output file and its segments."""
+    return [[st.st_size, st.st_mtime_ns] for st in (os.stat(p) for p in source_files(path) if os.path.exists(p))]
+
+def content_hash(path):
+    """BLAKE2 hash of the bytes of an output file and its segments."""
+    digest = hashlib.blake2b(digest_size=20)
+    for p in source_files(path):
+        if os.path.exists(p):
+            with open(p, 'rb') as f:
+                while chunk := f.read(1 << 20):
+                    digest.update(chunk)
+    return digest.hexdigest()
+
+def parse_row(row):
+    """Numeric column values of a row, parsed like analyze_tweets.iter_tweets(); raises on malformed rows."""
+    if row['timestamp'] != "Unknown":
+        date = datetime.strptime(row['timestamp'], '%Y-%m-%dT%H:%M:%S.%fZ')
+        timestamp = (date - EPOCH) // timedelta(microseconds=1)
+    else:
+        timestamp = NO_TIMESTAMP
+    tweet_id = row.get('tweet_id') or ""
+    values = {
+        'tweet_id': int(tweet_id) if tweet_id.isdigit() else NO_TWEET_ID,
+        'timestamp': timestamp,
+    }
+    for field in STAT_FIELDS:
+        values[field] = int(row[field]) if row[field] else 0
+    return values
+
+def _raw_to_npy(raw_path, npy_path, rows):
+    """Turn a file of native int64 values into a .npy file without loading it into memory."""
+    out = np.lib.format.open_memmap(npy_path, mode='w+', dtype=np.int64, shape=(rows,))
+    if rows:
+        out[:] = np.memmap(raw_path, dtype=np.int64, mode='r', shape=(rows,))
+    out.flush()
+    del out
+    os.remove(raw_path)
+
+def build_columns(path, directory=None, with_hash=False):
+    """Parse an output file into its column cache and return the cache's metadata.
+
+    Rows that analyze_tweets.iter_tweets() would skip are skipped here too.
+    The cache is built in a temporary directory and moved into place at the end.
+    """
+    directory = directory or sidecar_path(path)
+    signature = stat_signature(path)
+    tmp = f"{directory}.tmp{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    columns = list(NUMERIC_COLUMNS) + [f"{name}_offsets" for name in STRING_COLUMNS]
+    raw_files = {name: open(os.path.join(tmp, f"{name}.raw"), 'wb') for name in columns}
+    heaps = {name: open(os.path.join(tmp, f"{name}.heap"), 'wb') for name in STRING_COLUMNS}
+    buffers = {name: array('q') for name in columns}
+    heap_sizes = dict.fromkeys(STRING_COLUMNS, 0)
+    rows = skipped = 0
+
+    def flush():
+        for name, buffer in buffers.items():
+            buffer.tofile(raw_files[name])
+            del buffer[:]
+
+    try:
+        for row in iter_rows(path):
+            try:
+                values = parse_row(row)
+                for name in NUMERIC_COLUMNS:
+                    buffers[name].append(values[name])
+            except Exception:
+                # Undo a partly appended row
+                for name in NUMERIC_COLUMNS:
+                    del buffers[name][rows % WRITE_ROWS:]
+                skipped += 1
+                continue
+            for name in STRING_COLUMNS:
+                # Every string ends with a newline, so the heap can be tokenized in one pass
+                encoded = (row.get(name) or "").encode('utf-8') + b"\n"
+                buffers[f"{name}_offsets"].append(heap_sizes[name])
+                heaps[name].write(encoded)
+                heap_sizes[name] += len(encoded)
+            rows += 1
+            if rows % WRITE_ROWS == 0:
+                flush()
+        for name in STRING_COLUMNS:
+            buffers[f"{name}_offsets"].append(heap_sizes[name])
+        flush()
+    finally:
+        for f in list(raw_files.values()) + list(heaps.values()):
+            f.close()
+
+    for name in columns:
+        length = rows + 1 if name.endswith("_offsets") else rows
+        _raw_to_npy(os.path.join(tmp, f"{name}.raw"), os.path.join(tmp, f"{name}.npy"), length)
+
+    meta = {
+        'version': CACHE_VERSION,
+        'source': os.path.basename(path),
+        'signature': signature,
+        'hash': content_hash(path) if with_hash else None,
+        'rows': rows,
+        'skipped': skipped,
+        'built_at': datetime.now().isoformat(timespec='seconds'),
+    }
+    with open(os.path.join(tmp, "meta.json"), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp, directory)
+    return meta
+
+def read_meta(directory):
+    try:
+        with open(os.path.join(directory, "meta.json"), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get('version') == CACHE_VERSION else None
+
+def is_fresh(meta, path, verify='stat'):
+    """Whether a cache still matches its output file.
+
+    With verify='hash', a file whose size or modification time changed (a copy,
+    a touch) still matches if its content hash is the same; the stored
+    signature is then updated so the next check is a stat again.
+    """
+    if meta is None:
+        return False
+    signature = stat_signature(path)
+    if meta['signature'] == signature:
+        return True
+    if verify == 'hash' and meta.get('hash') and meta['hash'] == content_hash(path):
+        meta['signature'] = signature
+        return True
+    return False
+
+class TweetColumns:
+    """The columns of a cache, memory-mapped read-only."""
+
+    def __init__(self, directory, meta):
+        self.directory = directory
+        self.meta = meta
+        self.rows = meta['rows']
+        self.tweet_id = self._load('tweet_id')
+        self.timestamp = self._load('timestamp')
+        self.stats = {field: self._load(field) for field in STAT_FIELDS}
+        self.offsets = {name: self._load(f"{name}_offsets") for name in STRING_COLUMNS}
+        self.heaps = {name: self._heap(name) for name in STRING_COLUMNS}
+
+    def _load(self, name):
+        path = os.path.join(self.directory, f"{name}.npy")
+        # An empty array can't be mapped
+        return np.load(path, mmap_mode='r' if self.rows else None)
+
+    def _heap(self, name):
+        path = os.path.join(self.directory, f"{name}.heap")
+        if not os.path.getsize(path):
+            return np.zeros(0, dtype=np.uint8)
+        return np.memmap(path, dtype=np.uint8, mode='r')
+
+    def __len__(self):
+        return self.rows
+
+    def string(self, name, index):
+        offsets = self.offsets[name]
+        return bytes(self.heaps[name][offsets[index]:offsets[index + 1] - 1]).decode('utf-8')
+
+    def text(self, index):
+        return self.string('text', index)
+
+    def url(self, index):
+        return self.string('url', index)
+
+    def datetime(self, index):
+        """Timestamp of a tweet as the naive UTC datetime iter_tweets() gives, or None."""
+        return timestamp_datetime(self.timestamp[index])
+
+    def text_chunks(self, chunk_bytes=CHUNK_BYTES):
+        """Yield the tweet texts, newline-terminated, as strings of about chunk_bytes that never split a tweet."""
+        offsets = self.offsets['text']
+        heap = self.heaps['text']
+        start_row = 0
+        while start_row < self.rows:
+            end_row = int(np.searchsorted(offsets, offsets[start_row] + chunk_bytes, side='right')) - 1
+            end_row = min(max(end_row, start_row + 1), self.rows)
+            yield bytes(heap[offsets[start_row]:offsets[end_row]]).decode('utf-8')
+            start_row = end_row
+
+    def iter_tweets(self):
+        """Yield tweets as dictionaries like analyze_tweets.iter_tweets(), with the cached fields only."""
+        for index in range(self.rows):
+            tweet_id = int(self.tweet_id[index])
+            date = self.datetime(index)
+            tweet = {
+                'tweet_id': str(tweet_id) if tweet_id != NO_TWEET_ID else "Unknown",
+                'timestamp': date.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z' if date else "Unknown",
+                'text': self.text(index),
+                'url': self.url(index),
+                'datetime': date,
+            }
+            for field in STAT_FIELDS:
+                tweet[field] = int(self.stats[field][index])
+            yield tweet
+
+def timestamp_datetime(timestamp):
+    """Naive UTC datetime of a cached timestamp, or None for NO_TIMESTAMP."""
+    if timestamp == NO_TIMESTAMP:
+        return None
+    return EPOCH + timedelta(microseconds=int(timestamp))
+
+def open_columns(path, verify='stat', build=True):
+    """Open the column cache of an output file, building or rebuilding it when needed.
+
+    Returns None if there is no usable cache and build is False, or if the
+    cache can't be written (e.g. a read-only archive); callers then parse
+    the file as usual.
+    """
+    directory = sidecar_path(path)
+    meta = read_meta(directory)
+    stored_signature = meta and meta['signature']
+    if is_fresh(meta, path, verify):
+        if verify == 'hash' and not meta.get('hash'):
+            # Built with verify='stat'; hash it now so a later touch or copy doesn't force a rebuild
+            meta['hash'] = content_hash(path)
+            _write_meta(directory, meta)
+        elif meta['signature'] != stored_signature:
+            _write_meta(directory, meta)
+        return TweetColumns(directory, meta)
+    if not build:
+        return None
+    logger.info("Building column cache %s (first analysis of this version of the file)...", directory)
+    try:
+        meta = build_columns(path, directory, with_hash=verify == 'hash')
+    except OSError as e:
+        logger.warning("Could not write the column cache, parsing the file instead: %s", e)
+        return None
+    if meta['skipped']:
+        logger.warning("Skipped %d malformed rows", meta['skipped'])
+    return TweetColumns(directory, meta)
+
+def _write_meta(directory, meta):
+    try:
+        with open(os.path.join(directory, "meta.json"), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+    except OSError:
+        pass
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Helpers for reading and writing scraper output files.
+Output can be plain CSV or a series of gzip/zstd compressed, size-rotated
+segments described by a manifest; readers accept all of these. The analysis
+tools that keep derived data (indexes, rollups) up to date read only the rows
+appended to a plain file since their last run.
+"""
+
+import csv
+import io
+import json
+import os
+import re
+import zlib
+
+FINGERPRINT_BYTES = 256  # Bytes before the read offset used to detect rewritten files
+FLUSH_ROWS = 1000  # Rows buffered at most before a compressed writer emits a flush point
+
+COMPRESSION_EXTENSIONS = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+MANIFEST_SUFFIX = '.manifest.json'
+
+STATUS_AUTHOR_PATTERN = re.compile(r'https?://(?:twitter|x)\.com/([^/]+)/status/')
+FILE_ACCOUNT_PATTERN = re.compile(r'^(.+?)_(?:tweets|threads)_')
+
+def account_from_filename(path):
+    """Return the account an output file belongs to, from its <user>_tweets_<timestamp> name."""
+    match = FILE_ACCOUNT_PATTERN.match(os.path.basename(path))
+    return match.group(1) if match else ""
+
+def row_account(row, default_account=""):
+    """Return the lowercased account that posted a row, from its URL when possible."""
+    match = STATUS_AUTHOR_PATTERN.match(row.get('url') or "")
+    return (match.group(1) if match else default_account).lower()
+
+def _fingerprint(f, offset):
+    """Read the bytes just before `offset`."""
+    start = max(0, offset - FINGERPRINT_BYTES)
+    f.seek(start)
+    return f.read(offset - start)
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("zstd output needs the zstandard package: pip install zstandard")
+    return zstandard
+
+def is_manifest(path):
+    return path.endswith(MANIFEST_SUFFIX)
+
+def manifest_segments(manifest_path):
+    """Return the segment paths listed in a manifest, in write order."""
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    directory = os.path.dirname(manifest_path)
+    return [os.path.join(directory, segment['file']) for segment in manifest['segments']]
+
+def _read_chunks(path):
+    """Yield decompressed chunks of one file.
+
+    Compressed streams are decoded incrementally, so a file cut off after its
+    last flush point (by a crash or while it is still being written) yields
+    everything up to there. Concatenated gzip members and zstd frames are read
+    one after another.
+    """
+    if path.endswith('.zst'):
+        zstandard = _zstd()
+        new_decompressor = lambda: zstandard.ZstdDecompressor().decompressobj()
+        errors = (zstandard.ZstdError,)
+    elif path.endswith('.gz'):
+        new_decompressor = lambda: zlib.decompressobj(31)
+        errors = (zlib.error,)
+    else:
+        new_decompressor = None
+
+    with open(path, 'rb') as f:
+        decompressor = new_decompressor() if new_decompressor else None
+        while True:
+            chunk = f.read(1 << 16)
+            if not chunk:
+                return
+            if decompressor is None:
+                yield chunk
+                continue
+            while chunk:
+                try:
+                    data = decompressor.decompress(chunk)
+                except errors:
+                    return
+                if data:
+                    yield data
+                if decompressor.eof:
+                    chunk = decompressor.unused_data
+                    decompressor = new_decompressor()
+                else:
+                    chunk = b""
+
+def _file_lines(path):
+    """Yield the complete lines of a plain or compressed file."""
+    pending = b""
+    for chunk in _read_chunks(path):
+        lines = (pending + chunk).split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line.decode('utf-8-sig' if line.startswith(b'\xef\xbb\xbf') else 'utf-8') + '\n'
+    # A last line without a newline is kept for plain files only; in a compressed
+    # file it is the tail of a member that was cut off
+    if pending and not path.endswith(('.gz', '.zst')):
+        yield pending.decode('utf-8')
+
+def tweet_file_lines(path):
+    """Yield the CSV lines of an output file, compressed file or manifest.
+
+    Segments after the first have their header line skipped, so the result
+    reads like one CSV file.
+    """
+    if not is_manifest(path):
+        yield from _file_lines(path)
+        return
+    for index, segment in enumerate(manifest_segments(path)):
+        if not os.path.exists(segment):
+            continue
+        lines = _file_lines(segment)
+        if index > 0:
+            next(lines, None)
+        yield from lines
+
+def iter_rows(path):
+    """Yield the rows of any kind of output file as dictionaries."""
+    return csv.DictReader(tweet_file_lines(path))
+
+def _signature(path):
+    """Size and modification time of a compressed file or a manifest and its segments."""
+    paths = [path] + (manifest_segments(path) if is_manifest(path) else [])
+    stats = [os.stat(p) for p in paths if os.path.exists(p)]
+    return json.dumps([(st.st_size, st.st_mtime_ns) for st in stats]).encode('utf-8')
+
+def read_appended_rows(path, state=None):
+    """Read the CSV rows appended to a file since `state` was recorded.
+
+    `state` is the (offset, fingerprint, header) tuple returned by a previous
+    call, or None to read from the start. Returns (rows, new_state, rewritten),
+    where rows iterates over dictionaries and rewritten is True when the file
+    shrank or changed before the recorded offset; the rows are then the whole
+    file and earlier results must be dropped.
+    Only complete lines are consumed, so a row being written is picked up next time.
+    Compressed files and manifests can't be read from an offset; they are read
+    in full (and reported as rewritten) whenever they changed.
+    """
+    if is_manifest(path) or path.endswith(('.gz', '.zst')):
+        signature = _signature(path)
+        if state and state[1] == signature:
+            return [], state, False
+        return iter_rows(path), (0, signature, ""), state is not None
+
+    size = os.path.getsize(path)
+    rewritten = False
+
+    with open(path, 'rb') as f:
+        if state:
+            offset, fingerprint, header = state
+            if size < offset or _fingerprint(f, offset) != fingerprint:
+                rewritten = True
+                state = None
+
+        if not state:
+            f.seek(0)
+            header = f.readline().decode('utf-8-sig').strip('\r\n')
+            offset = f.tell()
+
+        f.seek(offset)
+        data = f.read()
+        end = data.rfind(b'\n') + 1
+        new_offset = offset + end
+        new_state = (new_offset, _fingerprint(f, new_offset), header)
+
+    if end == 0 or not header:
+        return [], new_state, rewritten
+
+    fields = next(csv.reader([header]))
+    rows = csv.DictReader(io.StringIO(data[:end].decode('utf-8'), newline=''), fieldnames=fields)
+    return rows, new_state, rewritten
+
+class SegmentedTweetWriter:
+    """Stream rows into compressed, size- or row-rotated CSV segments with a manifest.
+
+    `path` is the plain output name, e.g. user_tweets_20240101_120000.csv; the
+    segments become user_tweets_20240101_120000.part0001.csv.gz and so on, and
+    user_tweets_20240101_120000.manifest.json lists them with their row counts
+    and tweet-ID ranges. Every flush() sync-flushes the compressed stream and
+    rewrites the manifest, so everything up to the last flush point stays
+    readable if the process dies.
+    """
+
+    def __init__(self, path, fields, compression=None, max_bytes=None, max_rows=None):
+        if compression not in COMPRESSION_EXTENSIONS:
+            raise ValueError(f"unknown compression {compression!r}, expected gzip or zstd")
+        if compression == 'zstd':
+            _zstd()  # Fail before the scrape starts rather than at the first save
+        self.base = path[:-4] if path.endswith('.csv') else path
+        self.manifest_path = self.base + MANIFEST_SUFFIX
+        self.fields = fields
+        self.compression = compression
+        self.max_bytes = max_bytes
+        self.max_rows = max_rows
+        self.segments = []
+        self.written = set()
+        self.buffer = io.StringIO()
+        self.buffered_rows = 0
+        self.file = None
+        self.compressor = None
+
+    @property
+    def current_path(self):
+        if not self.segments:
+            return self.manifest_path
+        return os.path.join(os.path.dirname(self.manifest_path), self.segments[-1]['file'])
+
+    def _new_compressor(self):
+        if self.compression == 'gzip':
+            return zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 writes a gzip header
+        if self.compression == 'zstd':
+            return _zstd().ZstdCompressor(level=10).compressobj()
+        return None
+
+    def _compress(self, data, finish=False):
+        """Compress data up to a point that can be decompressed without the rest of the stream."""
+        if self.compressor is None:
+            return data
+        if self.compression == 'gzip':
+            return self.compressor.compress(data) + self.compressor.flush(zlib.Z_FINISH if finish else zlib.Z_SYNC_FLUSH)
+        zstandard = _zstd()
+        mode = zstandard.COMPRESSOBJ_FLUSH_FINISH if finish else zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        return self.compressor.compress(data) + self.compressor.flush(mode)
+
+    def _end_segment(self):
+        if self.file is None:
+            return
+        self.flush(finish=True)
+        self.file.close()
+        self.file = None
+
+    def _start_segment(self):
+        self._end_segment()
+        name = f"{os.path.basename(self.base)}.part{len(self.segments) + 1:04d}.csv{COMPRESSION_EXTENSIONS[self.compression]}"
+        self.segments.append({'file': name, 'rows': 0, 'bytes': 0, 'first_id': None, 'last_id': None,
+                              'min_id': None, 'max_id': None})
+        self.file = open(self.current_path, 'wb')
+        self.compressor = self._new_compressor()
+        csv.writer(self.buffer).writerow(self.fields)
+
+    def _segment_full(self):
+        segment = self.segments[-1]
+        if self.max_rows and segment['rows'] + self.buffered_rows >= self.max_rows:
+            return True
+        return bool(self.max_bytes) and segment['bytes'] >= self.max_bytes
+
+    def _track_id(self, segment, tweet_id):
+        if not tweet_id or tweet_id == "Unknown":
+            return
+        if segment['first_id'] is None:
+            segment['first_id'] = tweet_id
+        segment['last_id'] = tweet_id
+        key = (len(tweet_id), tweet_id)  # Numeric order for digit strings
+        if segment['min_id'] is None or key < (len(segment['min_id']), segment['min_id']):
+            segment['min_id'] = tweet_id
+        if segment['max_id'] is None or key > (len(segment['max_id']), segment['max_id']):
+            segment['max_id'] = tweet_id
+
+    def write_rows(self, rows):
+        """Write rows (dictionaries) and end with a flush point. Returns the number written."""
+        writer = csv.DictWriter(self.buffer, fieldnames=self.fields, extrasaction='ignore')
+        count = 0
+        for row in rows:
+            if self.file is None or self._segment_full():
+                self._start_segment()
+                writer = csv.DictWriter(self.buffer, fieldnames=self.fields, extrasaction='ignore')
+            writer.writerow(row)
+            self._track_id(self.segments[-1], str(row.get('tweet_id') or ""))
+            self.buffered_rows += 1
+            count += 1
+            if self.buffered_rows >= FLUSH_ROWS:
+                self.flush()
+                writer = csv.DictWriter(self.buffer, fieldnames=self.fields, extrasaction='ignore')
+        self.flush()
+        return count
+
+    def write_new(self, tweets):
+        """Write only the tweets not written before, for callers that pass their whole list each time."""
+        new = []
+        for tweet in tweets:
+            key = tweet.get('tweet_id')
+            if not key or key == "Unknown":
+                key = tweet.get('text')
+            if key not in self.written:
+                self.written.add(key)
+                new.append(tweet)
+        return self.write_rows(new)
+
+    def flush(self, finish=False):
+        """Write the buffered rows up to a flush point and update the manifest."""
+        if self.file is None:
+            return
+        data = self.buffer.getvalue()
+        if data or finish:
+            compressed = self._compress(data.encode('utf-8'), finish)
+            self.file.write(compressed)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.segments[-1]['bytes'] += len(compressed)
+            self.segments[-1]['rows'] += self.buffered_rows
+            self.buffer = io.StringIO()
+            self.buffered_rows = 0
+        self.write_manifest()
+
+    def write_manifest(self, complete=False):
+        manifest = {
+            'fields': self.fields,
+            'compression': self.compression,
+            'complete': complete,
+            'rows': sum(segment['rows'] for segment in self.segments),
+            'segments': self.segments,
+        }
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def close(self):
+        """Finish the last segment and mark the manifest complete."""
+        self._end_segment()
+        self.write_manifest(complete=True)
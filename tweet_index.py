@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Persistent full-text index over scraped tweets.
+Builds an SQLite FTS5 inverted index over tweet text, mentions and hashtags from
+one or more scraper output files, updates it incrementally as rows are appended,
+and answers boolean/phrase queries with date filters and engagement sorting.
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+
+from tweet_files import account_from_filename, read_appended_rows, row_account
+from tweet_tokenizer import tokenize
+
+DEFAULT_INDEX = "tweets_index.sqlite"
+INSERT_BATCH = 5000
+SCHEMA_VERSION = 1  # Indexes of an older version get their tweet_sources filled in from tweets.source
+
+SORT_COLUMNS = {
+    'relevance': 'rank',
+    'date': 'tweets.epoch DESC',
+    'oldest': 'tweets.epoch ASC',
+    'likes': 'tweets.likes DESC',
+    'retweets': 'tweets.retweets DESC',
+    'replies': 'tweets.replies DESC',
+    'engagement': 'tweets.engagement DESC',
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    offset INTEGER NOT NULL,
+    fingerprint BLOB,
+    header TEXT
+);
+CREATE TABLE IF NOT EXISTS tweets (
+    id INTEGER PRIMARY KEY,
+    tweet_id TEXT UNIQUE,
+    account TEXT,
+    timestamp TEXT,
+    epoch INTEGER,
+    text TEXT,
+    mentions TEXT,
+    hashtags TEXT,
+    replies INTEGER,
+    retweets INTEGER,
+    likes INTEGER,
+    engagement INTEGER,
+    url TEXT,
+    source TEXT
+);
+CREATE INDEX IF NOT EXISTS tweets_epoch ON tweets(epoch);
+CREATE INDEX IF NOT EXISTS tweets_source ON tweets(source);
+-- Every file a tweet was indexed from; tweets.source only names the first one
+CREATE TABLE IF NOT EXISTS tweet_sources (
+    id INTEGER,
+    path TEXT,
+    PRIMARY KEY (id, path)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS tweet_sources_path ON tweet_sources(path);
+CREATE VIRTUAL TABLE IF NOT EXISTS tweet_fts USING fts5(
+    text, mentions, hashtags,
+    content='tweets', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS tweets_ai AFTER INSERT ON tweets BEGIN
+    INSERT INTO tweet_fts(rowid, text, mentions, hashtags) VALUES (new.id, new.text, new.mentions, new.hashtags);
+    INSERT OR IGNORE INTO tweet_sources (id, path) VALUES (new.id, new.source);
+END;
+CREATE TRIGGER IF NOT EXISTS tweets_ad AFTER DELETE ON tweets BEGIN
+    INSERT INTO tweet_fts(tweet_fts, rowid, text, mentions, hashtags) VALUES ('delete', old.id, old.text, old.mentions, old.hashtags);
+END;
+CREATE TRIGGER IF NOT EXISTS tweets_au AFTER UPDATE OF text, mentions, hashtags ON tweets BEGIN
+    INSERT INTO tweet_fts(tweet_fts, rowid, text, mentions, hashtags) VALUES ('delete', old.id, old.text, old.mentions, old.hashtags);
+    INSERT INTO tweet_fts(rowid, text, mentions, hashtags) VALUES (new.id, new.text, new.mentions, new.hashtags);
+END;
+"""
+
+UPSERT_SQL = """
+INSERT INTO tweets (tweet_id, account, timestamp, epoch, text, mentions, hashtags,
+                    replies, retweets, likes, engagement, url, source)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(tweet_id) DO UPDATE SET
+    replies = excluded.replies,
+    retweets = excluded.retweets,
+    likes = excluded.likes,
+    engagement = excluded.engagement
+"""
+
+# A tweet already indexed from another file is recorded as being in this one too
+SOURCE_SQL = "INSERT OR IGNORE INTO tweet_sources (id, path) SELECT id, ? FROM tweets WHERE tweet_id = ?"
+
+def open_index(index_path):
+    """Open (and create if needed) the index database."""
+    conn = sqlite3.connect(index_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+        with conn:
+            conn.execute("INSERT OR IGNORE INTO tweet_sources (id, path) SELECT id, source FROM tweets WHERE source IS NOT NULL")
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return conn
+
+def parse_epoch(timestamp):
+    """Convert a scraper timestamp into seconds since the epoch, or None."""
+    try:
+        dt = datetime.strptime(timestamp, '%Y-%m-%dT%H:%M:%S.%fZ')
+    except (TypeError, ValueError):
+        return None
+    return int(dt.replace(tzinfo=timezone.utc).timestamp())
+
+def parse_date(value):
+    """Parse a YYYY-MM-DD command line date into an epoch, for argparse."""
+    try:
+        return int(datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp())
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date '{value}', expected YYYY-MM-DD")
+
+def _to_int(value):
+    try:
+        return int(value) if value else 0
+    except ValueError:
+        return 0
+
+def row_to_record(row, source, default_account):
+    """Turn a CSV row into the values of an index record."""
+    text = row.get('text') or ""
+    tokens = tokenize(text)
+    tweet_id = row.get('tweet_id')
+    replies, retweets, likes = _to_int(row.get('replies')), _to_int(row.get('retweets')), _to_int(row.get('likes'))
+    return (
+        tweet_id if tweet_id and tweet_id != "Unknown" else None,
+        row_account(row, default_account),
+        row.get('timestamp'),
+        parse_epoch(row.get('timestamp')),
+        text,
+        " ".join(m[1:].lower() for m in tokens.mentions),
+        " ".join(h[1:].lower() for h in tokens.hashtags),
+        replies,
+        retweets,
+        likes,
+        replies + retweets + likes,
+        row.get('url') or "",
+        source,
+    )
+
+def forget_source(conn, path):
+    """Drop everything indexed from a source file, except tweets that other indexed files contain too."""
+    conn.execute("""DELETE FROM tweets WHERE id IN (SELECT id FROM tweet_sources WHERE path = ?)
+                    AND NOT EXISTS (SELECT 1 FROM tweet_sources s WHERE s.id = tweets.id AND s.path != ?)""", (path, path))
+    conn.execute("DELETE FROM tweet_sources WHERE path = ?", (path,))
+    conn.execute("""UPDATE tweets SET source = (SELECT MIN(path) FROM tweet_sources s WHERE s.id = tweets.id)
+                    WHERE source = ?""", (path,))
+    conn.execute("DELETE FROM sources WHERE path = ?", (path,))
+
+def insert_batch(conn, records, path):
+    """Insert or update index records read from path."""
+    conn.executemany(UPSERT_SQL, records)
+    conn.executemany(SOURCE_SQL, [(path, record[0]) for record in records if record[0]])
+
+def index_file(conn, csv_file):
+    """Index the rows of a file that were appended since the last run.
+
+    Returns the number of rows read. A file that shrank or was rewritten before
+    the indexed offset is reindexed from scratch.
+    """
+    path = os.path.abspath(csv_file)
+    state = conn.execute("SELECT offset, fingerprint, header FROM sources WHERE path = ?", (path,)).fetchone()
+    rows, new_state, rewritten = read_appended_rows(path, state)
+    default_account = account_from_filename(path)
+
+    count = 0
+    batch = []
+    with conn:
+        if rewritten:
+            print(f"{csv_file} was rewritten, reindexing it from scratch")
+            forget_source(conn, path)
+        for row in rows:
+            batch.append(row_to_record(row, path, default_account))
+            if len(batch) >= INSERT_BATCH:
+                insert_batch(conn, batch, path)
+                count += len(batch)
+                batch = []
+        if batch:
+            insert_batch(conn, batch, path)
+            count += len(batch)
+        conn.execute(
+            "INSERT OR REPLACE INTO sources (path, offset, fingerprint, header) VALUES (?, ?, ?, ?)",
+            (path, *new_state)
+        )
+    return count
+
+TOKEN_PATTERN = re.compile(r'"[^"]*"|\(|\)|[^\s()"]+')
+
+def translate_query(query):
+    """Translate the query language into an FTS5 MATCH expression.
+
+    Supports AND, OR, NOT, parentheses, "exact phrases", prefix* terms,
+    @mention and #hashtag terms. Adjacent terms are ANDed.
+    """
+    parts = []
+    for token in TOKEN_PATTERN.findall(query):
+        upper = token.upper()
+        if token in ('(', ')') or upper in ('AND', 'OR', 'NOT'):
+            parts.append(upper)
+        elif token.startswith('"'):
+            phrase = token.strip('"').replace('"', '')
+            if phrase:
+                parts.append(f'text:"{phrase}"')
+        elif token.startswith('@') and len(token) > 1:
+            parts.append(f'mentions:"{token[1:].lower()}"')
+        elif token.startswith('#') and len(token) > 1:
+            parts.append(f'hashtags:"{token[1:].lower()}"')
+        elif token.endswith('*') and len(token) > 1:
+            parts.append(f'text:"{token[:-1]}"*')
+        else:
+            parts.append(f'text:"{token}"')
+    return " ".join(parts)
+
+def search(conn, query, since=None, until=None, account=None, sort='relevance', limit=20):
+    """Run a query against the index and return matching rows as dictionaries."""
+    clauses = []
+    params = []
+    if query:
+        clauses.append("tweet_fts MATCH ?")
+        params.append(translate_query(query))
+    if since is not None:
+        clauses.append("tweets.epoch >= ?")
+        params.append(since)
+    if until is not None:
+        # --until is inclusive of the whole day
+        clauses.append("tweets.epoch < ?")
+        params.append(until + 86400)
+    if account:
+        clauses.append("tweets.account = ?")
+        params.append(account.lstrip('@').lower())
+
+    if query:
+        sql = "SELECT tweets.* FROM tweet_fts JOIN tweets ON tweets.id = tweet_fts.rowid"
+        order = SORT_COLUMNS[sort]
+    else:
+        sql = "SELECT tweets.* FROM tweets"
+        order = SORT_COLUMNS['date' if sort == 'relevance' else sort]
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += f" ORDER BY {order} LIMIT ?"
+    params.append(limit)
+
+    conn.row_factory = sqlite3.Row
+    try:
+        return [dict(row) for row in conn.execute(sql, params)]
+    finally:
+        conn.row_factory = None
+
+def main():
+    parser = argparse.ArgumentParser(description='Full-text index and search over scraped tweets')
+    parser.add_argument('--index', default=DEFAULT_INDEX, help=f'Index database file (default: {DEFAULT_INDEX})')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Index new rows of one or more CSV files')
+    build_parser.add_argument('files', nargs='+', help='CSV files created by the scraper')
+    build_parser.add_argument('--rebuild', action='store_true', help='Reindex the files from scratch')
+
+    query_parser = subparsers.add_parser('query', help='Search the index')
+    query_parser.add_argument('query', nargs='?', default='',
+                              help='Terms, "phrases", @mentions, #hashtags, AND/OR/NOT and parentheses')
+    query_parser.add_argument('--since', type=parse_date, help='Only tweets on or after this date (YYYY-MM-DD)')
+    query_parser.add_argument('--until', type=parse_date, help='Only tweets on or before this date (YYYY-MM-DD)')
+    query_parser.add_argument('--account', help='Only tweets posted by this account')
+    query_parser.add_argument('--sort', choices=sorted(SORT_COLUMNS), default='relevance',
+                              help='Sort order (default: relevance)')
+    query_parser.add_argument('--limit', type=int, default=20, help='Maximum results (default: 20)')
+    args = parser.parse_args()
+
+    conn = open_index(args.index)
+
+    if args.command == 'build':
+        for csv_file in args.files:
+            if not os.path.exists(csv_file):
+                print(f"Error: File {csv_file} does not exist!")
+                continue
+            if args.rebuild:
+                with conn:
+                    forget_source(conn, os.path.abspath(csv_file))
+            start = time.time()
+            count = index_file(conn, csv_file)
+            print(f"Indexed {count} new rows from {csv_file} in {time.time() - start:.2f}s")
+        total = conn.execute("SELECT COUNT(*) FROM tweets").fetchone()[0]
+        print(f"Index {args.index} now holds {total} tweets")
+        return
+
+    start = time.time()
+    try:
+        results = search(conn, args.query, args.since, args.until, args.account, args.sort, args.limit)
+    except sqlite3.OperationalError as e:
+        print(f"Invalid query: {e}")
+        sys.exit(1)
+    elapsed = (time.time() - start) * 1000
+
+    for row in results:
+        print(f"{row['timestamp']}  💬 {row['replies']}  🔁 {row['retweets']}  ❤️ {row['likes']}  {row['url']}")
+        print(f"   {row['text'][:100]}")
+    print(f"\n{len(results)} results in {elapsed:.1f} ms")
+
+if __name__ == "__main__":
+    main()
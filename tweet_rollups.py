@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Incrementally maintained engagement rollups.
+Keeps hourly and daily buckets per account (tweet count, reply/retweet/like sums
+and maxima with the tweets that reached them) and daily mention and hashtag
+counts in an SQLite store that is updated only with rows it has not seen, so
+reports and time series don't need a rescan of the full CSV.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+
+from tweet_files import account_from_filename, read_appended_rows, row_account
+from tweet_tokenizer import tokenize
+
+DEFAULT_ROLLUPS = "tweet_rollups.sqlite"
+UNKNOWN_BUCKET = "unknown"
+LOOKUP_BATCH = 500
+SCHEMA_VERSION = 2  # Stores of an older version are rebuilt from the files fed to them next
+
+TIMESTAMP_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}T\d{2}')
+STAT_FIELDS = ['replies', 'retweets', 'likes']
+GRANULARITIES = {'hour': 13, 'day': 10}  # Length of the timestamp prefix that names a bucket
+DAYS_OF_WEEK = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    offset INTEGER NOT NULL,
+    fingerprint BLOB,
+    header TEXT
+);
+CREATE TABLE IF NOT EXISTS seen (
+    key TEXT PRIMARY KEY,
+    account TEXT,
+    hour TEXT,
+    replies INTEGER,
+    retweets INTEGER,
+    likes INTEGER
+);
+CREATE TABLE IF NOT EXISTS rollups (
+    account TEXT,
+    granularity TEXT,
+    bucket TEXT,
+    tweets INTEGER,
+    replies INTEGER,
+    retweets INTEGER,
+    likes INTEGER,
+    max_replies INTEGER,
+    max_retweets INTEGER,
+    max_likes INTEGER,
+    top_replies_id TEXT,
+    top_retweets_id TEXT,
+    top_likes_id TEXT,
+    top_replies_text TEXT,
+    top_retweets_text TEXT,
+    top_likes_text TEXT,
+    PRIMARY KEY (account, granularity, bucket)
+);
+CREATE TABLE IF NOT EXISTS entities (
+    account TEXT,
+    day TEXT,
+    kind TEXT,
+    value TEXT,
+    count INTEGER,
+    PRIMARY KEY (account, day, kind, value)
+) WITHOUT ROWID;
+"""
+
+# Each column is compared with the row as it was before the update, so the top tweet follows the new maximum
+ROLLUP_UPSERT_SQL = """
+INSERT INTO rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(account, granularity, bucket) DO UPDATE SET
+    tweets = tweets + excluded.tweets,
+    replies = replies + excluded.replies,
+    retweets = retweets + excluded.retweets,
+    likes = likes + excluded.likes,
+    max_replies = MAX(max_replies, excluded.max_replies),
+    max_retweets = MAX(max_retweets, excluded.max_retweets),
+    max_likes = MAX(max_likes, excluded.max_likes),
+    top_replies_id = CASE WHEN excluded.max_replies > max_replies THEN excluded.top_replies_id ELSE top_replies_id END,
+    top_retweets_id = CASE WHEN excluded.max_retweets > max_retweets THEN excluded.top_retweets_id ELSE top_retweets_id END,
+    top_likes_id = CASE WHEN excluded.max_likes > max_likes THEN excluded.top_likes_id ELSE top_likes_id END,
+    top_replies_text = CASE WHEN excluded.max_replies > max_replies THEN excluded.top_replies_text ELSE top_replies_text END,
+    top_retweets_text = CASE WHEN excluded.max_retweets > max_retweets THEN excluded.top_retweets_text ELSE top_retweets_text END,
+    top_likes_text = CASE WHEN excluded.max_likes > max_likes THEN excluded.top_likes_text ELSE top_likes_text END
+"""
+
+ENTITY_UPSERT_SQL = """
+INSERT INTO entities VALUES (?, ?, ?, ?, ?)
+ON CONFLICT(account, day, kind, value) DO UPDATE SET count = count + excluded.count
+"""
+
+logger = logging.getLogger(__name__)
+
+def open_rollups(path=DEFAULT_ROLLUPS):
+    """Open (and create if needed) the rollup store."""
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version < SCHEMA_VERSION and conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'rollups'").fetchone():
+        # Rollups are derived data; forgetting the sources makes the next update read every file again
+        logger.warning("Rebuilding the rollup store %s for its new layout; feed it its files again", path)
+        conn.executescript("DROP TABLE IF EXISTS rollups; DROP TABLE IF EXISTS seen; DROP TABLE IF EXISTS sources;")
+    conn.executescript(SCHEMA)
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return conn
+
+def _to_int(value):
+    try:
+        return int(value) if value else 0
+    except ValueError:
+        return 0
+
+def row_key(row):
+    """Identify a tweet across files and repeated saves."""
+    tweet_id = row.get('tweet_id')
+    if tweet_id and tweet_id != "Unknown":
+        return tweet_id
+    digest = hashlib.sha1(f"{row.get('timestamp')}\x00{row.get('text')}".encode('utf-8')).hexdigest()
+    return f"text:{digest}"
+
+def _apply_rows(conn, rows, default_account):
+    """Fold a batch of rows into the rollups, counting each tweet once.
+
+    A tweet seen before only contributes the change in its counts, so
+    refreshed engagement numbers update the sums instead of double counting.
+    """
+    latest = {}
+    tweets = {}  # key -> (tweet_id, text) for the top tweets and the entity counts
+    for row in rows:
+        tweets[row_key(row)] = (row.get('tweet_id') or "", row.get('text') or "")
+        timestamp = row.get('timestamp') or ""
+        latest[row_key(row)] = (
+            row_account(row, default_account),
+            timestamp[:13] if TIMESTAMP_PATTERN.match(timestamp) else UNKNOWN_BUCKET,
+            _to_int(row.get('replies')),
+            _to_int(row.get('retweets')),
+            _to_int(row.get('likes')),
+        )
+
+    keys = list(latest)
+    previous = {}
+    for i in range(0, len(keys), LOOKUP_BATCH):
+        chunk = keys[i:i + LOOKUP_BATCH]
+        placeholders = ",".join("?" * len(chunk))
+        for key, *values in conn.execute(
+            f"SELECT key, account, hour, replies, retweets, likes FROM seen WHERE key IN ({placeholders})", chunk
+        ):
+            previous[key] = tuple(values)
+
+    buckets = {}
+    entities = {}
+    for key, (account, hour, replies, retweets, likes) in latest.items():
+        old = previous.get(key)
+        if old == (account, hour, replies, retweets, likes):
+            continue
+        if old:
+            # Keep the tweet in the bucket it was first counted in
+            account, hour = old[0], old[1]
+            delta = (0, replies - old[2], retweets - old[3], likes - old[4])
+        else:
+            delta = (1, replies, retweets, likes)
+            # Mentions and hashtags are counted once per tweet, in its day
+            day = hour[:GRANULARITIES['day']] if hour != UNKNOWN_BUCKET else UNKNOWN_BUCKET
+            tokens = tokenize(tweets[key][1])
+            for kind, values in (('mention', tokens.mentions), ('hashtag', tokens.hashtags)):
+                for value in values:
+                    entity = (account, day, kind, value)
+                    entities[entity] = entities.get(entity, 0) + 1
+
+        tweet_id, text = tweets[key]
+        for granularity, length in GRANULARITIES.items():
+            bucket = hour[:length] if hour != UNKNOWN_BUCKET else UNKNOWN_BUCKET
+            # tweets, replies, retweets, likes, their maxima, and the ids and texts of the tweets with those maxima
+            agg = buckets.setdefault((account, granularity, bucket), [0, 0, 0, 0, 0, 0, 0, "", "", "", "", "", ""])
+            for i in range(4):
+                agg[i] += delta[i]
+            for i, value in enumerate((replies, retweets, likes)):
+                if value > agg[4 + i] or not agg[7 + i]:
+                    agg[4 + i] = max(agg[4 + i], value)
+                    agg[7 + i], agg[10 + i] = tweet_id, text
+        latest[key] = (account, hour, replies, retweets, likes)
+
+    conn.executemany(ROLLUP_UPSERT_SQL, [(*bucket_key, *agg) for bucket_key, agg in buckets.items()])
+    conn.executemany(ENTITY_UPSERT_SQL, [(*entity, count) for entity, count in entities.items()])
+    conn.executemany("INSERT OR REPLACE INTO seen VALUES (?, ?, ?, ?, ?, ?)",
+                     [(key, *values) for key, values in latest.items() if previous.get(key) != values])
+
+def update_rollups(conn, csv_file, batch_size=20000):
+    """Fold the rows appended to a file since the last update into the rollups.
+
+    Returns the number of rows read.
+    """
+    path = os.path.abspath(csv_file)
+    state = conn.execute("SELECT offset, fingerprint, header FROM sources WHERE path = ?", (path,)).fetchone()
+    rows, new_state, _ = read_appended_rows(path, state)
+    default_account = account_from_filename(path)
+
+    # A rewritten file is simply read again: known tweets only contribute count changes
+    count = 0
+    batch = []
+    with conn:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                _apply_rows(conn, batch, default_account)
+                count += len(batch)
+                batch = []
+        if batch:
+            _apply_rows(conn, batch, default_account)
+            count += len(batch)
+        conn.execute(
+            "INSERT OR REPLACE INTO sources (path, offset, fingerprint, header) VALUES (?, ?, ?, ?)",
+            (path, *new_state)
+        )
+    return count
+
+def _account_filter(account):
+    if account:
+        return " AND account = ?", [account.lstrip('@').lower()]
+    return "", []
+
+def top_tweet(conn, field, account=None):
+    """Return {'value', 'tweet_id', 'text'} of the tweet with the most of field, or None."""
+    where, params = _account_filter(account)
+    row = conn.execute(
+        f"SELECT max_{field}, top_{field}_id, top_{field}_text FROM rollups "
+        f"WHERE granularity = 'day'{where} ORDER BY max_{field} DESC LIMIT 1", params
+    ).fetchone()
+    return {'value': row[0], 'tweet_id': row[1], 'text': row[2] or ""} if row else None
+
+def top_entities(conn, kind, top_n=10, account=None):
+    """Return the top_n (value, count) mentions or hashtags (kind 'mention' or 'hashtag')."""
+    where, params = _account_filter(account)
+    return conn.execute(
+        f"SELECT value, SUM(count) FROM entities WHERE kind = ?{where} GROUP BY value ORDER BY 2 DESC, value LIMIT ?",
+        [kind, *params, top_n]
+    ).fetchall()
+
+def rollup_summary(conn, account=None, top_n=10):
+    """Return totals, top tweets, top mentions and hashtags, date range and weekday histogram from the daily rollups."""
+    where, params = _account_filter(account)
+    totals = conn.execute(
+        "SELECT COALESCE(SUM(tweets), 0), COALESCE(SUM(replies), 0), COALESCE(SUM(retweets), 0), COALESCE(SUM(likes), 0), "
+        "COALESCE(MAX(max_replies), 0), COALESCE(MAX(max_retweets), 0), COALESCE(MAX(max_likes), 0) "
+        f"FROM rollups WHERE granularity = 'day'{where}", params
+    ).fetchone()
+    first_day, last_day = conn.execute(
+        f"SELECT MIN(bucket), MAX(bucket) FROM rollups WHERE granularity = 'day' AND bucket != ?{where}",
+        [UNKNOWN_BUCKET, *params]
+    ).fetchone()
+
+    # SQLite numbers weekdays from Sunday = 0
+    weekdays = dict.fromkeys(DAYS_OF_WEEK, 0)
+    for weekday, tweets in conn.execute(
+        f"SELECT CAST(strftime('%w', bucket) AS INTEGER), SUM(tweets) FROM rollups "
+        f"WHERE granularity = 'day' AND bucket != ?{where} GROUP BY 1", [UNKNOWN_BUCKET, *params]
+    ):
+        weekdays[DAYS_OF_WEEK[(weekday + 6) % 7]] = tweets
+
+    return {
+        'tweets': totals[0],
+        'replies': totals[1],
+        'retweets': totals[2],
+        'likes': totals[3],
+        'max_replies': totals[4],
+        'max_retweets': totals[5],
+        'max_likes': totals[6],
+        'top': {field: top_tweet(conn, field, account) for field in STAT_FIELDS},
+        'top_mentions': top_entities(conn, 'mention', top_n, account),
+        'top_hashtags': top_entities(conn, 'hashtag', top_n, account),
+        'first_day': first_day,
+        'last_day': last_day,
+        'weekdays': weekdays,
+    }
+
+def timeseries(conn, granularity, account=None):
+    """Return the rollup buckets of one granularity in time order."""
+    where, params = _account_filter(account)
+    return conn.execute(
+        "SELECT bucket, SUM(tweets), SUM(replies), SUM(retweets), SUM(likes), "
+        "MAX(max_replies), MAX(max_retweets), MAX(max_likes) FROM rollups "
+        f"WHERE granularity = ? AND bucket != ?{where} GROUP BY bucket ORDER BY bucket",
+        [granularity, UNKNOWN_BUCKET, *params]
+    ).fetchall()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Shared tokenizer for tweet text.
+Normalizes whitespace and finds mentions, hashtags, cashtags and URLs in a
+single scan with precompiled patterns, so the scrapers and the analyzer don't
+each run their own regular expressions over every tweet.
+"""
+
+import re
+import sys
+import unicodedata
+from collections import namedtuple
+
+Tokens = namedtuple('Tokens', ['text', 'mentions', 'hashtags', 'cashtags', 'urls'])
+
+def _combining_marks():
+    """Character class body covering the combining marks of the Basic Multilingual Plane.
+
+    \\w does not match most of them, which would cut hashtags in scripts such as
+    Devanagari or Thai in the middle of a word.
+    """
+    ranges = []
+    start = None
+    for cp in range(0x10000):
+        if unicodedata.category(chr(cp))[0] == 'M':
+            if start is None:
+                start = cp
+            end = cp
+        elif start is not None:
+            ranges.append(f"\\u{start:04x}-\\u{end:04x}" if end > start else f"\\u{start:04x}")
+            start = None
+    return "".join(ranges)
+
+HASHTAG_CHARS = f"\\w{_combining_marks()}\\u200c\\u200d"  # Plus zero-width (non-)joiners
+
+URL_END = "[^\\s.,;:!?'\")\\]}…]"  # Trailing punctuation is not part of a URL
+
+NUMBER_PATTERN = re.compile(r'\d+')
+# Every entity is found from its trigger character (@ # $ : .) so the pattern
+# starts with a character set, which lets the regex engine skip ahead to the
+# next candidate instead of trying each alternative at every position. What
+# must precede the trigger is checked with look-behinds after it.
+TOKEN_PATTERN = re.compile(
+    r"[@＠#＃$:.](?:"
+    r"(?<=[@＠])(?<![\w@].)(?P<mention>[A-Za-z0-9_]+)"
+    rf"|(?<=[#＃])(?<![\w&#＃].)(?P<hashtag>[{HASHTAG_CHARS}]+)"
+    r"|(?<=\$)(?<![\w$].)(?P<cashtag>[A-Za-z]{1,6}(?:[._][A-Za-z]{1,2})?)(?!\w)"
+    rf"|(?<=https:)(?P<https>//\S*{URL_END})"
+    rf"|(?<=http:)(?P<http>//\S*{URL_END})"
+    rf"|(?<=www\.)(?P<www>\S*{URL_END})"
+    r")"
+)
+
+def clean_text(text):
+    """Collapse runs of whitespace into single spaces and trim the ends."""
+    return " ".join(text.split())
+
+def parse_count(text):
+    """Return the first number in a stat label such as '12 Likes', or 0."""
+    match = NUMBER_PATTERN.search(text)
+    return int(match.group()) if match else 0
+
+def tokenize(text, clean=False):
+    """Split tweet text into mentions, hashtags, cashtags and URLs.
+
+    Entities keep their leading @, # or $ (full-width forms are normalized)
+    and are listed in the order they appear. Hashtags
+    made only of digits and underscores are skipped, as Twitter doesn't link
+    them. With clean=True the text is whitespace-normalized first.
+    """
+    if clean:
+        text = clean_text(text)
+    mentions = []
+    hashtags = []
+    cashtags = []
+    urls = []
+    for mention, hashtag, cashtag, https, http, www in TOKEN_PATTERN.findall(text):
+        if mention:
+            mentions.append("@" + mention)
+        elif hashtag:
+            tag = hashtag.replace('_', '')
+            if tag and not tag.isdigit():
+                hashtags.append("#" + hashtag)
+        elif cashtag:
+            cashtags.append("$" + cashtag)
+        elif https:
+            urls.append("https:" + https)
+        elif http:
+            urls.append("http:" + http)
+        else:
+            urls.append("www." + www)
+    return Tokens(text, mentions, hashtags, cashtags, urls)
+
+if __name__ == "__main__":
+    for line in sys.argv[1:] or sys.stdin:
+        tokens = tokenize(line, clean=True)
+        print(f"{tokens.text}\n   mentions={tokens.mentions} hashtags={tokens.hashtags} "
+              f"cashtags={tokens.cashtags} urls={tokens.urls}")
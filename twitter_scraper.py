@@ -1,6 +1,6 @@
 import time
 import csv
-import re
+import logging
 import os
 import random
 from datetime import datetime
@@ -15,15 +15,44 @@ from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from bs4 import BeautifulSoup
 from webdriver_manager.chrome import ChromeDriverManager
 import sys
+import driver_cache
+import driver_watchdog
+import output_sinks
+import profiling_hooks
+import scraper_logging
+import scroll_planner
+import tweet_files
+from tweet_tokenizer import clean_text, parse_count
 
 # Configuration
 TWITTER_USERNAME = "example_user"  # Default placeholder - will be overridden by command line args
 TARGET_URL = f"https://x.com/{TWITTER_USERNAME}/with_replies"
+LOGIN_URL = "https://twitter.com/login"
 SCROLL_PAUSE_TIME = 2.5  # Increased for reliability
 SCROLL_VARIATION = 1.0  # Random variation in scroll time to appear more human-like
 MAX_SCROLLS = 2000  # Adjust based on how many tweets you want to scrape
 OUTPUT_FILE = f"{TWITTER_USERNAME}_tweets_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
 AUTO_LOGIN = False  # Set to True if you want to use automatic login
+BROWSER_POOL = None  # "host:port" of a running browser_pool.py daemon to claim a pre-warmed browser from
+EXPAND_THREADS = False  # Set to True to also collect the conversation around every scraped tweet
+THREAD_WORKERS = 3  # Number of extra browsers used for conversation expansion
+OUTPUT_COMPRESSION = None  # "gzip" or "zstd" to stream output into compressed segments with a manifest
+ROTATE_MB = None  # Start a new output segment after this many megabytes (compressed)
+ROTATE_ROWS = None  # Start a new output segment after this many tweets
+OUTPUT_SINKS = []  # Extra sinks tweets are pushed to as they are scraped: "stdout", "jsonl:PATH" or a webhook URL
+PROFILE = False  # Write cProfile stats every PROFILE_EVERY scrolls and at exit
+TRACE_MEMORY = False  # Write tracemalloc snapshots every PROFILE_EVERY scrolls and at exit
+PROFILE_EVERY = 50  # Scrolls between profiling snapshots
+PROFILE_DIR = None  # Directory for profiling snapshots, default profiles/<username>_<timestamp>
+WATCHDOG = True  # Rebuild a crashed or hung browser mid-run instead of ending the scrape
+MAX_RESTARTS = 5  # Browser restarts allowed per run
+COMMAND_TIMEOUT = 90  # Seconds a WebDriver command may take before the browser counts as hung
+DEBUG = False  # Log every scraped tweet, scroll and save
+LOG_FORMAT = "text"  # "text" or "json" (one JSON object per log line)
+LOG_FILE = None  # Also append the log to this file
+PROGRESS_INTERVAL = scraper_logging.PROGRESS_INTERVAL  # Seconds between progress lines
+
+logger = logging.getLogger("twitter_scraper")
 
 # Twitter login credentials - only needed if AUTO_LOGIN is True
 # TWITTER_EMAIL = "your_email@example.com"
@@ -34,31 +63,50 @@ def setup_driver():
     chrome_options = Options()
     # Uncomment the line below to run Chrome in headless mode
     # chrome_options.add_argument("--headless")
-    chrome_options.add_argument("--window-size=1920,1080")
-    chrome_options.add_argument("--disable-notifications")
-    chrome_options.add_argument("--disable-infobars")
-    chrome_options.add_argument("--mute-audio")
+    # Window size, quiet UI and a regular desktop user agent; pooled browsers are started with the same arguments
+    for argument in driver_cache.chrome_arguments():
+        chrome_options.add_argument(argument)
+    
+    # Look up the driver resolved for this Chrome version on a previous run
+    chrome_version = driver_cache.get_chrome_version()
+    cached_driver_path = driver_cache.get_cached_driver('chromedriver', chrome_version)
+    
+    if BROWSER_POOL:
+        try:
+            return attach_to_browser_pool(cached_driver_path)
+        except Exception as e:
+            logger.warning("Could not attach to browser pool at %s: %s", BROWSER_POOL, e)
+            logger.info("Starting a new browser instead...")
     
-    # Add user agent to appear more like a real browser
-    chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.212 Safari/537.36")
+    if cached_driver_path:
+        try:
+            # Fast path - no network lookups on warm starts
+            service = Service(cached_driver_path)
+            driver = webdriver.Chrome(service=service, options=chrome_options)
+            return driver
+        except Exception as e:
+            logger.warning("Cached driver %s failed to start: %s", cached_driver_path, e)
+            driver_cache.forget_driver('chromedriver', chrome_version)
     
     try:
         # First approach - Use webdriver manager (should work for most cases)
-        service = Service(ChromeDriverManager().install())
+        driver_path = ChromeDriverManager().install()
+        service = Service(driver_path)
         driver = webdriver.Chrome(service=service, options=chrome_options)
+        driver_cache.store_driver('chromedriver', chrome_version, driver_path)
         return driver
     except Exception as e:
-        print(f"First driver initialization approach failed: {e}")
-        print("Trying alternative approach...")
+        logger.warning("First driver initialization approach failed: %s", e)
+        logger.info("Trying alternative approach...")
         
         try:
             # Second approach - Use Chrome directly without service
             driver = webdriver.Chrome(options=chrome_options)
             return driver
         except Exception as e2:
-            print(f"Second driver initialization approach failed: {e2}")
-            print("Please make sure Chrome is installed correctly.")
-            print("Trying one last approach with explicit driver path...")
+            logger.warning("Second driver initialization approach failed: %s", e2)
+            logger.info("Please make sure Chrome is installed correctly.")
+            logger.info("Trying one last approach with explicit driver path...")
             
             # Third approach - Try to use an explicit path that works on Windows
             try:
@@ -79,7 +127,7 @@ def setup_driver():
                             driver = webdriver.Chrome(service=service, options=chrome_options)
                             return driver
                 
-                print("Could not find cached driver. Downloading a fresh driver...")
+                logger.info("Could not find cached driver. Downloading a fresh driver...")
                 from webdriver_manager.chrome import ChromeDriverManager
                 
                 # Force download a new driver with specific version
@@ -88,21 +136,44 @@ def setup_driver():
                 driver = webdriver.Chrome(service=service, options=chrome_options)
                 return driver
             except Exception as e3:
-                print(f"All driver initialization approaches failed: {e3}")
-                print("Please install Chrome browser and try again.")
+                logger.error("All driver initialization approaches failed: %s", e3)
+                logger.info("Please install Chrome browser and try again.")
                 sys.exit(1)
 
+def attach_to_browser_pool(driver_path=None):
+    """Claim a pre-warmed browser from the browser pool daemon and attach a driver to it."""
+    import browser_pool
+    
+    # Chrome's arguments are fixed when it starts, so the pool launched it with driver_cache.chrome_arguments()
+    debugger_address, lease = browser_pool.claim_browser(BROWSER_POOL)
+    chrome_options = Options()
+    chrome_options.add_experimental_option("debuggerAddress", debugger_address)
+    
+    try:
+        if driver_path:
+            driver = webdriver.Chrome(service=Service(driver_path), options=chrome_options)
+        else:
+            driver = webdriver.Chrome(options=chrome_options)
+    except Exception:
+        lease.close()
+        raise
+    
+    # Closing the lease hands the browser back to the pool
+    driver.pool_lease = lease
+    logger.info("Attached to pre-warmed browser at %s", debugger_address)
+    return driver
+
 def login_to_twitter(driver):
     """Attempt to log in to Twitter account."""
     if not AUTO_LOGIN:
-        print("Automatic login is disabled. Please log in manually if prompted.")
-        print("The script will wait 45 seconds for you to login...")
+        logger.info("Automatic login is disabled. Please log in manually if prompted.")
+        logger.info("The script will wait 45 seconds for you to login...")
         time.sleep(45)  # Wait for manual login
         return
     
     try:
-        print("Attempting to log in to Twitter...")
-        driver.get("https://twitter.com/login")
+        logger.info("Attempting to log in to Twitter...")
+        driver.get(LOGIN_URL)
         
         # Wait for the login form to appear
         WebDriverWait(driver, 10).until(
@@ -126,16 +197,15 @@ def login_to_twitter(driver):
         
         # Wait for login to complete
         time.sleep(5)
-        print("Login completed")
+        logger.info("Login completed")
     except Exception as e:
-        print(f"Error during login: {e}")
-        print("Please log in manually in the browser window.")
+        logger.warning("Error during login: %s", e)
+        logger.info("Please log in manually in the browser window.")
         time.sleep(30)  # Give time for manual login
 
 def clean_tweet_text(text):
     """Clean the tweet text by removing extra spaces and newlines."""
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
+    return clean_text(text)
 
 def check_for_login_wall(driver):
     """Check if we've hit a login wall and need to log in."""
@@ -144,18 +214,20 @@ def check_for_login_wall(driver):
         signup_elements = driver.find_elements(By.XPATH, "//span[contains(text(), 'Sign up')]")
         
         if login_elements or signup_elements:
-            print("Detected a login wall. Attempting to bypass...")
+            logger.info("Detected a login wall. Attempting to bypass...")
             login_to_twitter(driver)
             return True
     except Exception as e:
-        print(f"Error checking for login wall: {e}")
+        logger.warning("Error checking for login wall: %s", e)
     
     return False
 
-def random_scroll(driver):
-    """Perform a random scroll to appear more human-like."""
-    scroll_height = random.randint(300, 1000)
-    driver.execute_script(f"window.scrollBy(0, {scroll_height});")
+def text_links(text_element):
+    """The external links (hrefs) in a tweet text element, space separated; mentions and hashtags link relatively."""
+    if text_element is None:
+        return ""
+    return " ".join(a['href'] for a in text_element.find_all('a', href=True)
+                    if a['href'].startswith(('http://', 'https://')))
 
 def extract_tweet_data(article, username=None):
     """Extract data from a tweet article element."""
@@ -178,6 +250,9 @@ def extract_tweet_data(article, username=None):
         else:
             tweet_text = "No text found"
         
+        # Extract the links; the text only shows them shortened and cut off with "…", the hrefs are the full t.co links
+        links = text_links(tweet_text_div)
+        
         # Extract likes, retweets, replies
         stats_divs = article.find_all('div', {'role': 'group'})
         stats = {}
@@ -186,8 +261,7 @@ def extract_tweet_data(article, username=None):
             for i, stat_type in enumerate(['replies', 'retweets', 'likes']):
                 if i < len(stats_elements):
                     stat_text = stats_elements[i].get_text()
-                    stat_value = re.search(r'\d+', stat_text)
-                    stats[stat_type] = int(stat_value.group()) if stat_value else 0
+                    stats[stat_type] = parse_count(stat_text)
         
         # Use provided username or global variable
         user = username if username is not None else TWITTER_USERNAME
@@ -200,12 +274,13 @@ def extract_tweet_data(article, username=None):
             'replies': stats.get('replies', 0),
             'retweets': stats.get('retweets', 0),
             'likes': stats.get('likes', 0),
-            'url': f"https://twitter.com/{user}/status/{tweet_id}" if tweet_id != "Unknown" else "Unknown"
+            'url': f"https://twitter.com/{user}/status/{tweet_id}" if tweet_id != "Unknown" else "Unknown",
+            'links': links
         }
         
         return tweet_data
     except Exception as e:
-        print(f"Error extracting tweet data: {e}")
+        logger.debug("Error extracting tweet data: %s", e)
         return None
 
 def scrape_tweets(driver, username=None):
@@ -219,7 +294,7 @@ def scrape_tweets(driver, username=None):
     # Use provided username or global variable
     user = username if username is not None else TWITTER_USERNAME
     
-    print(f"Starting to scrape tweets from {TARGET_URL}")
+    logger.info("Starting to scrape tweets from %s", TARGET_URL)
     driver.get(TARGET_URL)
     
     # Check for login wall before proceeding
@@ -232,71 +307,132 @@ def scrape_tweets(driver, username=None):
             EC.presence_of_element_located((By.CSS_SELECTOR, 'article'))
         )
     except TimeoutException:
-        print("Timeout while waiting for the timeline to load.")
+        logger.warning("Timeout while waiting for the timeline to load.")
         return tweets
     
     time.sleep(3)  # Allow some time for the page to fully load
     
     # Scroll and scrape
+    planner = scroll_planner.ScrollPlanner()
+    progress = scraper_logging.ProgressReporter(logger, MAX_SCROLLS, PROGRESS_INTERVAL)
     while scroll_count < MAX_SCROLLS:
-        # Every 10 scrolls, perform some random actions to appear more human-like
-        if scroll_count % 10 == 0:
-            random_scroll(driver)
-            time.sleep(random.uniform(1.0, 3.0))
-        
-        # Parse the page with BeautifulSoup
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
-        
-        # Find all tweet articles
-        tweet_articles = soup.find_all('article')
-        prev_count = len(tweets)
-        
-        for article in tweet_articles:
-            tweet_data = extract_tweet_data(article, user)
+        try:
+            # Every 10 scrolls, pause and shorten the next step by a random amount to appear more human-like.
+            # A random jump further down would skip tweets and cost scrolls back up to fill the gap
+            jitter = 0
+            if scroll_count % 10 == 0:
+                jitter = random.randint(300, 1000)
+                time.sleep(random.uniform(1.0, 3.0))
             
-            if not tweet_data:
-                continue
-                
-            # Skip if we've already seen this tweet (by ID or by text)
-            if tweet_data['tweet_id'] in unique_tweet_ids or tweet_data['text'] in unique_tweet_texts:
-                continue
+            # Parse the page with BeautifulSoup
+            soup = BeautifulSoup(driver.page_source, 'html.parser')
             
-            tweets.append(tweet_data)
-            unique_tweet_ids.add(tweet_data['tweet_id'])
-            unique_tweet_texts.add(tweet_data['text'])
+            # Find all tweet articles
+            tweet_articles = soup.find_all('article')
+            prev_count = len(tweets)
+            page_tweets = []
+            
+            for article in tweet_articles:
+                tweet_data = extract_tweet_data(article, user)
+                
+                if not tweet_data:
+                    continue
+                page_tweets.append(tweet_data)
+                    
+                # Skip if we've already seen this tweet (by ID or by text)
+                if tweet_data['tweet_id'] in unique_tweet_ids or tweet_data['text'] in unique_tweet_texts:
+                    continue
+                
+                tweets.append(tweet_data)
+                unique_tweet_ids.add(tweet_data['tweet_id'])
+                unique_tweet_texts.add(tweet_data['text'])
+                
+                logger.debug("Scraped tweet: %s...", tweet_data['text'][:50])
+                
+                # Save progress incrementally every 50 tweets
+                if len(tweets) % 50 == 0:
+                    save_tweets_to_csv(tweets, OUTPUT_FILE)
+                    logger.debug("Saved progress: %d tweets so far.", len(tweets))
             
-            print(f"Scraped tweet: {tweet_data['text'][:50]}...")
+            # Scroll down just past the tweets harvested so far, or back up into a coverage gap
+            planner.scroll(driver, page_tweets, jitter)
+            scroll_time = SCROLL_PAUSE_TIME + random.uniform(-SCROLL_VARIATION, SCROLL_VARIATION)
+            time.sleep(max(0.5, scroll_time))  # Ensure minimum pause time
             
-            # Save progress incrementally every 50 tweets
-            if len(tweets) % 50 == 0:
-                save_tweets_to_csv(tweets, OUTPUT_FILE)
-                print(f"Saved progress: {len(tweets)} tweets so far.")
-        
-        # Scroll down
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        scroll_time = SCROLL_PAUSE_TIME + random.uniform(-SCROLL_VARIATION, SCROLL_VARIATION)
-        time.sleep(max(0.5, scroll_time))  # Ensure minimum pause time
-        
-        scroll_count += 1
-        print(f"Scrolled {scroll_count} times. Found {len(tweets)} tweets so far.")
-        
-        # Check if we found any new tweets in this scroll
-        if prev_count == len(tweets):
-            consecutive_no_new_tweets += 1
-            print(f"No new tweets found in this scroll. ({consecutive_no_new_tweets}/5)")
+            send_to_sinks(tweets)
+            scroll_count += 1
+            profiling_hooks.checkpoint(scroll_count)
+            if isinstance(driver, driver_watchdog.WatchedDriver):
+                driver.save_session(scroll_count)
+            progress.update(scroll_count, len(tweets))
             
-            # If we haven't found new tweets for 5 consecutive scrolls, we might have reached the end
-            if consecutive_no_new_tweets >= 5:
-                print("Reached 5 consecutive scrolls with no new tweets. We might have reached the end.")
+            # Check if we found any new tweets in this scroll (not expected while filling a gap)
+            if prev_count == len(tweets) and not planner.filling_gap:
+                consecutive_no_new_tweets += 1
+                logger.debug("No new tweets found in this scroll. (%d/5)", consecutive_no_new_tweets)
+                
+                # If we haven't found new tweets for 5 consecutive scrolls, we might have reached the end
+                if consecutive_no_new_tweets >= 5:
+                    logger.info("Reached 5 consecutive scrolls with no new tweets. We might have reached the end.")
+                    break
+            else:
+                consecutive_no_new_tweets = 0  # Reset the counter
+        except Exception as e:
+            # A crashed or hung browser is rebuilt and the scrape continues where it was
+            if not recover_driver(driver, e, tweets, scroll_count):
                 break
-        else:
-            consecutive_no_new_tweets = 0  # Reset the counter
+            planner.reset()
+    
+    progress.update(scroll_count, len(tweets), force=True)
+    logger.info(planner.summary())
     
     return tweets
 
-def save_tweets_to_csv(tweets, filename):
+def recover_driver(driver, error, tweets, scroll_count):
+    """Rebuild a crashed or hung browser and return to the last harvested tweet.
+    
+    Returns False when scraping should stop with the tweets found so far.
+    """
+    if not isinstance(driver, driver_watchdog.WatchedDriver):
+        raise error
+    if not driver.check(error):
+        logger.warning("An error occurred while scrolling: %s", error)
+        logger.info("The browser is still responding, stopping with the tweets found so far.")
+        return False
+    
+    logger.warning("The browser crashed or stopped responding after %s scrolls: %s", scroll_count, error)
+    last_tweet_id = tweets[-1]['tweet_id'] if tweets else None
+    return driver.recover(TARGET_URL, last_tweet_id, max_scrolls=scroll_count + 10, pause_time=SCROLL_PAUSE_TIME)
+
+output_writers = {}  # Output filename -> SegmentedTweetWriter when streaming segmented output
+active_sinks = None  # SinkSet opened from OUTPUT_SINKS by open_output_sinks()
+
+def open_output_sinks():
+    """Open the configured output sinks; a stdout sink moves all other output to stderr from here on."""
+    global active_sinks
+    if OUTPUT_SINKS and active_sinks is None:
+        active_sinks = output_sinks.open_sinks(OUTPUT_SINKS)
+
+def send_to_sinks(tweets):
+    """Push the timeline tweets not pushed before to the output sinks."""
+    if active_sinks is not None:
+        active_sinks.send_new(tweets)
+
+def save_tweets_to_csv(tweets, filename, fields=None):
     """Save the scraped tweets to a CSV file."""
-    fields = ['tweet_id', 'timestamp', 'text', 'replies', 'retweets', 'likes', 'url']
+    if fields is None:
+        fields = ['tweet_id', 'timestamp', 'text', 'replies', 'retweets', 'likes', 'url', 'links']
+    
+    if OUTPUT_COMPRESSION or ROTATE_MB or ROTATE_ROWS:
+        # Stream only the tweets not written yet into the current segment
+        writer = output_writers.get(filename)
+        if writer is None:
+            max_bytes = int(ROTATE_MB * 1024 * 1024) if ROTATE_MB else None
+            writer = tweet_files.SegmentedTweetWriter(filename, fields, OUTPUT_COMPRESSION, max_bytes, ROTATE_ROWS)
+            output_writers[filename] = writer
+        written = writer.write_new(tweets)
+        logger.debug("Saved %d new tweets to %s (manifest: %s)", written, writer.current_path, writer.manifest_path)
+        return
     
     # Check if we should append or write a new file
     file_exists = os.path.isfile(filename)
@@ -310,25 +446,73 @@ def save_tweets_to_csv(tweets, filename):
         for tweet in tweets:
             writer.writerow(tweet)
     
-    print(f"Saved {len(tweets)} tweets to {filename}")
+    logger.debug("Saved %d tweets to %s", len(tweets), filename)
+
+def close_output_files():
+    """Finish any segmented output files and deliver what the output sinks still hold."""
+    global active_sinks
+    for writer in output_writers.values():
+        writer.close()
+    output_writers.clear()
+    if active_sinks is not None:
+        active_sinks.close()
+        active_sinks = None
+
+def expand_conversations(driver, tweets):
+    """Collect the conversations around the scraped tweets and save them next to the output file."""
+    import thread_expander
+    
+    threads_file = OUTPUT_FILE.replace('_tweets_', '_threads_', 1)
+    if threads_file == OUTPUT_FILE:
+        threads_file = f"{os.path.splitext(OUTPUT_FILE)[0]}_threads.csv"
+    
+    thread_tweets = thread_expander.expand_threads(
+        [tweet['tweet_id'] for tweet in tweets],
+        setup_driver,
+        extract_tweet_data,
+        TWITTER_USERNAME,
+        workers=THREAD_WORKERS,
+        session_driver=driver
+    )
+    if thread_tweets:
+        save_tweets_to_csv(thread_tweets, threads_file, fields=thread_expander.THREAD_FIELDS)
+        logger.info("Conversation expansion completed! Total tweets in threads: %s", len(thread_tweets))
+    else:
+        logger.info("No conversation tweets were collected.")
 
 def main():
     """Main function to run the scraper."""
-    print(f"Starting Twitter scraper for user: {TWITTER_USERNAME}")
-    print(f"Output will be saved to: {OUTPUT_FILE}")
+    # Open the sinks before anything is printed, so a stdout sink gets nothing but tweets
+    open_output_sinks()
+    scraper_logging.setup_logging(DEBUG, LOG_FORMAT, LOG_FILE)
+    logger.info("Starting Twitter scraper for user: %s", TWITTER_USERNAME)
+    logger.info("Max scrolls: %s, Pause time: %ss", MAX_SCROLLS, SCROLL_PAUSE_TIME)
+    logger.info("Output will be saved to: %s", OUTPUT_FILE)
+    
+    if PROFILE or TRACE_MEMORY:
+        profiling_hooks.start(PROFILE_DIR, PROFILE, TRACE_MEMORY, PROFILE_EVERY, "scroll", TWITTER_USERNAME)
     
     driver = setup_driver()
+    if WATCHDOG:
+        driver = driver_watchdog.WatchedDriver(driver, setup_driver, COMMAND_TIMEOUT, MAX_RESTARTS)
     try:
         tweets = scrape_tweets(driver, TWITTER_USERNAME)
         if tweets:
+            send_to_sinks(tweets)
             save_tweets_to_csv(tweets, OUTPUT_FILE)
-            print(f"Scraping completed! Total tweets scraped: {len(tweets)}")
+            logger.info("Scraping completed! Total tweets scraped: %s", len(tweets))
+            if EXPAND_THREADS:
+                expand_conversations(driver, tweets)
         else:
-            print("No tweets were scraped.")
+            logger.info("No tweets were scraped.")
     except Exception as e:
-        print(f"An error occurred during scraping: {e}")
+        logger.exception("An error occurred during scraping: %s", e)
     finally:
+        close_output_files()
+        profiling_hooks.stop()
         driver.quit()
+        if getattr(driver, 'pool_lease', None):
+            driver.pool_lease.close()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
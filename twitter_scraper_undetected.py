@@ -6,6 +6,7 @@ This version is specifically optimized for Windows and avoiding Twitter's detect
 
 import time
 import csv
+import logging
 import re
 import os
 import random
@@ -18,49 +19,133 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from bs4 import BeautifulSoup
+import driver_cache
+import driver_watchdog
+import output_sinks
+import profiling_hooks
+import scraper_logging
+import scroll_planner
+import tweet_files
+from tweet_tokenizer import NUMBER_PATTERN, clean_text, parse_count
 
 # Configuration
 TWITTER_USERNAME = "example_user"  # Default placeholder - will be overridden by command line args
 TARGET_URL = f"https://x.com/{TWITTER_USERNAME}/with_replies"
+LOGIN_URL = "https://twitter.com/login"
 SCROLL_PAUSE_TIME = 2.5  # Increased for reliability
 SCROLL_VARIATION = 1.0  # Random variation in scroll time to appear more human-like
 MAX_SCROLLS = 500  # Default value, can be overridden by command-line args
 OUTPUT_FILE = f"{TWITTER_USERNAME}_tweets_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
 AUTO_LOGIN = False  # Set to True if you want to use automatic login
+BROWSER_POOL = None  # "host:port" of a running browser_pool.py daemon to claim a pre-warmed browser from
+EXPAND_THREADS = False  # Set to True to also collect the conversation around every scraped tweet
+THREAD_WORKERS = 3  # Number of extra browsers used for conversation expansion
+OUTPUT_COMPRESSION = None  # "gzip" or "zstd" to stream output into compressed segments with a manifest
+ROTATE_MB = None  # Start a new output segment after this many megabytes (compressed)
+ROTATE_ROWS = None  # Start a new output segment after this many tweets
+OUTPUT_SINKS = []  # Extra sinks tweets are pushed to as they are scraped: "stdout", "jsonl:PATH" or a webhook URL
+PROFILE = False  # Write cProfile stats every PROFILE_EVERY scrolls and at exit
+TRACE_MEMORY = False  # Write tracemalloc snapshots every PROFILE_EVERY scrolls and at exit
+PROFILE_EVERY = 50  # Scrolls between profiling snapshots
+PROFILE_DIR = None  # Directory for profiling snapshots, default profiles/<username>_<timestamp>
+WATCHDOG = True  # Rebuild a crashed or hung browser mid-run instead of ending the scrape
+MAX_RESTARTS = 5  # Browser restarts allowed per run
+COMMAND_TIMEOUT = 90  # Seconds a WebDriver command may take before the browser counts as hung
+PROGRESS_INTERVAL = scraper_logging.PROGRESS_INTERVAL  # Seconds between progress lines
 
 # Twitter login credentials - only needed if AUTO_LOGIN is True
 TWITTER_EMAIL = None
 TWITTER_PASSWORD = None
 
+STATUS_ID_PATTERN = re.compile(r'/status/(\d+)')
+
+logger = logging.getLogger("twitter_scraper_undetected")
+
 def setup_driver():
     """Setup and return an Undetected ChromeDriver instance."""
-    print("Initializing undetected ChromeDriver...")
-    options = uc.ChromeOptions()
-    options.add_argument("--disable-notifications")
-    options.add_argument("--disable-infobars")
-    options.add_argument("--mute-audio")
-    options.add_argument("--window-size=1920,1080")
+    logger.info("Initializing undetected ChromeDriver...")
+    
+    # Reuse the patched driver from a previous run so warm starts skip the download and version lookup
+    chrome_version = driver_cache.get_chrome_version()
+    cached_driver_path = driver_cache.get_cached_driver('undetected', chrome_version)
+    
+    if BROWSER_POOL:
+        try:
+            return attach_to_browser_pool(cached_driver_path)
+        except Exception as e:
+            logger.warning("Could not attach to browser pool at %s: %s", BROWSER_POOL, e)
+            logger.info("Starting a new browser instead...")
+    
+    if cached_driver_path:
+        try:
+            driver = start_undetected_chrome(chrome_version, cached_driver_path)
+            logger.info("Successfully initialized ChromeDriver")
+            return driver
+        except Exception as e:
+            # A bad cache entry would otherwise break every later run; patch a fresh driver instead
+            logger.warning("Cached driver %s failed to start: %s", cached_driver_path, e)
+            driver_cache.forget_driver('undetected', chrome_version)
     
     try:
-        driver = uc.Chrome(options=options, use_subprocess=True)
-        print("Successfully initialized ChromeDriver")
+        driver = start_undetected_chrome(chrome_version)
+        driver_cache.store_driver('undetected', chrome_version, driver.patcher.executable_path, copy=True)
+        logger.info("Successfully initialized ChromeDriver")
         return driver
     except Exception as e:
-        print(f"Failed to initialize undetected ChromeDriver: {e}")
-        print("Make sure Chrome browser is properly installed and up to date")
+        logger.error("Failed to initialize undetected ChromeDriver: %s", e)
+        logger.error("Make sure Chrome browser is properly installed and up to date")
         sys.exit(1)
 
+def start_undetected_chrome(chrome_version, driver_path=None):
+    """Start Chrome with the patched driver at driver_path, or let undetected_chromedriver patch one."""
+    # ChromeOptions can't be reused across uc.Chrome() calls, so every attempt builds its own
+    options = uc.ChromeOptions()
+    for argument in driver_cache.chrome_arguments(undetected=True):
+        options.add_argument(argument)
+    return uc.Chrome(
+        options=options,
+        use_subprocess=True,
+        driver_executable_path=driver_path,
+        version_main=driver_cache.chrome_major_version(chrome_version)
+    )
+
+def attach_to_browser_pool(driver_path=None):
+    """Claim a pre-warmed browser from the browser pool daemon and attach a driver to it."""
+    import browser_pool
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+    
+    if not driver_path:
+        raise RuntimeError("No patched driver cached yet, run once without the pool first")
+    
+    # Only a pool started with --undetected hands out browsers launched through undetected-chromedriver
+    debugger_address, lease = browser_pool.claim_browser(BROWSER_POOL, undetected=True)
+    options = webdriver.ChromeOptions()
+    options.add_experimental_option("debuggerAddress", debugger_address)
+    
+    try:
+        # The cached driver binary is already patched by undetected-chromedriver
+        driver = webdriver.Chrome(service=Service(driver_path), options=options)
+    except Exception:
+        lease.close()
+        raise
+    
+    # Closing the lease hands the browser back to the pool
+    driver.pool_lease = lease
+    logger.info("Attached to pre-warmed browser at %s", debugger_address)
+    return driver
+
 def login_to_twitter(driver):
     """Attempt to log in to Twitter account."""
     if not AUTO_LOGIN or not TWITTER_EMAIL or not TWITTER_PASSWORD:
-        print("Automatic login is disabled. Please log in manually if prompted.")
-        print("The script will wait 45 seconds for you to login...")
+        logger.info("Automatic login is disabled. Please log in manually if prompted.")
+        logger.info("The script will wait 45 seconds for you to login...")
         time.sleep(45)  # Wait for manual login
         return
     
     try:
-        print("Attempting to log in to Twitter...")
-        driver.get("https://twitter.com/login")
+        logger.info("Attempting to log in to Twitter...")
+        driver.get(LOGIN_URL)
         
         # Wait for the login form to appear
         WebDriverWait(driver, 10).until(
@@ -84,16 +169,15 @@ def login_to_twitter(driver):
         
         # Wait for login to complete
         time.sleep(5)
-        print("Login completed")
+        logger.info("Login completed")
     except Exception as e:
-        print(f"Error during login: {e}")
-        print("Please log in manually in the browser window.")
+        logger.warning("Error during login: %s", e)
+        logger.info("Please log in manually in the browser window.")
         time.sleep(30)  # Give time for manual login
 
 def clean_tweet_text(text):
     """Clean the tweet text by removing extra spaces and newlines."""
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
+    return clean_text(text)
 
 def check_for_login_wall(driver):
     """Check if we've hit a login wall and need to log in."""
@@ -102,18 +186,20 @@ def check_for_login_wall(driver):
         signup_elements = driver.find_elements(By.XPATH, "//span[contains(text(), 'Sign up')]")
         
         if login_elements or signup_elements:
-            print("Detected a login wall. Attempting to bypass...")
+            logger.info("Detected a login wall. Attempting to bypass...")
             login_to_twitter(driver)
             return True
     except Exception as e:
-        print(f"Error checking for login wall: {e}")
+        logger.warning("Error checking for login wall: %s", e)
     
     return False
 
-def random_scroll(driver):
-    """Perform a random scroll to appear more human-like."""
-    scroll_height = random.randint(300, 1000)
-    driver.execute_script(f"window.scrollBy(0, {scroll_height});")
+def text_links(text_element):
+    """The external links (hrefs) in a tweet text element, space separated; mentions and hashtags link relatively."""
+    if text_element is None:
+        return ""
+    return " ".join(a['href'] for a in text_element.find_all('a', href=True)
+                    if a['href'].startswith(('http://', 'https://')))
 
 def extract_tweet_data(article, username):
     """Extract data from a tweet article element."""
@@ -148,22 +234,25 @@ def extract_tweet_data(article, username):
         # Extract tweet ID from the link
         if tweet_link:
             # Look for /status/123456789 pattern
-            match = re.search(r'/status/(\d+)', tweet_link)
+            match = STATUS_ID_PATTERN.search(tweet_link)
             if match:
                 tweet_id = match.group(1)
         
         # Extract tweet text - try multiple selectors
         tweet_text = "No text found"
+        text_element = None
         
         # First try the standard data-testid attribute
         tweet_text_div = article.find('div', {'data-testid': 'tweetText'})
         if tweet_text_div:
+            text_element = tweet_text_div
             tweet_text = clean_tweet_text(tweet_text_div.get_text())
         else:
             # Try alternative approaches
             # Look for the main text element
             lang_spans = article.select('[lang]')
             if lang_spans:
+                text_element = lang_spans[0]
                 tweet_text = clean_tweet_text(lang_spans[0].get_text())
             else:
                 # Try to get all text from the article
@@ -171,6 +260,9 @@ def extract_tweet_data(article, username):
                 if all_text:
                     tweet_text = clean_tweet_text(all_text)
         
+        # The text only shows links shortened and cut off with "…"; the hrefs are the full t.co links
+        links = text_links(text_element)
+        
         # Extract likes, retweets, replies
         stats = {'replies': 0, 'retweets': 0, 'likes': 0}
         
@@ -181,8 +273,7 @@ def extract_tweet_data(article, username):
             for i, stat_type in enumerate(['replies', 'retweets', 'likes']):
                 if i < len(stats_elements):
                     stat_text = stats_elements[i].get_text()
-                    stat_value = re.search(r'\d+', stat_text)
-                    stats[stat_type] = int(stat_value.group()) if stat_value else 0
+                    stats[stat_type] = parse_count(stat_text)
         
         # Alternative approach - look for the specific aria-labels
         aria_labels = {
@@ -196,7 +287,7 @@ def extract_tweet_data(article, username):
             if elements:
                 for el in elements:
                     label = el.get('aria-label', '')
-                    match = re.search(r'\d+', label)
+                    match = NUMBER_PATTERN.search(label)
                     if match:
                         stats[stat_type] = int(match.group())
                         break
@@ -209,17 +300,18 @@ def extract_tweet_data(article, username):
             'replies': stats.get('replies', 0),
             'retweets': stats.get('retweets', 0),
             'likes': stats.get('likes', 0),
-            'url': f"https://twitter.com/{username}/status/{tweet_id}" if tweet_id != "Unknown" else "Unknown"
+            'url': f"https://twitter.com/{username}/status/{tweet_id}" if tweet_id != "Unknown" else "Unknown",
+            'links': links
         }
         
         return tweet_data
     except Exception as e:
-        print(f"Error extracting tweet data: {e}")
+        logger.debug("Error extracting tweet data: %s", e)
         return None
 
 def extract_tweets_using_js(driver, username):
     """Use JavaScript to extract tweets directly from the page DOM."""
-    print("Using JavaScript method to extract tweets...")
+    logger.debug("Using JavaScript method to extract tweets...")
     
     js_script = """
     function extractTweets() {
@@ -246,19 +338,28 @@ def extract_tweets_using_js(driver, username):
                 
                 // Extract tweet text
                 let tweetText = 'No text found';
+                let textElement = null;
                 const tweetTextDiv = article.querySelector('div[data-testid="tweetText"]');
                 if (tweetTextDiv) {
+                    textElement = tweetTextDiv;
                     tweetText = tweetTextDiv.innerText;
                 } else {
                     // Try alternative method
                     const langSpans = article.querySelectorAll('[lang]');
                     if (langSpans.length > 0) {
+                        textElement = langSpans[0];
                         tweetText = langSpans[0].innerText;
                     } else {
                         tweetText = article.innerText.substring(0, 280); // Limit length
                     }
                 }
                 
+                // The text shows links cut off with "…"; the hrefs are the full t.co links
+                const links = [];
+                if (textElement) {
+                    textElement.querySelectorAll('a[href^="http"]').forEach((a) => links.push(a.getAttribute('href')));
+                }
+                
                 // Extract engagement stats
                 const statsGroup = article.querySelector('div[role="group"]');
                 let replies = 0, retweets = 0, likes = 0;
@@ -285,7 +386,8 @@ def extract_tweets_using_js(driver, username):
                     replies: replies,
                     retweets: retweets,
                     likes: likes,
-                    url: `https://twitter.com/user/status/${tweetId}`
+                    url: `https://twitter.com/user/status/${tweetId}`,
+                    links: links.join(' ')
                 });
             } catch (e) {
                 console.error('Error extracting tweet:', e);
@@ -300,7 +402,7 @@ def extract_tweets_using_js(driver, username):
     
     try:
         tweets_data = driver.execute_script(js_script)
-        print(f"JavaScript extracted {len(tweets_data)} tweets")
+        logger.debug("JavaScript extracted %d tweets", len(tweets_data))
         
         # Fix the URLs with correct username
         for tweet in tweets_data:
@@ -309,7 +411,7 @@ def extract_tweets_using_js(driver, username):
         
         return tweets_data
     except Exception as e:
-        print(f"JavaScript extraction failed: {e}")
+        logger.warning("JavaScript extraction failed: %s", e)
         return []
 
 def scrape_tweets(driver, username):
@@ -320,7 +422,7 @@ def scrape_tweets(driver, username):
     scroll_count = 0
     consecutive_no_new_tweets = 0
     
-    print(f"Starting to scrape tweets from {TARGET_URL}")
+    logger.info("Starting to scrape tweets from %s", TARGET_URL)
     driver.get(TARGET_URL)
     
     # Check for login wall before proceeding
@@ -333,18 +435,18 @@ def scrape_tweets(driver, username):
             EC.presence_of_element_located((By.CSS_SELECTOR, 'article'))
         )
     except TimeoutException:
-        print("Timeout while waiting for the timeline to load.")
-        print("Checking if we need to log in...")
+        logger.warning("Timeout while waiting for the timeline to load.")
+        logger.info("Checking if we need to log in...")
         if check_for_login_wall(driver):
             driver.get(TARGET_URL)
             time.sleep(5)
         else:
-            print("Still can't find any tweets. Twitter might be blocking the scraper.")
+            logger.warning("Still can't find any tweets. Twitter might be blocking the scraper.")
             return tweets
     
     time.sleep(5)  # Allow more time for the page to fully load
     
-    print("Starting to scroll and scrape tweets...")
+    logger.info("Starting to scroll and scrape tweets...")
     
     # Try JavaScript extraction first to see if it works
     js_tweets = extract_tweets_using_js(driver, username)
@@ -354,129 +456,182 @@ def scrape_tweets(driver, username):
                 tweets.append(tweet_data)
                 unique_tweet_ids.add(tweet_data['tweet_id'])
                 unique_tweet_texts.add(tweet_data['text'])
-                print(f"JS method scraped tweet: {tweet_data['text'][:50]}...")
+                logger.debug("JS method scraped tweet: %s...", tweet_data['text'][:50])
     
     # Scroll and scrape
+    planner = scroll_planner.ScrollPlanner()
+    progress = scraper_logging.ProgressReporter(logger, MAX_SCROLLS, PROGRESS_INTERVAL)
     while scroll_count < MAX_SCROLLS:
-        # Every 10 scrolls, perform some random actions to appear more human-like
-        if scroll_count % 10 == 0:
-            random_scroll(driver)
-            time.sleep(random.uniform(1.0, 3.0))
-        
-        # Try JavaScript method every 5 scrolls as it might be more reliable
-        if scroll_count % 5 == 0:
-            js_tweets = extract_tweets_using_js(driver, username)
-            if js_tweets:
-                prev_count = len(tweets)
-                for tweet_data in js_tweets:
-                    if tweet_data['tweet_id'] not in unique_tweet_ids and tweet_data['text'] not in unique_tweet_texts:
-                        tweets.append(tweet_data)
-                        unique_tweet_ids.add(tweet_data['tweet_id'])
-                        unique_tweet_texts.add(tweet_data['text'])
-                
-                new_tweets = len(tweets) - prev_count
-                if new_tweets > 0:
-                    print(f"JS method found {new_tweets} new tweets")
-                    consecutive_no_new_tweets = 0
-        
-        # Parse the page with BeautifulSoup
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
-        
-        # Find all tweet articles - use a more specific selector that targets tweets
-        tweet_articles = soup.find_all('article')
-        prev_count = len(tweets)
-        
-        print(f"Found {len(tweet_articles)} tweet articles on the current page")
-        
-        for article in tweet_articles:
-            tweet_data = extract_tweet_data(article, username)
+        try:
+            # Every 10 scrolls, pause and shorten the next step by a random amount to appear more human-like.
+            # A random jump further down would skip tweets and cost scrolls back up to fill the gap
+            jitter = 0
+            if scroll_count % 10 == 0:
+                jitter = random.randint(300, 1000)
+                time.sleep(random.uniform(1.0, 3.0))
             
-            if not tweet_data:
-                continue
+            # Try JavaScript method every 5 scrolls as it might be more reliable
+            if scroll_count % 5 == 0:
+                js_tweets = extract_tweets_using_js(driver, username)
+                if js_tweets:
+                    prev_count = len(tweets)
+                    for tweet_data in js_tweets:
+                        if tweet_data['tweet_id'] not in unique_tweet_ids and tweet_data['text'] not in unique_tweet_texts:
+                            tweets.append(tweet_data)
+                            unique_tweet_ids.add(tweet_data['tweet_id'])
+                            unique_tweet_texts.add(tweet_data['text'])
+                    
+                    new_tweets = len(tweets) - prev_count
+                    if new_tweets > 0:
+                        logger.debug("JS method found %d new tweets", new_tweets)
+                        consecutive_no_new_tweets = 0
+            
+            # Parse the page with BeautifulSoup
+            soup = BeautifulSoup(driver.page_source, 'html.parser')
+            
+            # Find all tweet articles - use a more specific selector that targets tweets
+            tweet_articles = soup.find_all('article')
+            prev_count = len(tweets)
+            page_tweets = []
+            
+            logger.debug("Found %d tweet articles on the current page", len(tweet_articles))
+            
+            for article in tweet_articles:
+                tweet_data = extract_tweet_data(article, username)
+                
+                if not tweet_data:
+                    continue
+                page_tweets.append(tweet_data)
+                    
+                # Skip if we've already seen this tweet (by ID or by text)
+                if tweet_data['tweet_id'] in unique_tweet_ids or tweet_data['text'] in unique_tweet_texts:
+                    continue
+                
+                tweets.append(tweet_data)
+                unique_tweet_ids.add(tweet_data['tweet_id'])
+                unique_tweet_texts.add(tweet_data['text'])
+                
+                logger.debug("Scraped tweet: %s...", tweet_data['text'][:50])
                 
-            # Skip if we've already seen this tweet (by ID or by text)
-            if tweet_data['tweet_id'] in unique_tweet_ids or tweet_data['text'] in unique_tweet_texts:
-                continue
+                # Save progress incrementally every 50 tweets
+                if len(tweets) % 50 == 0:
+                    save_tweets_to_csv(tweets, OUTPUT_FILE)
+                    logger.debug("Saved progress: %d tweets so far.", len(tweets))
             
-            tweets.append(tweet_data)
-            unique_tweet_ids.add(tweet_data['tweet_id'])
-            unique_tweet_texts.add(tweet_data['text'])
+            # Scroll down just past the tweets harvested so far, or back up into a coverage gap.
+            # Jumping further makes the virtualized timeline recycle tweets before we see them
+            last_height = planner.scroll(driver, page_tweets, jitter)
             
-            print(f"Scraped tweet: {tweet_data['text'][:50]}...")
+            # Wait for new content to load
+            scroll_time = SCROLL_PAUSE_TIME + random.uniform(-SCROLL_VARIATION, SCROLL_VARIATION)
+            time.sleep(max(1.0, scroll_time))  # Ensure minimum pause time is longer
             
-            # Save progress incrementally every 50 tweets
-            if len(tweets) % 50 == 0:
-                save_tweets_to_csv(tweets, OUTPUT_FILE)
-                print(f"Saved progress: {len(tweets)} tweets so far.")
-        
-        # Scroll down using a more reliable method
-        # Execute multiple smaller scrolls instead of one big scroll
-        last_height = driver.execute_script("return document.body.scrollHeight")
-        
-        # Scroll down to a random position between 70-90% of the page height
-        scroll_position = int(last_height * random.uniform(0.7, 0.9))
-        driver.execute_script(f"window.scrollTo(0, {scroll_position});")
-        
-        # Add a small pause
-        time.sleep(1)
-        
-        # Then scroll all the way down
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        
-        # Wait for new content to load
-        scroll_time = SCROLL_PAUSE_TIME + random.uniform(-SCROLL_VARIATION, SCROLL_VARIATION)
-        time.sleep(max(1.0, scroll_time))  # Ensure minimum pause time is longer
-        
-        # Check if scroll was successful
-        new_height = driver.execute_script("return document.body.scrollHeight")
-        
-        scroll_count += 1
-        print(f"Scrolled {scroll_count} times. Found {len(tweets)} tweets so far.")
-        
-        # Check if we actually scrolled (page height changed)
-        if new_height == last_height:
-            print("Scroll didn't increase page height. Maybe we reached the end.")
-            consecutive_no_new_tweets += 1
-        else:
-            print(f"Scroll changed page height from {last_height} to {new_height}")
-        
-        # Check if we found any new tweets in this scroll
-        if prev_count == len(tweets):
-            consecutive_no_new_tweets += 1
-            print(f"No new tweets found in this scroll. ({consecutive_no_new_tweets}/5)")
+            # Check if scroll was successful
+            new_height = driver.execute_script("return document.body.scrollHeight")
             
-            # Try a different scroll method if we're not finding tweets
-            if consecutive_no_new_tweets == 3:
-                print("Trying different scroll method...")
-                # Execute scroll with JS to ensure it works
-                driver.execute_script("window.scrollBy(0, 1000);")
-                time.sleep(2)
+            send_to_sinks(tweets)
+            scroll_count += 1
+            profiling_hooks.checkpoint(scroll_count)
+            if isinstance(driver, driver_watchdog.WatchedDriver):
+                driver.save_session(scroll_count)
+            progress.update(scroll_count, len(tweets))
             
-            # If we haven't found new tweets for 5 consecutive scrolls, we might have reached the end
-            if consecutive_no_new_tweets >= 5:
-                print("Reached 5 consecutive scrolls with no new tweets. We might have reached the end.")
-                
-                # One final attempt to find more tweets - reload the page and try a few more times
-                if len(tweets) < 10:  # If we haven't found many tweets, try reloading
-                    print("Found very few tweets. Trying to reload the page...")
-                    driver.get(TARGET_URL)
-                    time.sleep(5)
-                    consecutive_no_new_tweets = 0
-                else:
-                    break
-        else:
-            consecutive_no_new_tweets = 0  # Reset the counter
+            # Check if we actually scrolled (page height changed)
+            if new_height == last_height:
+                if not planner.filling_gap:
+                    logger.debug("Scroll didn't increase page height. Maybe we reached the end.")
+                    consecutive_no_new_tweets += 1
+            else:
+                logger.debug("Scroll changed page height from %s to %s", last_height, new_height)
             
-            # If we found a lot of new tweets at once, save progress immediately
-            if len(tweets) - prev_count > 10:
-                save_tweets_to_csv(tweets, OUTPUT_FILE)
-                print(f"Found {len(tweets) - prev_count} new tweets! Saved progress.")
+            # Check if we found any new tweets in this scroll (not expected while filling a gap)
+            if prev_count == len(tweets) and not planner.filling_gap:
+                consecutive_no_new_tweets += 1
+                logger.debug("No new tweets found in this scroll. (%d/5)", consecutive_no_new_tweets)
+                
+                # Try a different scroll method if we're not finding tweets
+                if consecutive_no_new_tweets == 3:
+                    logger.debug("Trying different scroll method...")
+                    # Execute scroll with JS to ensure it works
+                    driver.execute_script("window.scrollBy(0, 1000);")
+                    time.sleep(2)
+                
+                # If we haven't found new tweets for 5 consecutive scrolls, we might have reached the end
+                if consecutive_no_new_tweets >= 5:
+                    logger.info("Reached 5 consecutive scrolls with no new tweets. We might have reached the end.")
+                    
+                    # One final attempt to find more tweets - reload the page and try a few more times
+                    if len(tweets) < 10:  # If we haven't found many tweets, try reloading
+                        logger.info("Found very few tweets. Trying to reload the page...")
+                        driver.get(TARGET_URL)
+                        time.sleep(5)
+                        planner.reset()
+                        consecutive_no_new_tweets = 0
+                    else:
+                        break
+            else:
+                consecutive_no_new_tweets = 0  # Reset the counter
+                
+                # If we found a lot of new tweets at once, save progress immediately
+                if len(tweets) - prev_count > 10:
+                    save_tweets_to_csv(tweets, OUTPUT_FILE)
+                    logger.debug("Found %d new tweets! Saved progress.", len(tweets) - prev_count)
+        except Exception as e:
+            # A crashed or hung browser is rebuilt and the scrape continues where it was
+            if not recover_driver(driver, e, tweets, scroll_count):
+                break
+            planner.reset()
+    
+    progress.update(scroll_count, len(tweets), force=True)
+    logger.info(planner.summary())
     
     return tweets
 
-def save_tweets_to_csv(tweets, filename):
+def recover_driver(driver, error, tweets, scroll_count):
+    """Rebuild a crashed or hung browser and return to the last harvested tweet.
+    
+    Returns False when scraping should stop with the tweets found so far.
+    """
+    if not isinstance(driver, driver_watchdog.WatchedDriver):
+        raise error
+    if not driver.check(error):
+        logger.warning("An error occurred while scrolling: %s", error)
+        logger.info("The browser is still responding, stopping with the tweets found so far.")
+        return False
+    
+    logger.warning("The browser crashed or stopped responding after %s scrolls: %s", scroll_count, error)
+    last_tweet_id = tweets[-1]['tweet_id'] if tweets else None
+    return driver.recover(TARGET_URL, last_tweet_id, max_scrolls=scroll_count + 10, pause_time=SCROLL_PAUSE_TIME)
+
+output_writers = {}  # Output filename -> SegmentedTweetWriter when streaming segmented output
+active_sinks = None  # SinkSet opened from OUTPUT_SINKS by open_output_sinks()
+
+def open_output_sinks():
+    """Open the configured output sinks; a stdout sink moves all other output to stderr from here on."""
+    global active_sinks
+    if OUTPUT_SINKS and active_sinks is None:
+        active_sinks = output_sinks.open_sinks(OUTPUT_SINKS)
+
+def send_to_sinks(tweets):
+    """Push the timeline tweets not pushed before to the output sinks."""
+    if active_sinks is not None:
+        active_sinks.send_new(tweets)
+
+def save_tweets_to_csv(tweets, filename, fields=None):
     """Save the scraped tweets to a CSV file."""
-    fields = ['tweet_id', 'timestamp', 'text', 'replies', 'retweets', 'likes', 'url']
+    if fields is None:
+        fields = ['tweet_id', 'timestamp', 'text', 'replies', 'retweets', 'likes', 'url', 'links']
+    
+    if OUTPUT_COMPRESSION or ROTATE_MB or ROTATE_ROWS:
+        # Stream only the tweets not written yet into the current segment
+        writer = output_writers.get(filename)
+        if writer is None:
+            max_bytes = int(ROTATE_MB * 1024 * 1024) if ROTATE_MB else None
+            writer = tweet_files.SegmentedTweetWriter(filename, fields, OUTPUT_COMPRESSION, max_bytes, ROTATE_ROWS)
+            output_writers[filename] = writer
+        written = writer.write_new(tweets)
+        logger.debug("Saved %d new tweets to %s (manifest: %s)", written, writer.current_path, writer.manifest_path)
+        return
     
     # Check if we should append or write a new file
     file_exists = os.path.isfile(filename)
@@ -490,7 +645,39 @@ def save_tweets_to_csv(tweets, filename):
         for tweet in tweets:
             writer.writerow(tweet)
     
-    print(f"Saved {len(tweets)} tweets to {filename}")
+    logger.debug("Saved %d tweets to %s", len(tweets), filename)
+
+def close_output_files():
+    """Finish any segmented output files and deliver what the output sinks still hold."""
+    global active_sinks
+    for writer in output_writers.values():
+        writer.close()
+    output_writers.clear()
+    if active_sinks is not None:
+        active_sinks.close()
+        active_sinks = None
+
+def expand_conversations(driver, tweets):
+    """Collect the conversations around the scraped tweets and save them next to the output file."""
+    import thread_expander
+    
+    threads_file = OUTPUT_FILE.replace('_tweets_', '_threads_', 1)
+    if threads_file == OUTPUT_FILE:
+        threads_file = f"{os.path.splitext(OUTPUT_FILE)[0]}_threads.csv"
+    
+    thread_tweets = thread_expander.expand_threads(
+        [tweet['tweet_id'] for tweet in tweets],
+        setup_driver,
+        extract_tweet_data,
+        TWITTER_USERNAME,
+        workers=THREAD_WORKERS,
+        session_driver=driver
+    )
+    if thread_tweets:
+        save_tweets_to_csv(thread_tweets, threads_file, fields=thread_expander.THREAD_FIELDS)
+        logger.info("Conversation expansion completed! Total tweets in threads: %s", len(thread_tweets))
+    else:
+        logger.info("No conversation tweets were collected.")
 
 def parse_arguments():
     """Parse command line arguments."""
@@ -504,10 +691,32 @@ def parse_arguments():
                         help=f'Pause time between scrolls in seconds (default: {SCROLL_PAUSE_TIME})')
     parser.add_argument('--login', action='store_true', 
                         help='Enable auto-login prompt')
-    parser.add_argument('--debug', action='store_true',
-                        help='Enable debug mode with additional output')
     parser.add_argument('--save-html', action='store_true',
                         help='Save HTML of the page for debugging')
+    parser.add_argument('--browser-pool', type=str, default=None, metavar='HOST:PORT',
+                        help='Claim a pre-warmed browser from a running browser_pool.py daemon')
+    parser.add_argument('--expand-threads', action='store_true',
+                        help='Also collect the conversation around every scraped tweet')
+    parser.add_argument('--thread-workers', type=int, default=THREAD_WORKERS,
+                        help=f'Number of extra browsers for conversation expansion (default: {THREAD_WORKERS})')
+    parser.add_argument('--target-url', type=str, default=None,
+                        help='Timeline URL to scrape instead of x.com, e.g. a local mock timeline server')
+    parser.add_argument('--compress', choices=['gzip', 'zstd'], default=None,
+                        help='Stream output into compressed segments described by a manifest')
+    parser.add_argument('--rotate-mb', type=float, default=None,
+                        help='Start a new output segment after this many megabytes')
+    parser.add_argument('--rotate-rows', type=int, default=None,
+                        help='Start a new output segment after this many tweets')
+    parser.add_argument('--sink', action='append', default=[], metavar='SINK',
+                        help='Also push tweets as they are scraped to stdout, jsonl:PATH or an http(s):// webhook (repeatable)')
+    parser.add_argument('--no-watchdog', action='store_true',
+                        help='End the run when the browser crashes or hangs instead of restarting it')
+    parser.add_argument('--max-restarts', type=int, default=MAX_RESTARTS,
+                        help=f'Browser restarts allowed per run (default: {MAX_RESTARTS})')
+    parser.add_argument('--command-timeout', type=float, default=COMMAND_TIMEOUT,
+                        help=f'Seconds a WebDriver command may take before the browser counts as hung (default: {COMMAND_TIMEOUT})')
+    profiling_hooks.add_profiling_arguments(parser, PROFILE_EVERY, 'scrolls')
+    scraper_logging.add_logging_arguments(parser)
     args = parser.parse_args()
     return args
 
@@ -517,13 +726,36 @@ def main():
     args = parse_arguments()
     
     # Update global variables based on arguments
-    global TWITTER_USERNAME, TARGET_URL, MAX_SCROLLS, SCROLL_PAUSE_TIME, OUTPUT_FILE, AUTO_LOGIN, TWITTER_EMAIL, TWITTER_PASSWORD
+    global TWITTER_USERNAME, TARGET_URL, MAX_SCROLLS, SCROLL_PAUSE_TIME, OUTPUT_FILE, AUTO_LOGIN, TWITTER_EMAIL, TWITTER_PASSWORD, BROWSER_POOL
+    global EXPAND_THREADS, THREAD_WORKERS, OUTPUT_COMPRESSION, ROTATE_MB, ROTATE_ROWS, OUTPUT_SINKS
+    global PROFILE, TRACE_MEMORY, PROFILE_EVERY, PROFILE_DIR, WATCHDOG, MAX_RESTARTS, COMMAND_TIMEOUT, PROGRESS_INTERVAL
     
     TWITTER_USERNAME = args.username
-    TARGET_URL = f"https://x.com/{TWITTER_USERNAME}/with_replies"
+    TARGET_URL = args.target_url or f"https://x.com/{TWITTER_USERNAME}/with_replies"
     MAX_SCROLLS = args.max_scrolls
     SCROLL_PAUSE_TIME = args.pause_time
     OUTPUT_FILE = f"{TWITTER_USERNAME}_tweets_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    BROWSER_POOL = args.browser_pool
+    EXPAND_THREADS = args.expand_threads
+    THREAD_WORKERS = args.thread_workers
+    OUTPUT_COMPRESSION = args.compress
+    ROTATE_MB = args.rotate_mb
+    ROTATE_ROWS = args.rotate_rows
+    OUTPUT_SINKS = args.sink
+    PROFILE = args.profile
+    TRACE_MEMORY = args.trace_memory
+    PROFILE_EVERY = args.profile_every
+    PROFILE_DIR = args.profile_dir
+    WATCHDOG = not args.no_watchdog
+    MAX_RESTARTS = args.max_restarts
+    COMMAND_TIMEOUT = args.command_timeout
+    PROGRESS_INTERVAL = args.progress_interval
+    
+    # Open the sinks before anything is printed, so a stdout sink gets nothing but tweets
+    open_output_sinks()
+    
+    # Per-tweet and per-scroll lines are only logged with --debug
+    scraper_logging.setup_logging(args.debug, args.log_format, args.log_file)
     
     # Handle login if requested
     if args.login:
@@ -531,47 +763,27 @@ def main():
         TWITTER_EMAIL = input("Enter your Twitter email/username: ")
         TWITTER_PASSWORD = input("Enter your Twitter password: ")
     
-    print(f"Starting Twitter scraper for user: {TWITTER_USERNAME}")
-    print(f"Max scrolls: {MAX_SCROLLS}, Pause time: {SCROLL_PAUSE_TIME}s")
-    print(f"Output will be saved to: {OUTPUT_FILE}")
+    logger.info("Starting Twitter scraper for user: %s", TWITTER_USERNAME)
+    logger.info("Max scrolls: %s, Pause time: %ss", MAX_SCROLLS, SCROLL_PAUSE_TIME)
+    logger.info("Output will be saved to: %s", OUTPUT_FILE)
     
-    # Configure debug logs if requested
     if args.debug:
-        print("Debug mode enabled - will print detailed information")
+        logger.debug("Debug mode enabled - will log every tweet, scroll and save")
     
-    # Display Chrome version
-    try:
-        import subprocess
-        if sys.platform == 'win32':
-            # Windows
-            chrome_path = r"C:\Program Files\Google\Chrome\Application\chrome.exe"
-            alt_chrome_path = r"C:\Program Files (x86)\Google\Chrome\Application\chrome.exe"
-            
-            if os.path.exists(chrome_path):
-                version_cmd = f'"{chrome_path}" --version'
-            elif os.path.exists(alt_chrome_path):
-                version_cmd = f'"{alt_chrome_path}" --version'
-            else:
-                # Try to find Chrome in registry
-                import winreg
-                try:
-                    with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r"SOFTWARE\Microsoft\Windows\CurrentVersion\App Paths\chrome.exe") as key:
-                        chrome_path = winreg.QueryValue(key, None)
-                        version_cmd = f'"{chrome_path}" --version'
-                except:
-                    version_cmd = 'reg query "HKEY_CURRENT_USER\\Software\\Google\\Chrome\\BLBeacon" /v version'
-        else:
-            # Linux/Mac
-            version_cmd = 'google-chrome --version || chrome --version'
-        
-        result = subprocess.run(version_cmd, shell=True, capture_output=True, text=True)
-        chrome_version = result.stdout.strip()
-        print(f"Chrome version: {chrome_version}")
-    except Exception as e:
-        print(f"Could not determine Chrome version: {e}")
+    # Display Chrome version (cached until Chrome is updated)
+    chrome_version = driver_cache.get_chrome_version()
+    if chrome_version:
+        logger.info("Chrome version: %s", chrome_version)
+    else:
+        logger.info("Could not determine Chrome version")
+    
+    if PROFILE or TRACE_MEMORY:
+        profiling_hooks.start(PROFILE_DIR, PROFILE, TRACE_MEMORY, PROFILE_EVERY, "scroll", TWITTER_USERNAME)
     
     try:
         driver = setup_driver()
+        if WATCHDOG:
+            driver = driver_watchdog.WatchedDriver(driver, setup_driver, COMMAND_TIMEOUT, MAX_RESTARTS)
         
         # Save HTML if requested
         if args.save_html:
@@ -579,7 +791,7 @@ def main():
                 html_file = f"{TWITTER_USERNAME}_page_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
                 with open(html_file, 'w', encoding='utf-8') as f:
                     f.write(driver.page_source)
-                print(f"Saved page HTML to {html_file}")
+                logger.info("Saved page HTML to %s", html_file)
             
             # Register this as a function to call when there's an issue
             import atexit
@@ -588,37 +800,43 @@ def main():
         try:
             tweets = scrape_tweets(driver, TWITTER_USERNAME)
             if tweets:
+                send_to_sinks(tweets)
                 save_tweets_to_csv(tweets, OUTPUT_FILE)
-                print(f"Scraping completed! Total tweets scraped: {len(tweets)}")
+                logger.info("Scraping completed! Total tweets scraped: %s", len(tweets))
+                if EXPAND_THREADS:
+                    expand_conversations(driver, tweets)
             else:
-                print("No tweets were scraped.")
+                logger.info("No tweets were scraped.")
                 
                 if args.save_html:
                     html_file = f"{TWITTER_USERNAME}_error_page.html"
                     with open(html_file, 'w', encoding='utf-8') as f:
                         f.write(driver.page_source)
-                    print(f"Saved error page HTML to {html_file}")
+                    logger.info("Saved error page HTML to %s", html_file)
         except Exception as e:
-            print(f"An error occurred during scraping: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("An error occurred during scraping: %s", e)
             
             if args.save_html:
                 html_file = f"{TWITTER_USERNAME}_error_page.html"
                 with open(html_file, 'w', encoding='utf-8') as f:
                     f.write(driver.page_source)
-                print(f"Saved error page HTML to {html_file}")
+                logger.info("Saved error page HTML to %s", html_file)
     except Exception as e:
-        print(f"An error occurred while setting up the driver: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("An error occurred while setting up the driver: %s", e)
     finally:
+        close_output_files()
+        profiling_hooks.stop()
         try:
             driver.quit()
         except:
             pass
+        try:
+            # Hand a pooled browser back to the browser pool daemon
+            driver.pool_lease.close()
+        except:
+            pass
         
-        print("Scraper finished")
+        logger.info("Scraper finished")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file